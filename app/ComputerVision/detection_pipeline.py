@@ -0,0 +1,155 @@
+import collections
+import queue
+import threading
+import time
+
+LATENCY_SAMPLES = 200  # recent latencies kept per stage for the percentiles
+
+
+class StageMetrics:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.passed = 0  # handed to the next stage
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+
+    def record(self, seconds, passed, error=False):
+        with self.lock:
+            self.processed += 1
+            self.passed += passed
+            self.errors += error
+            self.latencies.append(seconds)
+
+    def snapshot(self, queued):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            processed, passed, errors = self.processed, self.passed, self.errors
+        result = {"workers": self.workers, "queued": queued, "processed": processed, "passed": passed, "errors": errors}
+        if latencies:
+            result["p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+            result["p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+            result["max_ms"] = round(latencies[-1] * 1000, 1)
+        return result
+
+
+class DetectionPipeline:
+    """
+    Persistent staged pipeline with a bounded queue in front of every stage.
+
+    `stages` is a list of (name, function, workers). Each function takes the item, does its part
+    and returns the item to hand it to the next stage, or None to stop there (no detections, a
+    duplicate already handled, ...). Every stage has its own worker threads, so a slow stage
+    (e.g. an LLM call) only holds up the items that reach it. submit() never blocks: when the
+    first queue is full the item is dropped and counted, so the telemetry thread calling it is
+    never held up. Between stages a full queue makes the upstream workers wait.
+    Per-stage counts and latency percentiles are available from metrics() and printed every
+    `report_interval` seconds while items are flowing.
+    """
+
+    def __init__(self, stages, queue_size=16, name="detection", report_interval=60.0):
+        self.name = name
+        self.report_interval = report_interval
+        self.last_report = time.monotonic()
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.total_latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.metrics_by_stage = [StageMetrics(stage_name, workers) for stage_name, _, workers in stages]
+        self.threads = []
+        for index, (stage_name, function, workers) in enumerate(stages):
+            for worker in range(workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index, function),
+                    name=f"{name}-{stage_name}-{worker}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, item):
+        """Queue an item for the first stage. Returns False if it was dropped because the pipeline is full."""
+        try:
+            self.queues[0].put_nowait((time.monotonic(), item))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.submitted += 1
+        return True
+
+    def _work(self, index, function):
+        stage = self.metrics_by_stage[index]
+        source = self.queues[index]
+        last = index == len(self.queues) - 1
+        while True:
+            entry = source.get()
+            if entry is None:
+                break
+            submitted_at, item = entry
+            start = time.monotonic()
+            error = False
+            try:
+                result = function(item)
+            except Exception as e:
+                print(f"Error in {self.name} stage {stage.name}: {e}")
+                result = None
+                error = True
+            stage.record(time.monotonic() - start, result is not None, error)
+            if result is None:
+                self._done(submitted_at)
+            elif last:
+                self._done(submitted_at, completed=True)
+            else:
+                self.queues[index + 1].put((submitted_at, result))
+
+    def _done(self, submitted_at, completed=False):
+        now = time.monotonic()
+        with self.lock:
+            if completed:
+                self.completed += 1
+            self.total_latencies.append(now - submitted_at)
+            report = now - self.last_report >= self.report_interval
+            if report:
+                self.last_report = now
+        if report:
+            print(self.report())
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.total_latencies)
+            result = {"submitted": self.submitted, "dropped": self.dropped, "completed": self.completed}
+        if latencies:
+            result["end_to_end_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+            result["end_to_end_max_ms"] = round(latencies[-1] * 1000, 1)
+        result["stages"] = {
+            stage.name: stage.snapshot(self.queues[index].qsize())
+            for index, stage in enumerate(self.metrics_by_stage)
+        }
+        return result
+
+    def report(self):
+        """One line per stage: workers, queue depth, throughput and latency."""
+        metrics = self.metrics()
+        lines = [f"{self.name} pipeline: {metrics['submitted']} submitted, {metrics['dropped']} dropped, {metrics['completed']} completed"]
+        for stage_name, stage in metrics["stages"].items():
+            latency = f"p50 {stage['p50_ms']}ms p95 {stage['p95_ms']}ms" if "p50_ms" in stage else "no samples"
+            lines.append(
+                f"  {stage_name:<10} workers {stage['workers']} queued {stage['queued']:>3} "
+                f"processed {stage['processed']:>5} passed {stage['passed']:>5} errors {stage['errors']} {latency}"
+            )
+        return "\n".join(lines)
+
+    def stop(self, timeout=5.0):
+        """Let every stage finish what it has queued, then stop the workers."""
+        for index, stage in enumerate(self.metrics_by_stage):
+            for _ in range(stage.workers):
+                self.queues[index].put(None)
+            deadline = time.monotonic() + timeout
+            for thread in self.threads:
+                if thread.name.startswith(f"{self.name}-{stage.name}-"):
+                    thread.join(max(0.0, deadline - time.monotonic()))
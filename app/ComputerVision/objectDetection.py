@@ -1,14 +1,22 @@
 
+import threading
 import cv2
 import numpy as np
-from ultralytics import YOLO
 
-# Load your trained YOLO model
-  # Replace with your model path
-model = YOLO("./ComputerVision/CVModels/rf3v1.pt")
+# Your trained YOLO model
+MODEL_PATH = "./ComputerVision/CVModels/rf3v1.pt"  # Replace with your model path
+_model = None
+_model_lock = threading.Lock()
 
 
-custom_labels = model.names  # This pulls the correct labels from the model
+def get_model():
+    """The YOLO model, loaded on first use so that importing this module (e.g. from a spawned process) stays cheap."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from ultralytics import YOLO
+            _model = YOLO(MODEL_PATH)
+        return _model
 
 def detect_objects(image_path):
 
@@ -16,6 +24,8 @@ def detect_objects(image_path):
     image = cv2.imread(image_path)
     
     # Run inference
+    model = get_model()
+    custom_labels = model.names  # This pulls the correct labels from the model
     results = model(image)
     
     detections = []
@@ -46,7 +56,12 @@ image_path = "temp/drone_testing5.jpg"  # Replace with your image path
 #     print(f"Class: {detection['class']}, BBox: {detection['bbox']}, Confidence: {detection['confidence']}")
 
 def detect_and_draw(image_path):
-    image = cv2.imread(image_path)
+    return detect_and_draw_image(cv2.imread(image_path))
+
+def detect_and_draw_image(image):
+    """detect_and_draw for an image that is already loaded, e.g. by the detection pipeline's load stage."""
+    model = get_model()
+    custom_labels = model.names
     results = model(image)
 
     detections = []
@@ -4,278 +4,577 @@ import asyncio
 import threading
 import time
 import math
-
-class mission_item:
-    def __init__(self, seq, current, lat, lon, alt):
-        self.seq = seq
-        self.frame = mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT
-        self.command = mavutil.mavlink.MAV_CMD_NAV_WAYPOINT
-        self.current = current
-        self.auto = 1
-        self.param1 = 0.0
-        self.param2 = 2.0
-        self.param3 = 0
-        self.param4 = 0.0
-        self.lat = int(1e7 * lat)
-        self.lon = int(1e7 * lon)
-        self.alt = alt
-
+from Dispatcher.mavlink_link import MavlinkLink
+from Dispatcher.mission_upload import MissionUpload
+from Dispatcher.mission_download import MissionDownload
+from Dispatcher.mission_items import MissionItemBuffer
+from Dispatcher.stream_rates import StreamRateManager, DEFAULT_PHASE
+from Dispatcher.flight_log import FlightLogRecorder, FlightLogReplay
+from Dispatcher.event_queue import MissionEventQueue
+from Dispatcher.command_queue import CommandQueue
+from Dispatcher.link_health import LinkHealthMonitor
+from Dispatcher.liveness import LivenessTracker, STALE_AFTER, LOST_AFTER, ALIVE, STALE, LOST
 
 class Dispatcher:
-    def __init__(self, missionState):
-        self.master = None
+    def __init__(self, missionState, transport="event", stale_after=STALE_AFTER, lost_after=LOST_AFTER):
+        self.master = None # first connection opened, used for drones without a known route
+        self.connections = [] # every open MAVLink endpoint (TCP/UDP/serial)
+        self.links = [] # event-driven readers, one per connection
+        self.routes = {} # drone_id -> connection that drone was heard on, writes go back out the same way
+        self.receiving = False
+        self.transport = transport # "event" registers the link fd with asyncio, "poll" uses recv_match polling
         self.missionState = missionState
-        self.uploading_missions = {}
-        self.unhandled_clears = [] # list of drones that have sent a mission clear command, awaiting ack
-        self.waiting_for_takeoff = []
-        self.requeted_missions = []
-        self.loop = asyncio.new_event_loop()  # Create a separate event loop for background tasks
-        self.mission_thread = threading.Thread(target=self._run_mission_loop, daemon=True)  
+        self.recorder = None # FlightLogRecorder while a flight log is being written
+        self.replaying = False # a FlightLogReplay has swapped in its own routes and null connections
+        self.uploading_missions = {} # drone_id -> MissionUpload in progress
+        self.downloading_missions = {} # drone_id -> MissionDownload in progress
+        self.uploaded_missions = {} # drone_id -> MissionItemBuffer the vehicle last accepted, for verification
+        self.waiting_for_takeoff = [] # (drone_id, altitude, mission item to start from once it is reached)
+        self.handlers = {}  # msg id -> list of (handler, is_coroutine)
+        self.waiters = {}  # msg id -> list of (drone_id, predicate, future) resolved by the receive loop
+        self._register_default_handlers()
+        self.link_health = LinkHealthMonitor() # per-drone loss, rates, jitter and command round trips
+        self.commands = CommandQueue(self) # COMMAND_LONGs in flight, resolved by COMMAND_ACK
+        # heartbeat discovery and stale/lost detection for the whole swarm on one timer wheel
+        self.liveness = LivenessTracker(self._on_liveness_change, stale_after, lost_after)
+        self.stream_rates = StreamRateManager(self)
+        # missionState work (detection checks, GUI updates, image detection) runs on its own thread
+        # so it can never hold up the receive loop
+        self.events = MissionEventQueue()
+        self.events.start()
+        # One event loop runs both the receive loop and mission/command coroutines, so waiters
+        # and handlers share it. Selector loop so the link fd can be watched on every platform.
+        self.loop = asyncio.SelectorEventLoop()
+        self.mission_thread = threading.Thread(target=self._run_mission_loop, daemon=True)
         self.mission_thread.start()  # Start the background thread
 
     def _run_mission_loop(self):
-        """Runs an asyncio event loop in a separate thread for mission uploads."""
+        """Runs an asyncio event loop in a separate thread for receiving packets and mission uploads."""
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
-    def connect(self):
+    def start(self):
+        """Start the receive loop on the dispatcher's event loop thread."""
+        return asyncio.run_coroutine_threadsafe(self.receive_packets(), self.loop)
+
+    @staticmethod
+    def _resolve_msg_id(msg_type):
+        """Accept either a MAVLink message name ("HEARTBEAT") or its numeric id."""
+        if isinstance(msg_type, int):
+            return msg_type
+        msg_id = getattr(mavutil.mavlink, f"MAVLINK_MSG_ID_{msg_type}", None)
+        if msg_id is None:
+            raise ValueError(f"Unknown MAVLink message type: {msg_type}")
+        return msg_id
+
+    def register_handler(self, msg_type, handler):
+        """
+        Subscribe handler(drone_id, msg) to a message type. Handlers may be plain functions or coroutines.
+        The list is replaced rather than appended to, so a handler registered while a message is being
+        dispatched (e.g. by wait_for) does not change the list _dispatch is iterating.
+        """
+        msg_id = self._resolve_msg_id(msg_type)
+        entry = (handler, asyncio.iscoroutinefunction(handler))
+        self.handlers[msg_id] = self.handlers.get(msg_id, []) + [entry]
+
+    def unregister_handler(self, msg_type, handler):
+        """Remove a handler. Message types left without subscribers are dropped by the receive loop."""
+        msg_id = self._resolve_msg_id(msg_type)
+        entries = [entry for entry in self.handlers.get(msg_id, []) if entry[0] != handler]
+        if entries:
+            self.handlers[msg_id] = entries
+        else:
+            self.handlers.pop(msg_id, None)
+
+    async def wait_for(self, drone_id, msg_type, predicate=None, timeout=None):
+        """
+        Wait for the next message of msg_type from drone_id (None for any drone) that satisfies predicate(msg).
+        The message is resolved by the receive loop, so it is still delivered to every other handler.
+        Must be awaited on the dispatcher's loop. Returns the message, or None on timeout.
+        """
+        msg_id = self._resolve_msg_id(msg_type)
+        future = asyncio.get_running_loop().create_future()
+        entry = (drone_id, predicate, future)
+        waiters = self.waiters.get(msg_id)
+        if waiters is None:
+            waiters = self.waiters[msg_id] = []
+            self.register_handler(msg_id, self._resolve_waiters)
+        waiters.append(entry)
         try:
-            self.master = mavutil.mavlink_connection('tcp:127.0.0.1:14550', mavlink_version="2.0")
-            self.master.wait_heartbeat()
-            print("Connected to MAVLink")
-            return True
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters.remove(entry)
+            if not waiters:
+                del self.waiters[msg_id]
+                self.unregister_handler(msg_id, self._resolve_waiters)
+
+    def _resolve_waiters(self, drone_id, msg):
+        for waiter_drone, predicate, future in self.waiters.get(msg.get_msgId(), ()):
+            if future.done():
+                continue
+            if waiter_drone is not None and waiter_drone != drone_id:
+                continue
+            if predicate is None or predicate(msg):
+                future.set_result(msg)
+
+    def _register_default_handlers(self):
+        self.register_handler("HEARTBEAT", self._on_heartbeat)
+        self.register_handler("GLOBAL_POSITION_INT", self._on_global_position_int)
+        self.register_handler("ATTITUDE", self._on_attitude)
+        self.register_handler("SYS_STATUS", self._on_sys_status)
+        self.register_handler("MISSION_COUNT", self._on_mission_count)
+        self.register_handler("MISSION_REQUEST", self._on_mission_request)
+        self.register_handler("MISSION_REQUEST_INT", self._on_mission_request)
+        self.register_handler("MISSION_ACK", self._on_mission_ack)
+        self.register_handler("COMMAND_ACK", self._on_command_ack)
+        self.register_handler("MISSION_ITEM_REACHED", self._on_mission_item_reached)
+        self.register_handler("MISSION_ITEM", self._on_mission_item)
+        self.register_handler("MISSION_ITEM_INT", self._on_mission_item)
+        self.register_handler("MISSION_CURRENT", self._on_mission_current)
+        self.register_handler("CAMERA_TRIGGER", self._on_camera_trigger)
+
+    # Message handlers, called from the receive loop with (drone_id, msg)
+    def _on_heartbeat(self, drone_id, msg):
+        if self.liveness.heard(drone_id):
+            # First heartbeat from this drone: register it (never dropped) and negotiate its telemetry rates
+            self.events.post(drone_id, self.missionState.handle_drone_discovered, drone_id, msg.system_status, droppable=False)
+            if drone_id not in self.stream_rates.phases:
+                self.stream_rates.set_phase(drone_id, DEFAULT_PHASE)
+            return
+        self.events.post(drone_id, self.missionState.updateDroneStatus, drone_id, msg.system_status)
+
+    def _on_liveness_change(self, drone_id, state, previous):
+        if state == STALE:
+            print(f"Drone {drone_id} missed heartbeats for {self.liveness.stale_after:.0f} s")
+            self.events.post(drone_id, self.missionState.handle_drone_stale, drone_id, droppable=False)
+        elif state == LOST:
+            print(f"Drone {drone_id} lost: no heartbeat for {self.liveness.lost_after:.0f} s")
+            self.events.post(drone_id, self.missionState.handle_drone_lost, drone_id, droppable=False)
+        elif state == ALIVE:
+            print(f"Drone {drone_id} heard again after being {previous}")
+            if previous == LOST:
+                # it may have rebooted, ask for its telemetry again
+                self.stream_rates.set_phase(drone_id, self.stream_rates.phases.get(drone_id, DEFAULT_PHASE))
+            self.events.post(drone_id, self.missionState.handle_drone_recovered, drone_id, previous, droppable=False)
+
+    def _on_global_position_int(self, drone_id, msg):
+        if self.waiting_for_takeoff:
+            for x in list(self.waiting_for_takeoff):
+                if x[0] == drone_id:
+                    self.handle_check_if_takeoff_complete(drone_id, msg.relative_alt / 1000, x[1], first_item=x[2])
+        self.events.post(
+            drone_id, self.missionState.updateDronePosition,
+            drone_id, msg.lat, msg.lon, msg.alt, msg.relative_alt,
+            msg.hdg, msg.vx, msg.vy, msg.vz
+        )
+
+    def _on_attitude(self, drone_id, msg):
+        self.events.post(drone_id, self.missionState.updateDroneTelemetry, drone_id, msg.roll, msg.pitch, msg.yaw)
+
+    def _on_sys_status(self, drone_id, msg):
+        self.events.post(drone_id, self.missionState.updateDroneBattery, drone_id, msg.battery_remaining)
+
+    def _on_mission_count(self, drone_id, msg):
+        download = self.downloading_missions.get(drone_id)
+        if download is not None:
+            download.on_count(msg.count)
+        else:
+            print(f"Drone {drone_id} has {msg.count} waypoints stored.")
+
+    def _on_mission_request(self, drone_id, msg):
+        upload = self.uploading_missions.get(drone_id)
+        if upload is not None:
+            upload.on_request(msg.seq)
+        else:
+            print(f"Received mission request {msg.seq} from drone {drone_id} with no upload in progress")
+
+    def _on_mission_ack(self, drone_id, msg):
+        upload = self.uploading_missions.get(drone_id)
+        if upload is not None:
+            upload.on_ack(msg.type)
+        else:
+            print(f"Mission acknowledgment received from drone {drone_id}: {msg.type}")
+
+    def _on_command_ack(self, drone_id, msg):
+        if not self.commands.on_ack(drone_id, msg.command, msg.result):
+            print(f"Command acknowledgment received for drone {drone_id}: {msg.command} - {msg.result}")
+
+    def _on_mission_item_reached(self, drone_id, msg):
+        # one-shot event, unlike telemetry a newer message won't repeat it
+        self.events.post(drone_id, self.missionState.handle_reached_waypoint, drone_id, msg.seq, droppable=False)
+
+    def _on_mission_item(self, drone_id, msg):
+        download = self.downloading_missions.get(drone_id)
+        if download is not None:
+            download.on_item(msg)
+        else:
+            print(f"Received waypoint {msg.seq} from drone {drone_id}: ({msg.x}, {msg.y}, {msg.z})")
+
+    def _on_mission_current(self, drone_id, msg):
+        self.events.post(drone_id, self.missionState.handle_mission_state_update, drone_id, msg.mission_state)
+
+    def _on_camera_trigger(self, drone_id, msg):
+        print(f"Camera triggered by drone {drone_id} at time {msg.time_usec}")
+
+    def connect(self, devices="tcp:127.0.0.1:14550"):
+        """Open one or more MAVLink endpoints, e.g. ["tcp:127.0.0.1:14550", "udpin:0.0.0.0:14551", "/dev/ttyUSB0"]."""
+        if isinstance(devices, str):
+            devices = [devices]
+        for device in devices:
+            self.add_connection(device)
+        return self.master is not None
+
+    def add_connection(self, device, heartbeat_timeout=None):
+        """Open another MAVLink endpoint. If the receive loop is already running, it starts reading it right away."""
+        if self.replaying:
+            print(f"Not connecting to {device} while a flight log is replaying")
+            return False
+        try:
+            connection = mavutil.mavlink_connection(device, mavlink_version="2.0")
+            heartbeat = connection.wait_heartbeat(timeout=heartbeat_timeout)
+            if heartbeat is None:
+                print(f"No heartbeat on {device}")
+                connection.close()
+                return False
         except Exception as e:
-            print(f"Error connecting to MAVLink: {e}")
-            self.master = None
+            print(f"Error connecting to MAVLink on {device}: {e}")
             return False
-    
+        print(f"Connected to MAVLink on {device}")
+        self.routes.setdefault(heartbeat.get_srcSystem(), connection)
+        self.connections.append(connection)
+        if self.master is None:
+            self.master = connection
+        if self.receiving:
+            self.loop.call_soon_threadsafe(self._start_connection, connection)
+        return True
+
+    def connection_for(self, drone_id):
+        """The connection a drone is reachable on."""
+        return self.routes.get(drone_id, self.master)
+
+    def mav_for(self, drone_id):
+        """pymavlink MAVLink sender for the link that owns drone_id."""
+        return self.connection_for(drone_id).mav
 
     async def receive_packets(self):
-        """Continuously process MAVLink messages with minimal latency."""
+        """Continuously process MAVLink messages from every connection with minimal latency."""
         if not self.master:
             print("No MAVLink connection established.")
             return
 
+        self.message_queue = asyncio.Queue()
+        self.polled = []
+        self.poll_task = None
+        self.receiving = True
+        health_task = asyncio.ensure_future(self.link_health.report_periodically())
+        liveness_task = asyncio.ensure_future(self.liveness.run())
         try:
-            while True:
-                # Process ALL available messages before sleeping
-                messages_processed = 0
-                
+            for connection in self.connections:
+                self._start_connection(connection)
+            await self._receive_events()
+        except Exception as e:
+            print(f"Dispatcher error: {e}")
+        finally:
+            self.receiving = False
+            health_task.cancel()
+            liveness_task.cancel()
+            if self.poll_task:
+                self.poll_task.cancel()
+            for link in self.links:
+                link.stop()
+            for connection in self.connections:
+                connection.close()
+
+    def _start_connection(self, connection):
+        """Read a connection through the event loop, or poll it if its fd can't be watched."""
+        if self.transport == "event":
+            link = MavlinkLink(
+                connection, self.handlers,
+                on_message=self.message_queue.put_nowait,
+                on_close=self._on_link_closed,
+                routes=self.routes,
+                monitor=self.link_health
+            )
+            if link.start(asyncio.get_running_loop()):
+                link.record_to(self.recorder)
+                self.links.append(link)
+                return
+            print(f"Event-driven reads unavailable for {connection.address}, falling back to polling.")
+        self.polled.append(connection)
+        if self.poll_task is None:
+            self.poll_task = asyncio.ensure_future(self._poll_packets())
+
+    def _on_link_closed(self, link):
+        self.links.remove(link)
+        self.connections.remove(link.connection)
+        link.connection.close()
+        for drone_id in [d for d, c in self.routes.items() if c is link.connection]:
+            del self.routes[drone_id]
+        if link.connection is self.master:
+            self.master = self.connections[0] if self.connections else None
+        if not self.links and not self.polled:
+            self.message_queue.put_nowait(None)  # nothing left to read
+
+    async def _receive_events(self):
+        """Dispatch messages from every link, in arrival order, on this one loop. Nothing runs while links are idle."""
+        queue = self.message_queue
+        while True:
+            msg = await queue.get()
+            if msg is None:
+                break  # all links closed
+            await self._dispatch(msg)
+
+    async def _poll_packets(self):
+        """Fallback reader for connections without a selectable file descriptor."""
+        queue = self.message_queue
+        while True:
+            # Process ALL available messages before sleeping
+            messages_processed = 0
+
+            for connection in self.polled:
                 while True:
-                    msg = self.master.recv_match(blocking=False)
+                    msg = connection.recv_match(blocking=False)
                     if not msg:
                         break  # No more messages, exit loop
 
                     messages_processed += 1
-                    drone_id = msg.get_srcSystem()
-                    msg_type = msg.get_type()
-
-                    if msg_type == "HEARTBEAT":
-                        self.missionState.updateDroneStatus(drone_id, msg.system_status)
-
-                    elif msg_type == "GLOBAL_POSITION_INT":
-                        for x in self.waiting_for_takeoff:
-                            if x[0] == drone_id:
-                                await self.handle_check_if_takeoff_complete(drone_id, msg.relative_alt / 1000, x[1])
-                        self.missionState.updateDronePosition(
-                            drone_id, msg.lat, msg.lon, msg.alt, msg.relative_alt,
-                            msg.hdg, msg.vx, msg.vy, msg.vz
-                        )
-                    elif msg_type == "MISSION_COUNT":
-                        print(f"Drone {drone_id} has {msg.count} waypoints stored.")
-                        self.requeted_missions.insert(drone_id, {
-                            "waypoints": [],
-                            "expected_count": msg.count,
-                            })
-
-                    elif msg_type == "ATTITUDE":
-                        self.missionState.updateDroneTelemetry(
-                            drone_id, msg.roll, msg.pitch, msg.yaw
-                        )
-                    elif msg_type == "MISSION_REQUEST":
-                            print(f"Received mission request {msg.seq} from drone {drone_id}")
-                            await self.handle_mission_request(drone_id, msg.seq)
-
-                    elif msg_type == "MISSION_ACK":
-                            print(f"Mission acknowledgment received from drone {drone_id}: {msg.type}")
-                            await self.handle_mission_ack(drone_id, msg.type)
-
-                    elif msg_type == "COMMAND_ACK":
-                            print(f"Command acknowledgment received for drone {drone_id}: {msg.command} - {msg.result}")
-                    elif msg_type == "MISSION_ITEM_REACHED":
-                            self.missionState.handle_reached_waypoint(drone_id, msg.seq)
-                    
-                    elif msg_type == "MISSION_ITEM":
-                            print(f"Received waypoint {msg.seq} from drone {drone_id}: ({msg.x / 1e7}, {msg.y / 1e7}, {msg.z})")
-                    elif msg_type == "MISSION_CURRENT":
-                            # print(f"Current waypoint count for drone {drone_id}: {msg.total}")
-                            self.missionState.handle_mission_state_update(drone_id, msg.mission_state)
-                    elif msg_type == "CAMERA_TRIGGER":
-                            print(f"Camera triggered by drone {drone_id} at time {msg.time_usec}")
-
-                if messages_processed == 0:
-                    await asyncio.sleep(0.001)  # Only sleep if no messages were processed
-
-        except Exception as e:
-            print(f"Dispatcher error: {e}")
-        finally:
-            if self.master:
-                self.master.close()
+                    self.link_health.on_frame(msg.get_srcSystem(), msg.get_srcComponent(), msg.get_seq(), msg.get_msgId(), time.monotonic())
+                    if msg.get_msgId() == 0 and msg.get_srcSystem() not in self.routes:
+                        self.routes[msg.get_srcSystem()] = connection
+                    if self.recorder is not None:
+                        self.recorder.record(self.recorder.link_id(connection.address), msg.get_msgbuf())
+                    queue.put_nowait(msg)
+
+            await asyncio.sleep(0 if messages_processed else 0.001)  # Only sleep if no messages were processed
+
+    async def _dispatch(self, msg):
+        handlers = self.handlers.get(msg.get_msgId())
+        if handlers is None:
+            return  # Nobody subscribed to this message type
+        drone_id = msg.get_srcSystem()
+        for handler, is_coroutine in handlers:
+            if is_coroutine:
+                await handler(drone_id, msg)
+            else:
+                handler(drone_id, msg)
+
+    def _cancel_upload(self, drone_id):
+        """
+        End the drone's upload in flight, if any, as cancelled and stop routing MISSION_ACKs to it, so the
+        ACK of whatever is sent next (a clear, another upload) can't complete it. Returns True if there was one.
+        """
+        upload = self.uploading_missions.pop(drone_id, None)
+        if upload is None:
+            return False
+        upload.on_ack(mavutil.mavlink.MAV_MISSION_OPERATION_CANCELLED)
+        return True
+
+    async def clear_mission(self, drone_id, timeout=1.0, retries=3):
+        """Send MISSION_CLEAR_ALL and wait for the vehicle's MISSION_ACK, retransmitting on timeout."""
+        if self._cancel_upload(drone_id):
+            print(f"Mission upload to drone {drone_id} cancelled by a mission clear.")
+        for attempt in range(retries):
+            self.mav_for(drone_id).mission_clear_all_send(drone_id, 0)
+            msg = await self.wait_for(drone_id, "MISSION_ACK", timeout=timeout)
+            if msg is not None:
+                print(f"Mission cleared for drone {drone_id}.")
+                if msg.type == mavutil.mavlink.MAV_MISSION_ACCEPTED:
+                    self.uploaded_missions.pop(drone_id, None)
+                    return True
+                return False
+        print(f"Drone {drone_id} did not acknowledge mission clear.")
+        return False
 
-    def clear_mission(self, drone_id):
-        self.master.target_system = drone_id
-        #self.master.waypoint_clear_all_send()
-    
     def arm_drone(self, drone_id):
+        """Arm a drone. Safe to call from any thread, returns a future resolving to the MAV_RESULT."""
+        connection = self.connection_for(drone_id)
         print(f"Arming drone {drone_id}")
-        print(f"target_component: {self.master.target_component}")
-        self.master.target_system = drone_id
-        self.master.set_mode(216)
-        self.master.arducopter_arm()
+        connection.target_system = drone_id
+        connection.set_mode(216)
+        return asyncio.run_coroutine_threadsafe(
+            self.command(drone_id, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1), self.loop
+        )
     
-    def send_mission(self, drone_id, waypoints):
-        """Stop current mission and upload new waypoints for a specific drone."""
+    def send_mission(self, drone_id, waypoints, first_item=0):
+        """Put new waypoints on a specific drone and start flying them from mission item `first_item`."""
         if not self.master:
             print(f"Cannot upload waypoints: MAVLink is not connected!")
             return
 
-        async def mission_task():
-            await self.stop_current_mission(drone_id)  # Stop the current mission
-            await self.upload_mission(drone_id, waypoints)
-
-        asyncio.run_coroutine_threadsafe(mission_task(), self.loop)  # Run coroutine in separate event loop
+        asyncio.run_coroutine_threadsafe(self.replace_mission(drone_id, waypoints, first_item=first_item), self.loop)  # Run coroutine in separate event loop
+
+    async def replace_mission(self, drone_id, waypoints, start=True, first_item=0):
+        """
+        Put waypoints on the drone and start them. Returns True if the vehicle accepted them.
+        When the vehicle holds a mission of the same length from us only the changed items are
+        sent, otherwise the current mission is stopped, cleared and replaced in full.
+        """
+        if not await self.patch_mission(drone_id, waypoints):
+            if not await self.stop_current_mission(drone_id):  # Stop the current mission
+                return False
+            if not await self.upload_mission(drone_id, waypoints):
+                return False
+        if start:
+            await self.start_mission(drone_id, first_item=first_item)
+        return True
+
+    def upload_missions(self, missions, start=True):
+        """
+        Replace the missions of many drones at once, {drone_id: waypoints}. Every drone's
+        stop/upload/start exchange runs concurrently, so the batch takes as long as the slowest drone.
+        Safe to call from any thread, returns a future resolving to {drone_id: accepted}.
+        """
+        if not self.master:
+            print(f"Cannot upload waypoints: MAVLink is not connected!")
+            return None
+        return asyncio.run_coroutine_threadsafe(self.run_missions(missions, start), self.loop)
+
+    async def run_missions(self, missions, start=True):
+        drone_ids = list(missions)
+        print(f"Uploading missions to drones {drone_ids}...")
+        results = await asyncio.gather(
+            *(self.replace_mission(drone_id, missions[drone_id], start) for drone_id in drone_ids),
+            return_exceptions=True
+        )
+        outcome = {}
+        for drone_id, result in zip(drone_ids, results):
+            if isinstance(result, Exception):
+                print(f"Mission upload to drone {drone_id} failed: {result}")
+                result = False
+            outcome[drone_id] = result
+        return outcome
+
+    def _mission_items(self, drone_id, waypoints, start_with_home=True):
+        """Encode a mission the way upload_mission sends it, or None if the drone is unknown."""
+        if start_with_home:
+            drone = self.missionState.get_drone(drone_id)
+            if not drone:
+                print(f"Drone {drone_id} not found.")
+                return None
+            home_lat, home_lon = drone.get_home()
+            waypoints = [(home_lat, home_lon, 10, 1)] + list(waypoints) # add home waypoint to the start of the mission
+        else:
+            waypoints = list(waypoints)
+        # Encode every item up front, each MISSION_REQUEST then just sends the stored payload
+        return MissionItemBuffer(drone_id, waypoints)
+
+    async def _send_items(self, drone_id, items, first=None, last=None):
+        """Run one upload (all items, or items first..last as a partial write) to completion."""
+        if self._cancel_upload(drone_id):
+            print(f"Mission upload to drone {drone_id} already in progress, replacing it.")
+        mav = self.mav_for(drone_id)
+        upload = MissionUpload(mav, drone_id, len(items), lambda seq: items.send(mav, seq), first=first, last=last)
+        self.uploading_missions[drone_id] = upload
+        try:
+            return await upload.run()
+        finally:
+            if self.uploading_missions.get(drone_id) is upload:
+                del self.uploading_missions[drone_id]
 
-    async def upload_mission(self, drone_id, waypoints):
-        """Initiate mission upload using the correct MAVLink protocol."""
+    async def upload_mission(self, drone_id, waypoints, start_with_home=True):
+        """Upload a mission and wait for the vehicle's MISSION_ACK. Returns True if it was accepted."""
         print(f"Uploading mission to drone {drone_id} with {len(waypoints)} waypoints...")
-        print(f"Waypoints: {waypoints}")
-        #append home waypoint to the mission
-        drone = self.missionState.get_drone(drone_id)
-        if not drone:
-            print(f"Drone {drone_id} not found.")
-            return
-        home_lat, home_lon = drone.get_home()
-        waypoints.insert(0, (home_lat, home_lon, 10, 1)) # add home waypoint to the start of the mission
-
-            
-
-        # Clear existing mission
-        self.master.mav.mission_clear_all_send(drone_id, 0)
-        self.unhandled_clears.append(drone_id)
-        await asyncio.sleep(1)  # Allow time for clearing
-
-        self.uploading_missions[drone_id] = {
-            "waypoints": [],  # Clear old waypoints before storing new ones
-            "next_seq": 0,
-            "waiting_for_request": True
-        }
-        self.uploading_missions[drone_id]["waypoints"] = waypoints.copy()
-        print( f"uploading waypoints: {self.uploading_missions[drone_id]['waypoints']}")
-
-        # Send mission count
-        mission_count = len(waypoints)
-        print(f"Sending MISSION_COUNT for {mission_count} waypoints to drone {drone_id}")
-        
-        self.master.mav.mission_count_send(drone_id, 0, mission_count)
-        await asyncio.sleep(2)  # Allow drone time to process
-
-        #Wait for mission requests and respond accordingly
-       
-
-
-    async def handle_mission_request(self, drone_id, seq):
-        """Respond to mission requests from the drone."""
-        mission = self.uploading_missions.get(drone_id)
-        print(f"Received mission request {seq} from drone {drone_id}")
-
-        if mission and seq < len(mission["waypoints"]):
-            lat, lon, alt, type = mission["waypoints"][seq]
-            self.send_waypoint(drone_id, seq, lat, lon, alt, type)
-            mission["next_seq"] = seq + 1
-            mission["waiting_for_request"] = False
-        else:
-            print(f"Received unexpected mission request {seq} from drone {drone_id}")
+        items = self._mission_items(drone_id, waypoints, start_with_home)
+        if items is None:
+            return False
+        # MISSION_COUNT replaces whatever mission the vehicle holds, so no separate clear is needed here
+        accepted = await self._send_items(drone_id, items)
+        if accepted:
+            self.uploaded_missions[drone_id] = items
+        return accepted
+
+    async def patch_mission(self, drone_id, waypoints, start_with_home=True):
+        """
+        Turn the mission last uploaded to the drone into `waypoints` by rewriting only the items
+        that differ, with MISSION_WRITE_PARTIAL_LIST. Returns False if that isn't possible (no
+        mission uploaded, different length, or a partial write was rejected); the caller then
+        needs a full upload.
+        """
+        current = self.uploaded_missions.get(drone_id)
+        if current is None:
+            return False
+        items = self._mission_items(drone_id, waypoints, start_with_home)
+        if items is None or len(items) != len(current):
+            return False
+        ranges = current.changed_ranges(items)
+        if not ranges:
+            print(f"Drone {drone_id} already holds this mission, nothing to upload.")
+            return True
+        sent = sum(last - first + 1 for first, last in ranges)
+        print(f"Patching mission on drone {drone_id}: {sent} of {len(items)} items in {len(ranges)} partial writes")
+        for first, last in ranges:
+            if not await self._send_items(drone_id, items, first, last):
+                # the vehicle holds some mix of both missions now, only a full upload is safe
+                self.uploaded_missions.pop(drone_id, None)
+                return False
+        self.uploaded_missions[drone_id] = items
+        return True
+
+    async def download_mission(self, drone_id, window=8):
+        """Download the vehicle's mission, `window` item requests in flight at once. Returns a MissionItemBuffer or None."""
+        if drone_id in self.downloading_missions:
+            print(f"Mission download from drone {drone_id} already in progress, replacing it.")
+            self.downloading_missions[drone_id].cancel()
+        download = MissionDownload(self.mav_for(drone_id), drone_id, window)
+        self.downloading_missions[drone_id] = download
+        try:
+            return await download.run()
+        finally:
+            if self.downloading_missions.get(drone_id) is download:
+                del self.downloading_missions[drone_id]
+
+    async def verify_mission(self, drone_id, skip_home=True):
+        """
+        Download the vehicle's mission and compare its checksum with the last accepted upload.
+        ArduPilot rewrites item 0 with the actual home position, so it is skipped unless skip_home=False.
+        Returns True if the missions match.
+        """
+        uploaded = self.uploaded_missions.get(drone_id)
+        if uploaded is None:
+            print(f"No uploaded mission to verify for drone {drone_id}.")
+            return False
+        downloaded = await self.download_mission(drone_id)
+        if downloaded is None:
+            return False
+        start = 1 if skip_home else 0
+        if downloaded.checksum(start) == uploaded.checksum(start):
+            print(f"Mission on drone {drone_id} verified ({len(downloaded)} items).")
+            return True
+        print(f"Mission on drone {drone_id} differs from the upload at items {uploaded.mismatches(downloaded, start)}")
+        return False
 
-    def send_waypoint(self, drone_id, index, lat, lon, alt, waypoint_type=0):
-        """Send a specific waypoint in response to a mission request."""
-        
-        print(f"Sending waypoint {index} to drone {drone_id}: {lat}, {lon}, {alt}")
-        if waypoint_type == 0: # Normal Waypoint
-            self.master.mav.mission_item_int_send(
-                drone_id,  # Target drone
-                0,  # Target component
-                index,  # Waypoint index
-                mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
-                mavutil.mavlink.MAV_CMD_NAV_WAYPOINT,
-                0,  # Current waypoint flag
-                1,  # Auto-continue
-                0, 2.0, 0, 0,  # Empty params
-                int(lat * 1e7), int(lon * 1e7), alt
-            )
-            print(f"Waypoint {index} sent to drone {drone_id}: {lat}, {lon}, {alt}")
-        elif waypoint_type == 1: # Takeoff Command
-            self.master.mav.mission_item_int_send(
-                drone_id,  # Target drone
-                0,  # Target component
-                index,  # Waypoint index
-                mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
-                mavutil.mavlink.MAV_CMD_NAV_TAKEOFF,
-                0,  # Current waypoint flag
-                1,  # Auto-continue
-                0,  # pitch
-                0, 0,  # Empty params
-                0, #yaw
-                lat, lon, alt
-            )
-            print(f"Waypoint {index} sent to drone {drone_id}: {lat}, {lon}, {alt}")
-        elif waypoint_type == 2: # Loiter turns Command
-            self.master.mav.mission_item_int_send(
-                drone_id,  # Target drone
-                0,  # Target component
-                index,  # Waypoint index
-                mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
-                mavutil.mavlink.MAV_CMD_NAV_LOITER_TURNS,
-                0,  # Current waypoint flag
-                1,  # Auto-continue
-                3,  # Number of turns
-                0,  # Heading
-                12, #Radius (m)
-                0,  #NA for copters
-                int(lat * 1e7), int(lon * 1e7), alt
+    def verify_missions(self, drone_ids=None, skip_home=True):
+        """
+        Verify the missions of many drones concurrently (default: every drone with an uploaded mission).
+        Safe to call from any thread, returns a future resolving to {drone_id: matches}.
+        """
+        async def verify_all():
+            targets = list(self.uploaded_missions) if drone_ids is None else list(drone_ids)
+            results = await asyncio.gather(
+                *(self.verify_mission(drone_id, skip_home) for drone_id in targets), return_exceptions=True
             )
-            print(f"Waypoint {index} sent to drone {drone_id}: {lat}, {lon}, {alt}")
-
-
-    async def handle_mission_ack(self, drone_id, ack_type):
-        """Handle final mission acknowledgment."""
-        if drone_id in self.unhandled_clears:
-            self.unhandled_clears.remove(drone_id)
-            print(f"Mission cleared for drone {drone_id}.")
-            return
-        if ack_type == mavutil.mavlink.MAV_MISSION_ACCEPTED:
-            print(f"Mission upload to drone {drone_id} completed successfully!")
-            await self.start_mission(drone_id)
-        else:
-            print(f"Mission upload failed for drone {drone_id} with error code {ack_type}")
+            return {drone_id: result is True for drone_id, result in zip(targets, results)}
+        return asyncio.run_coroutine_threadsafe(verify_all(), self.loop)
 
     async def wait_for_arming(self, drone_id, timeout=10):
         """Wait until the drone is armed before continuing."""
         print(f"Waiting for drone {drone_id} to arm...")
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            msg = self.master.recv_match(type="HEARTBEAT", blocking=False)
-            if msg and msg.get_srcSystem() == drone_id:
-                if msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED:
-                    print(f"Drone {drone_id} is now armed!")
-                    return True
-            await asyncio.sleep(0.5)
+        msg = await self.wait_for(
+            drone_id, "HEARTBEAT",
+            lambda m: m.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED,
+            timeout
+        )
+        if msg is not None:
+            print(f"Drone {drone_id} is now armed!")
+            return True
         print(f"Warning: Drone {drone_id} did not arm within timeout!")
         return False
     
     async def wait_for_mode(self, drone_id, target_mode, timeout=10):
         """Wait until the drone changes to the desired mode."""
         print(f"Waiting for drone {drone_id} to switch to {target_mode} mode...")
-        start_time = time.time()
         mode_mapping = {
             "GUIDED": 4,
             "AUTO": 3,
@@ -286,29 +585,26 @@ class Dispatcher:
         if target_mode_id is None:
             print(f"Invalid target mode: {target_mode}")
             return False
-        
-        while time.time() - start_time < timeout:
-            msg = self.master.recv_match(type="HEARTBEAT", blocking=False)
-            if msg and msg.get_srcSystem() == drone_id:
-                if msg.custom_mode == target_mode_id:
-                    print(f"Drone {drone_id} is now in {target_mode} mode!")
-                    return True
-            await asyncio.sleep(0.5)
+
+        msg = await self.wait_for(drone_id, "HEARTBEAT", lambda m: m.custom_mode == target_mode_id, timeout)
+        if msg is not None:
+            print(f"Drone {drone_id} is now in {target_mode} mode!")
+            return True
         print(f"Warning: Drone {drone_id} did not switch to {target_mode} mode within timeout!")
         return False
 
-    async def start_mission(self, drone_id, takeoff_altitude=10):
+    async def start_mission(self, drone_id, takeoff_altitude=10, first_item=0):
         drone = self.missionState.get_drone(drone_id)
         takeoff_altitude = drone.operatingAltitude
         if not drone:
             print(f"Drone {drone_id} not found.")
             return 
         if drone.system_status == 3: #drone is grounded need to add takeoff
-            await  self.takeoff(drone_id, takeoff_altitude)
+            await  self.takeoff(drone_id, takeoff_altitude, first_item)
             
             return
         # Set mode to AUTO
-        self.master.mav.set_mode_send(
+        self.mav_for(drone_id).set_mode_send(
             drone_id,
             mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
             3  # AUTO mode
@@ -317,19 +613,21 @@ class Dispatcher:
             print(f"Mission aborted: Drone {drone_id} failed to switch to AUTO mode.")
             return
         # Start the mission
-        self.master.mav.command_long_send(
-            drone_id, 0,
-            mavutil.mavlink.MAV_CMD_MISSION_START,
-            0, 0, 0, 0, 0, 0, 0, 0
-        )
+        result = await self.command(drone_id, mavutil.mavlink.MAV_CMD_MISSION_START, first_item)
+        if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            print(f"Drone {drone_id} did not start the mission (result {result}).")
 
         
     
+    def takeoff_drone(self, drone_id, altitude):
+        """Arm and take off. Safe to call from any thread, returns a future resolving when the takeoff command is done."""
+        return asyncio.run_coroutine_threadsafe(self.takeoff(drone_id, altitude), self.loop)
+
     #Handles arming and takeoff of drone when grounded
-    async def takeoff(self, drone_id, altitude):
-        """Send the takeoff command to the drone."""
+    async def takeoff(self, drone_id, altitude, first_item=0):
+        """Send the takeoff command to the drone. The mission starts from `first_item` once it reaches altitude."""
         # Step 1: Set mode to GUIDED
-        self.master.mav.set_mode_send(
+        self.mav_for(drone_id).set_mode_send(
             drone_id,
             mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
             4  # GUIDED mode
@@ -338,11 +636,10 @@ class Dispatcher:
             print(f"Mission aborted: Drone {drone_id} failed to switch to GUIDED mode.")
             return
         # Step 2: Arm the drone and wait for confirmation
-        self.master.mav.command_long_send(
-            drone_id, 0,
-            mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM,
-            0, 1, 21196, 0, 0, 0, 0, 0
-        )
+        result = await self.command(drone_id, mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1, 21196)
+        if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            print(f"Mission aborted: Drone {drone_id} refused to arm (result {result}).")
+            return
         if not await self.wait_for_arming(drone_id):
             print(f"Mission aborted: Drone {drone_id} failed to arm.")
             return
@@ -352,32 +649,65 @@ class Dispatcher:
         if not drone:
             print(f"Drone {drone_id} not found.")
             return 
-        self.master.mav.command_long_send(
+        waiting = (drone_id, altitude, first_item)
+        self.waiting_for_takeoff.append(waiting)
+        result = await self.command(
             drone_id,
-            0,
             mavutil.mavlink.MAV_CMD_NAV_TAKEOFF,
             0,
             0,
             0,
             0,
-            0,
             drone.latitude,
             drone.longitude,
             altitude
         )
-        self.waiting_for_takeoff.append((drone_id, altitude))
+        if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            print(f"Mission aborted: Drone {drone_id} refused takeoff (result {result}).")
+            if waiting in self.waiting_for_takeoff:
+                self.waiting_for_takeoff.remove(waiting)
     
-    async def handle_check_if_takeoff_complete(self, drone_id, rel_alt, target_alt, tolerance=.5):
-        """Check if the drone has reached the target altitude after takeoff."""
+    def handle_check_if_takeoff_complete(self, drone_id, rel_alt, target_alt, tolerance=.5, first_item=0):
+        """Check if the drone has reached the target altitude after takeoff, then start its mission from first_item."""
         if abs(rel_alt - target_alt) <= tolerance:
             print(f"Drone {drone_id} has taken off to the target altitude of {target_alt}m.")
-            self.waiting_for_takeoff.remove((drone_id, target_alt))
-            await self.start_mission(drone_id)
+            self.waiting_for_takeoff.remove((drone_id, target_alt, first_item))
+            # Runs as its own task: start_mission waits on heartbeats that this receive loop delivers
+            asyncio.ensure_future(self.start_mission(drone_id, first_item=first_item))
         else:
             print(f"Drone {drone_id} is still climbing. Current altitude: {rel_alt}m, Target altitude: {target_alt}m.")
         
 
     
+    def send_command(self, drone_id, command, param1=0, param2=0, param3=0, param4=0, param5=0, param6=0, param7=0):
+        """
+        Queue a COMMAND_LONG to a drone (on the dispatcher loop). Returns a future resolving to the
+        MAV_RESULT of its COMMAND_ACK, or None if the drone never acknowledged it despite retries.
+        """
+        return self.commands.submit(drone_id, command, param1, param2, param3, param4, param5, param6, param7)
+
+    async def command(self, drone_id, command, *params):
+        """Send a COMMAND_LONG and wait for its acknowledgment. Returns the MAV_RESULT or None."""
+        return await self.send_command(drone_id, command, *params)
+
+    def broadcast_command(self, command, *params, drone_ids=None):
+        """
+        Send the same COMMAND_LONG to many drones (every known drone by default) with all of them in
+        flight at once. Safe to call from any thread, returns a future resolving to {drone_id: MAV_RESULT or None}.
+        """
+        return asyncio.run_coroutine_threadsafe(self.broadcast(command, *params, drone_ids=drone_ids), self.loop)
+
+    async def broadcast(self, command, *params, drone_ids=None):
+        drone_ids = list(self.routes) if drone_ids is None else list(drone_ids)
+        results = await asyncio.gather(*(self.command(drone_id, command, *params) for drone_id in drone_ids))
+        return dict(zip(drone_ids, results))
+
+    def set_stream_phase(self, drone_id, phase):
+        """Switch a drone's telemetry rate profile (transit, search, investigate). Safe to call from any thread."""
+        if not self.master:
+            return
+        self.loop.call_soon_threadsafe(self.stream_rates.set_phase, drone_id, phase)
+
     def return_to_launch(self, drone_id):
         """Send the RTL command to the drone."""
         if not self.master:
@@ -385,35 +715,66 @@ class Dispatcher:
             return
 
         print(f"Sending RTL command to drone {drone_id}...")
-        self.master.mav.command_long_send(
-            drone_id,
-            0,  # Target component
-            mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH,
-            0,  # Confirmation
-            0,  # No parameters needed
-            0, 0, 0, 0, 0, 0
-        )
+
+        async def rtl():
+            result = await self.command(drone_id, mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH)
+            if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+                print(f"Drone {drone_id} did not accept RTL (result {result}).")
+            return result
+        # Every call is in flight at once, so RTL to the whole swarm costs about one round trip
+        return asyncio.run_coroutine_threadsafe(rtl(), self.loop)
     
-    def ack(self, keyword):
-        """wait for the drone to acknowledge a command"""
-        print(str(self.master.recv_match(type=keyword, blocking=True)))
+    def return_to_launch_all(self, drone_ids=None):
+        """Send RTL to every drone in drone_ids (all known drones by default) at once."""
+        if not self.master:
+            print(f"Cannot send RTL command: MAVLink is not connected!")
+            return None
+        print(f"Sending RTL command to drones {drone_ids if drone_ids is not None else list(self.routes)}...")
+
+        async def rtl_all():
+            results = await self.broadcast(mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH, drone_ids=drone_ids)
+            for drone_id, result in results.items():
+                if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+                    print(f"Drone {drone_id} did not accept RTL (result {result}).")
+            return results
+        return asyncio.run_coroutine_threadsafe(rtl_all(), self.loop)
+
+    def link_stats(self, drone_id=None, timeout=1.0):
+        """
+        Link health for one drone (or {drone_id: stats} for all): loss, per-type rates and jitter,
+        command round trips. Blocking, call from outside the dispatcher loop.
+        """
+        async def collect():
+            return self.link_health.summary() if drone_id is None else self.link_health.drone_stats(drone_id)
+        return asyncio.run_coroutine_threadsafe(collect(), self.loop).result(timeout)
+
+    def liveness_states(self, timeout=1.0):
+        """{drone_id: (state, seconds since its last heartbeat)}. Blocking, call from outside the dispatcher loop."""
+        async def collect():
+            return self.liveness.states()
+        return asyncio.run_coroutine_threadsafe(collect(), self.loop).result(timeout)
+
+    def ack(self, keyword, drone_id=None, timeout=None):
+        """wait for the drone to acknowledge a command (blocking, call from outside the dispatcher loop)"""
+        future = asyncio.run_coroutine_threadsafe(self.wait_for(drone_id, keyword, timeout=timeout), self.loop)
+        print(str(future.result()))
     
     def request_mission_list(self, drone_id):
-        """Request the mission list from the drone."""
+        """Download the mission from the drone. Safe to call from any thread, returns a future resolving to a MissionItemBuffer."""
         if not self.master:
             print(f"Cannot request mission list: MAVLink is not connected!")
-            return
+            return None
 
         print(f"Requesting mission list from drone {drone_id}...")
-        self.master.mav.mission_request_list_send(drone_id, 0)
+        return asyncio.run_coroutine_threadsafe(self.download_mission(drone_id), self.loop)
 
 
     async def stop_current_mission(self, drone_id):
-        """Stop the current mission and set the drone to GUIDED mode."""
+        """Stop the current mission and set the drone to GUIDED mode. Returns True once the mission is cleared."""
         print(f"Stopping current mission for drone {drone_id}...")
 
         # Switch to GUIDED mode (manual control to prevent mission resuming)
-        self.master.mav.set_mode_send(
+        self.mav_for(drone_id).set_mode_send(
             drone_id,
             mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
             4  # GUIDED mode
@@ -421,17 +782,61 @@ class Dispatcher:
         
         if not await self.wait_for_mode(drone_id, "GUIDED"):
             print(f"Failed to switch drone {drone_id} to GUIDED mode before mission upload!")
-            return
+            return False
 
-        # Clear current mission
+        # Clear current mission, continuing as soon as the vehicle acknowledges
         print(f"Clearing current mission for drone {drone_id}...")
-        self.master.mav.mission_clear_all_send(drone_id, 0)
-        self.unhandled_clears.append(drone_id)
-
-        await asyncio.sleep(1)  # Allow time for mission clearing
+        return await self.clear_mission(drone_id)
+
+    def start_recording(self, path):
+        """Log the raw bytes of every link to a flight log at `path` (appends if it exists)."""
+        def start():
+            if self.recorder is not None:
+                self.recorder.close()
+            self.recorder = FlightLogRecorder(path)
+            for link in self.links:
+                link.record_to(self.recorder)
+            print(f"Recording flight log to {path}")
+        self.loop.call_soon_threadsafe(start)
+
+    def stop_recording(self):
+        def stop():
+            if self.recorder is None:
+                return
+            for link in self.links:
+                link.record_to(None)
+            self.recorder.close()
+            print(f"Flight log {self.recorder.path} closed: {self.recorder.records} records, {self.recorder.bytes} bytes")
+            self.recorder = None
+        self.loop.call_soon_threadsafe(stop)
+
+    def replay(self, path, speed=1.0):
+        """
+        Replay a flight log through the message handlers at `speed` x real time (None = as fast as possible).
+        Returns a concurrent future resolving to the replay stats (messages, elapsed, messages_per_second...).
+        """
+        return asyncio.run_coroutine_threadsafe(FlightLogReplay(self, path, speed).run(), self.loop)
+
+    def event_metrics(self):
+        """Depth, drop and throughput counters of the queue feeding missionState."""
+        return self.events.metrics()
+
+    async def _close(self):
+        """Cancel the receive loop and everything it started, so nothing is left pending when the loop stops."""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.recorder is not None:
+            self.recorder.close()
 
     def shutdown(self):
         """Cleanly stops the background event loop and thread."""
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(5)
+        except Exception as e:
+            print(f"Error closing dispatcher tasks: {e}")
+        self.events.stop()
         self.loop.call_soon_threadsafe(self.loop.stop)
         self.mission_thread.join()
     
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import deque
+from pymavlink import mavutil
+
+
+class PendingCommand:
+    def __init__(self, drone_id, command, params, future):
+        self.drone_id = drone_id
+        self.command = command
+        self.params = params
+        self.future = future
+        self.attempts = 0  # transmissions so far, sent as the COMMAND_LONG confirmation field
+        self.timer = None
+        self.sent_at = None
+
+
+class CommandQueue:
+    """
+    COMMAND_LONG sender that correlates COMMAND_ACKs with the commands they answer.
+
+    Every command gets a future that resolves to the MAV_RESULT of its ack, or None if the vehicle
+    never answered. In-flight commands are keyed by (drone, command id) since that is all an ack
+    carries, so a second command with the same id for the same drone waits in that drone's queue
+    until the first resolves. Unanswered commands are retransmitted every `ack_timeout` seconds
+    with the confirmation field incremented, up to `max_retries` times. Sends are paced per link
+    with a token bucket (`link_rate` commands/s, bursts of `link_burst`) so a swarm-wide command
+    doesn't overrun a telemetry radio, while every drone's command is still in flight at once.
+    Runs on the dispatcher's event loop.
+    """
+
+    def __init__(self, dispatcher, ack_timeout=1.0, max_retries=3, link_rate=100.0, link_burst=20):
+        self.dispatcher = dispatcher
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.link_rate = link_rate
+        self.link_burst = link_burst
+        self.in_flight = {}  # (drone_id, command) -> PendingCommand
+        self.waiting = {}  # drone_id -> deque of PendingCommand not sent yet
+        self.ready = deque()  # PendingCommand (first sends and retransmits) waiting for a link token
+        self.buckets = {}  # connection -> [tokens, last refill time]
+        self.pump_handle = None
+
+    def submit(self, drone_id, command, *params):
+        """Queue a command. Returns a future resolving to the ack's MAV_RESULT, or None on timeout."""
+        params = tuple(params) + (0,) * (7 - len(params))
+        pending = PendingCommand(drone_id, command, params, asyncio.get_running_loop().create_future())
+        if (drone_id, command) in self.in_flight:
+            self.waiting.setdefault(drone_id, deque()).append(pending)
+        else:
+            self._launch(pending)
+        return pending.future
+
+    def on_ack(self, drone_id, command, result):
+        """Resolve the matching in-flight command. Returns False if the ack wasn't for a tracked command."""
+        pending = self.in_flight.get((drone_id, command))
+        if pending is None:
+            return False
+        if pending.sent_at is not None:
+            self.dispatcher.link_health.on_command_rtt(drone_id, time.monotonic() - pending.sent_at)
+        if result == mavutil.mavlink.MAV_RESULT_IN_PROGRESS:
+            self._arm_timer(pending)  # long-running command, keep waiting for the final ack
+            return True
+        self._finish(pending, result)
+        return True
+
+    def _launch(self, pending):
+        self.in_flight[(pending.drone_id, pending.command)] = pending
+        self.ready.append(pending)
+        self._schedule_pump()
+
+    def _schedule_pump(self):
+        # Pump on the next loop iteration, so commands submitted together go out together
+        if self.pump_handle is not None:
+            self.pump_handle.cancel()
+        self.pump_handle = asyncio.get_running_loop().call_soon(self._pump)
+
+    def _finish(self, pending, result):
+        key = (pending.drone_id, pending.command)
+        if self.in_flight.get(key) is pending:
+            del self.in_flight[key]
+        if pending.timer is not None:
+            pending.timer.cancel()
+            pending.timer = None
+        if not pending.future.done():
+            pending.future.set_result(result)
+        # Start the next queued command for this drone that isn't blocked on the same id
+        waiting = self.waiting.get(pending.drone_id)
+        if waiting:
+            for queued in list(waiting):
+                if (queued.drone_id, queued.command) not in self.in_flight:
+                    waiting.remove(queued)
+                    if not queued.future.cancelled():
+                        self._launch(queued)
+            if not waiting:
+                del self.waiting[pending.drone_id]
+
+    def _pump(self):
+        """Send everything that has a link token, and come back when the next token is due."""
+        self.pump_handle = None
+        now = time.monotonic()
+        delay = None
+        for _ in range(len(self.ready)):
+            pending = self.ready.popleft()
+            if pending.future.done():
+                self._finish(pending, None)  # caller cancelled it
+                continue
+            connection = self.dispatcher.connection_for(pending.drone_id)
+            wait = self._take_token(connection, now)
+            if wait > 0:
+                self.ready.append(pending)
+                delay = wait if delay is None else min(delay, wait)
+                continue
+            self._transmit(pending, connection)
+        if delay is not None and self.pump_handle is None:
+            self.pump_handle = asyncio.get_running_loop().call_later(delay, self._pump)
+
+    def _take_token(self, connection, now):
+        """Consume a token for `connection`. Returns 0 on success, else seconds until one is available."""
+        bucket = self.buckets.get(connection)
+        if bucket is None:
+            bucket = self.buckets[connection] = [float(self.link_burst), now]
+        bucket[0] = min(float(self.link_burst), bucket[0] + (now - bucket[1]) * self.link_rate)
+        bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        return (1.0 - bucket[0]) / self.link_rate
+
+    def _transmit(self, pending, connection):
+        connection.mav.command_long_send(
+            pending.drone_id, 0, pending.command, min(pending.attempts, 255), *pending.params
+        )
+        pending.attempts += 1
+        pending.sent_at = time.monotonic()
+        self._arm_timer(pending)
+
+    def _arm_timer(self, pending):
+        if pending.timer is not None:
+            pending.timer.cancel()
+        pending.timer = asyncio.get_running_loop().call_later(self.ack_timeout, self._on_timeout, pending)
+
+    def _on_timeout(self, pending):
+        pending.timer = None
+        if pending.future.done():
+            self._finish(pending, None)
+            return
+        if pending.attempts > self.max_retries:
+            print(f"Command {pending.command} to drone {pending.drone_id} was not acknowledged after {pending.attempts} attempts")
+            self._finish(pending, None)
+            return
+        self.ready.append(pending)  # retransmit when the link has a token
+        self._schedule_pump()
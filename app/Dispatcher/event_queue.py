@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque, defaultdict
+
+
+class MissionEventQueue:
+    """
+    Bounded hand-off from the Dispatcher's receive loop to missionState.
+
+    The receive loop only posts (handler, args) events; a consumer thread runs them. Each drone
+    has its own queue of at most `max_per_drone` events. When it is full the oldest droppable
+    event (telemetry that a newer sample supersedes) is discarded, so a stalled missionState costs
+    stale positions instead of a stalled MAVLink link. Events posted with droppable=False (e.g.
+    MISSION_ITEM_REACHED) are never discarded. Drones are served round-robin so one chatty drone
+    can't starve the others.
+    """
+    DROP_WARNING_INTERVAL = 5.0  # seconds between "dropping telemetry" prints
+
+    def __init__(self, max_per_drone=64):
+        self.max_per_drone = max_per_drone
+        self.queues = {}  # drone_id -> deque of (handler, args, droppable)
+        self.ready = deque()  # drones with pending events, in service order
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        # metrics
+        self.posted = 0
+        self.pending = 0  # events queued across all drones
+        self.processed = 0
+        self.dropped = defaultdict(int)  # drone_id -> events discarded
+        self.max_depth = 0
+        self.last_drop_warning = 0.0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._consume, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def post(self, drone_id, handler, *args, droppable=True):
+        """Queue handler(*args) for the consumer thread. Never blocks."""
+        with self.condition:
+            queue = self.queues.get(drone_id)
+            if queue is None:
+                queue = self.queues[drone_id] = deque()
+            if not queue:
+                self.ready.append(drone_id)
+            elif len(queue) >= self.max_per_drone:
+                self._drop_oldest(drone_id, queue)
+            queue.append((handler, args, droppable))
+            self.posted += 1
+            self.pending += 1
+            if self.pending > self.max_depth:
+                self.max_depth = self.pending
+            self.condition.notify()
+
+    def _drop_oldest(self, drone_id, queue):
+        """Discard the oldest droppable event. Returns False if every queued event must be kept."""
+        for i, (_, _, droppable) in enumerate(queue):
+            if droppable:
+                del queue[i]
+                self.pending -= 1
+                self.dropped[drone_id] += 1
+                now = time.monotonic()
+                if now - self.last_drop_warning >= self.DROP_WARNING_INTERVAL:
+                    self.last_drop_warning = now
+                    print(f"Mission state is falling behind, dropping old telemetry for drone {drone_id} "
+                          f"({self.dropped[drone_id]} dropped so far)")
+                return True
+        return False
+
+    def _consume(self):
+        while True:
+            with self.condition:
+                while self.running and not self.ready:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                drone_id = self.ready.popleft()
+                queue = self.queues[drone_id]
+                handler, args, _ = queue.popleft()
+                self.pending -= 1
+                if queue:
+                    self.ready.append(drone_id)
+            try:
+                handler(*args)
+            except Exception as e:
+                print(f"Error handling {getattr(handler, '__name__', handler)} for drone {drone_id}: {e}")
+            with self.condition:
+                self.processed += 1
+
+    def total_dropped(self):
+        return sum(self.dropped.values())
+
+    def depth(self, drone_id=None):
+        """Events waiting for the consumer, for one drone or in total."""
+        with self.condition:
+            if drone_id is not None:
+                return len(self.queues.get(drone_id, ()))
+            return self.pending
+
+    def metrics(self):
+        with self.condition:
+            return {
+                "depth": self.pending,
+                "max_depth": self.max_depth,
+                "posted": self.posted,
+                "processed": self.processed,
+                "dropped": self.total_dropped(),
+                "depth_per_drone": {drone_id: len(queue) for drone_id, queue in self.queues.items()},
+                "dropped_per_drone": dict(self.dropped),
+            }
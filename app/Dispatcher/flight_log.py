@@ -0,0 +1,231 @@
+import asyncio
+import os
+import struct
+import time
+import zlib
+from pymavlink import mavutil
+from Dispatcher.mavlink_link import MavlinkLink, MAGIC_V2
+from Dispatcher.liveness import LivenessTracker
+from Dispatcher.stream_rates import StreamRateManager
+
+# File layout: FILE_MAGIC, then chunks of CHUNK_HEADER (magic, record count, payload bytes, crc32)
+# followed by that many records. A record is RECORD_HEADER (receive time, kind, link id, length)
+# and its bytes. RECORD_LINK records name a link id before its first RECORD_DATA record.
+FILE_MAGIC = b"MAVFLOG1"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIII")
+RECORD_HEADER = struct.Struct("<dBHI")
+RECORD_DATA = 0
+RECORD_LINK = 1
+
+
+class FlightLogRecorder:
+    """
+    Append-only binary log of the raw MAVLink bytes read from every Dispatcher link.
+
+    Records are buffered in memory and written as CRC-checked chunks once `chunk_size` bytes
+    are pending or `flush_interval` seconds have passed, so a crash only loses the last chunk.
+    Meant to be called from the dispatcher's event loop thread.
+    """
+
+    def __init__(self, path, chunk_size=256 * 1024, flush_interval=1.0):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new_file:
+            self.file.write(FILE_MAGIC)
+        self.pending = bytearray()
+        self.pending_records = 0
+        self.link_ids = {}  # link address -> id used in records
+        self.last_flush = time.monotonic()
+        self.records = 0
+        self.bytes = 0
+
+    def link_id(self, address):
+        """Id for a link address, announcing it in the log the first time it is seen."""
+        link_id = self.link_ids.get(address)
+        if link_id is None:
+            link_id = len(self.link_ids)
+            self.link_ids[address] = link_id
+            self._append(time.time(), RECORD_LINK, link_id, str(address).encode())
+        return link_id
+
+    def record(self, link_id, data, timestamp=None):
+        """Log one read from a link."""
+        self._append(time.time() if timestamp is None else timestamp, RECORD_DATA, link_id, data)
+        self.bytes += len(data)
+        if len(self.pending) >= self.chunk_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def _append(self, timestamp, kind, link_id, data):
+        self.pending += RECORD_HEADER.pack(timestamp, kind, link_id, len(data))
+        self.pending += data
+        self.pending_records += 1
+        self.records += 1
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending_records:
+            return
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self.pending_records, len(self.pending), zlib.crc32(self.pending)))
+        self.file.write(self.pending)
+        self.file.flush()
+        self.pending.clear()
+        self.pending_records = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_flight_log(path):
+    """
+    Yield (timestamp, kind, link_id, data) records from a flight log, in recorded order.
+    Stops at the first truncated or corrupt chunk, e.g. the tail of a log cut off by a crash.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a flight log")
+        while True:
+            header = f.read(CHUNK_HEADER.size)
+            if not header:
+                return
+            if len(header) < CHUNK_HEADER.size:
+                print(f"Flight log {path}: truncated chunk header, stopping")
+                return
+            magic, count, length, crc = CHUNK_HEADER.unpack(header)
+            payload = f.read(length)
+            if magic != CHUNK_MAGIC or len(payload) < length or zlib.crc32(payload) != crc:
+                print(f"Flight log {path}: corrupt or truncated chunk, stopping")
+                return
+            view = memoryview(payload)
+            offset = 0
+            for _ in range(count):
+                timestamp, kind, link_id, size = RECORD_HEADER.unpack_from(payload, offset)
+                offset += RECORD_HEADER.size
+                yield timestamp, kind, link_id, view[offset:offset + size]
+                offset += size
+
+
+class _NullFile:
+    def write(self, buf):
+        pass
+
+
+class _ReplayConnection:
+    """Stands in for a mavfile during replay: anything the Dispatcher sends is dropped."""
+
+    def __init__(self, address):
+        self.address = address
+        self.fd = None
+        self.mav = mavutil.mavlink.MAVLink(_NullFile(), srcSystem=255, srcComponent=0)
+
+    def close(self):
+        pass
+
+
+class FlightLogReplay:
+    """
+    Feeds a recorded flight log back through a Dispatcher's handlers.
+
+    Bytes go through the same MavlinkLink frame splitter and dispatch table as live traffic, so
+    missionState/GUI see exactly what they saw during the mission. `speed` is a multiple of real
+    time (1.0 = as recorded); None replays as fast as the handlers can take it. Runs on the
+    dispatcher's event loop.
+    Commands the handlers send while replaying must not reach a real vehicle, so a replay only
+    runs on a dispatcher with no open connections. For its duration the dispatcher routes through
+    the replay's own routes and null connections, and replayed heartbeats go to the replay's own
+    liveness tracker (never advanced, so replayed drones don't go stale or lost when the log ends)
+    and stream rate manager. All of them are put back when it ends.
+    """
+    YIELD_EVERY = 256  # records between yields to the loop when replaying at full speed
+
+    def __init__(self, dispatcher, path, speed=1.0):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.speed = speed
+        self.links = {}  # link id -> MavlinkLink
+        self.addresses = {}  # link id -> address the link had when recorded
+        self.routes = {}  # system id -> null connection of the replayed link it was heard on
+        self.master = None  # null connection of the first replayed link
+        self.pending = []
+        self.stats = {"records": 0, "bytes": 0, "messages": 0, "elapsed": 0.0, "messages_per_second": 0.0}
+
+    def _link(self, link_id, address):
+        connection = _ReplayConnection(f"replay:{address}")
+        link = MavlinkLink(
+            connection, self.dispatcher.handlers, on_message=self.pending.append,
+            routes=self.routes, monitor=self.dispatcher.link_health
+        )
+        self.links[link_id] = link
+        if self.master is None:
+            self.master = self.dispatcher.master = connection
+        return link
+
+    @staticmethod
+    def _use_mavlink2(data):
+        # Same switch pymavlink makes when a live link's first frame is MAVLink 2
+        if data and data[0] == MAGIC_V2 and mavutil.mavlink.WIRE_PROTOCOL_VERSION != "2.0":
+            os.environ["MAVLINK20"] = "1"
+            mavutil.set_dialect(mavutil.current_dialect)
+
+    async def run(self):
+        """Replay the whole log. Returns the stats, or None if the dispatcher has live connections."""
+        dispatcher = self.dispatcher
+        if dispatcher.connections or dispatcher.replaying:
+            print(f"Not replaying {self.path}: the dispatcher is connected or already replaying, commands could reach real vehicles")
+            return None
+        saved = (dispatcher.routes, dispatcher.master, dispatcher.liveness, dispatcher.stream_rates)
+        stream_rates = StreamRateManager(dispatcher)
+        dispatcher.routes = self.routes
+        dispatcher.liveness = LivenessTracker(None, dispatcher.liveness.stale_after, dispatcher.liveness.lost_after)
+        dispatcher.stream_rates = stream_rates
+        dispatcher.replaying = True
+        try:
+            return await self._replay()
+        finally:
+            for task in stream_rates.tasks.values():
+                task.cancel()  # no rate negotiation outlives the replay
+            dispatcher.routes, dispatcher.master, dispatcher.liveness, dispatcher.stream_rates = saved
+            dispatcher.replaying = False
+
+    async def _replay(self):
+        dispatcher = self.dispatcher
+        stats = self.stats
+        first_time = None
+        start = time.perf_counter()
+        for timestamp, kind, link_id, data in read_flight_log(self.path):
+            if kind == RECORD_LINK:
+                # links are created lazily so the dialect can follow the first data record
+                self.addresses[link_id] = bytes(data).decode()
+                continue
+            link = self.links.get(link_id)
+            if link is None:
+                self._use_mavlink2(data)
+                link = self._link(link_id, self.addresses.get(link_id, link_id))
+
+            if first_time is None:
+                first_time = timestamp
+            if self.speed:
+                delay = (timestamp - first_time) / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif stats["records"] % self.YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+            link.feed(data)
+            stats["records"] += 1
+            stats["bytes"] += len(data)
+            stats["messages"] += len(self.pending)
+            for msg in self.pending:
+                await dispatcher._dispatch(msg)
+            self.pending.clear()
+
+        stats["elapsed"] = time.perf_counter() - start
+        if stats["elapsed"] > 0:
+            stats["messages_per_second"] = stats["messages"] / stats["elapsed"]
+        print(f"Replayed {self.path}: {stats['messages']} messages in {stats['elapsed']:.2f} s "
+              f"({stats['messages_per_second']:.0f} msg/s)")
+        return stats
@@ -0,0 +1,140 @@
+"""
+Entry module of ProcessDispatcher's MAVLink I/O process.
+
+The child imports this module and what it needs (the Dispatcher, pymavlink), never the script that
+launched the GUI, so it does not load tkinter, LangGraph or the detection model.
+"""
+import concurrent.futures
+import threading
+import traceback
+from Dispatcher.Dispatcher import Dispatcher
+from Dispatcher.telemetry_ring import TelemetryRing, KIND_POSITION, KIND_ATTITUDE, KIND_STATUS, KIND_MISSION_STATE, KIND_BATTERY
+
+
+class _DroneInfo:
+    """What the child's Dispatcher reads from missionState.Drone."""
+    def __init__(self, drone_id):
+        self.drone_id = drone_id
+        self.system_status = None
+        self.operatingAltitude = 10
+        self.latitude = None
+        self.longitude = None
+        self.home_latitude = None
+        self.home_longitude = None
+
+    def get_home(self):
+        return (self.home_latitude, self.home_longitude)
+
+
+class _IOMissionState:
+    """missionState stand-in inside the I/O process: telemetry goes into the ring, one-shot events over the pipe."""
+
+    def __init__(self, ring, send):
+        self.ring = ring
+        self.send = send
+        self.drones = {}  # drone_id -> _DroneInfo
+
+    def get_drone(self, drone_id):
+        return self.drones.get(drone_id)
+
+    def _drone(self, drone_id):
+        drone = self.drones.get(drone_id)
+        if drone is None:
+            drone = self.drones[drone_id] = _DroneInfo(drone_id)
+        return drone
+
+    def configure_drone(self, drone_id, operating_altitude, home_latitude, home_longitude):
+        drone = self._drone(drone_id)
+        drone.operatingAltitude = operating_altitude
+        if home_latitude is not None:
+            drone.home_latitude, drone.home_longitude = home_latitude, home_longitude
+
+    def updateDroneStatus(self, drone_id, system_status):
+        self._drone(drone_id).system_status = system_status
+        self.ring.publish(KIND_STATUS, drone_id, system_status)
+
+    def updateDronePosition(self, drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz):
+        drone = self._drone(drone_id)
+        drone.latitude, drone.longitude = latitude, longitude
+        if drone.home_latitude is None:
+            drone.home_latitude, drone.home_longitude = latitude, longitude
+        self.ring.publish(KIND_POSITION, drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
+
+    def updateDroneTelemetry(self, drone_id, roll, pitch, yaw):
+        self.ring.publish(KIND_ATTITUDE, drone_id, roll, pitch, yaw)
+
+    def handle_mission_state_update(self, drone_id, mission_state):
+        self.ring.publish(KIND_MISSION_STATE, drone_id, mission_state)
+
+    def updateDroneBattery(self, drone_id, battery_remaining):
+        self.ring.publish(KIND_BATTERY, drone_id, battery_remaining)
+
+    # one-shot events must not be dropped, they go over the pipe
+    def handle_drone_discovered(self, drone_id, system_status):
+        self._drone(drone_id).system_status = system_status
+        self.send(("event", "handle_drone_discovered", (drone_id, system_status)))
+
+    def handle_drone_stale(self, drone_id):
+        self.send(("event", "handle_drone_stale", (drone_id,)))
+
+    def handle_drone_lost(self, drone_id):
+        self.send(("event", "handle_drone_lost", (drone_id,)))
+
+    def handle_drone_recovered(self, drone_id, previous_state):
+        self.send(("event", "handle_drone_recovered", (drone_id, previous_state)))
+
+    def handle_reached_waypoint(self, drone_id, waypoint):
+        self.send(("event", "handle_reached_waypoint", (drone_id, waypoint)))
+
+
+def run(conn, ring_name, ring_capacity, dispatcher_options):
+    """Entry point of the I/O process: an ordinary Dispatcher driven by calls from the pipe."""
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                pass  # parent gone or closing
+
+    def reply(call_id, result=None, error=None):
+        try:
+            send(("result", call_id, result, error))
+        except Exception as e:  # e.g. an unpicklable result
+            send(("result", call_id, None, f"could not return result: {e}"))
+
+    def reply_when_done(call_id, future):
+        if future.cancelled():
+            reply(call_id, error="cancelled")
+        elif future.exception() is not None:
+            reply(call_id, error=repr(future.exception()))
+        else:
+            reply(call_id, future.result())
+
+    ring = TelemetryRing.attach(ring_name, ring_capacity)
+    state = _IOMissionState(ring, send)
+    dispatcher = Dispatcher(state, **dispatcher_options)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break  # parent exited
+        if message[0] == "stop":
+            break
+        if message[0] == "drone":
+            state.configure_drone(*message[1:])
+            continue
+        _, call_id, name, args, kwargs = message
+        try:
+            result = getattr(dispatcher, name)(*args, **kwargs)
+        except Exception:
+            reply(call_id, error=traceback.format_exc())
+            continue
+        if isinstance(result, concurrent.futures.Future):
+            result.add_done_callback(lambda future, call_id=call_id: reply_when_done(call_id, future))
+        else:
+            reply(call_id, result)
+    dispatcher.shutdown()
+    ring.close()
+    conn.close()
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from collections import deque
+from pymavlink import mavutil
+
+
+class RateWindow:
+    """Event counter over a sliding window of `buckets` x `bucket_seconds`, in constant memory."""
+    __slots__ = ("bucket_seconds", "counts", "stamps", "started")
+
+    def __init__(self, buckets=10, bucket_seconds=1.0, now=None):
+        self.bucket_seconds = bucket_seconds
+        self.counts = [0] * buckets
+        self.stamps = [-1] * buckets
+        self.started = time.monotonic() if now is None else now
+
+    def add(self, now, n=1):
+        slot = int(now / self.bucket_seconds)
+        i = slot % len(self.counts)
+        if self.stamps[i] != slot:
+            self.stamps[i] = slot
+            self.counts[i] = 0
+        self.counts[i] += n
+
+    def total(self, now):
+        slot = int(now / self.bucket_seconds)
+        size = len(self.counts)
+        return sum(count for count, stamp in zip(self.counts, self.stamps) if slot - stamp < size)
+
+    def rate(self, now):
+        """Events per second over the window (or since `started`, if that is shorter)."""
+        span = min(len(self.counts) * self.bucket_seconds, now - self.started)
+        return self.total(now) / span if span > 0 else 0.0
+
+
+class StreamStats:
+    """Rate and inter-arrival jitter of one message type from one drone."""
+    __slots__ = ("window", "last", "interval", "jitter")
+
+    def __init__(self, started, window_buckets, bucket_seconds):
+        # counted from when the drone was first heard, not this stream's first message, so a burst
+        # (e.g. a mission download) is not read as a rate and every rate shares rx_rate's span
+        self.window = RateWindow(window_buckets, bucket_seconds, started)
+        self.last = None
+        self.interval = None  # smoothed inter-arrival time (s)
+        self.jitter = 0.0  # smoothed deviation from it (s), RFC 3550 style 1/16 gain
+
+    def add(self, now):
+        self.window.add(now)
+        if self.last is not None:
+            gap = now - self.last
+            if self.interval is None:
+                self.interval = gap
+            else:
+                self.jitter += (abs(gap - self.interval) - self.jitter) / 16
+                self.interval += (gap - self.interval) / 16
+        self.last = now
+
+
+class DroneLinkStats:
+    __slots__ = ("received", "lost", "duplicates", "streams", "senders", "rtts", "last_seen")
+
+    def __init__(self, now, window_buckets, bucket_seconds, rtt_samples):
+        self.received = RateWindow(window_buckets, bucket_seconds, now)
+        self.lost = RateWindow(window_buckets, bucket_seconds, now)
+        self.duplicates = 0
+        self.streams = {}  # msg id -> StreamStats
+        self.senders = {}  # component id -> last seq
+        self.rtts = deque(maxlen=rtt_samples)  # recent COMMAND_ACK round trips (s)
+        self.last_seen = now
+
+
+class LinkHealthMonitor:
+    """
+    Per-drone link quality from the raw frame stream.
+
+    MavlinkLink reports every frame header it splits (system, component, seq, msg id), so
+    loss comes from gaps in each sender's MAVLink sequence numbers, and rate/jitter are tracked
+    per message type. The command queue reports COMMAND_ACK round trips. Everything lives in
+    fixed-size sliding windows (`window_buckets` x `bucket_seconds`), so memory stays constant
+    however long a mission runs. Called from the dispatcher's event loop.
+    """
+
+    def __init__(self, window_buckets=10, bucket_seconds=1.0, rtt_samples=64, summary_interval=30.0):
+        self.window_buckets = window_buckets
+        self.bucket_seconds = bucket_seconds
+        self.rtt_samples = rtt_samples
+        self.summary_interval = summary_interval  # seconds between printed summaries, None to disable
+        self.drones = {}  # drone_id -> DroneLinkStats
+
+    def _drone(self, drone_id, now):
+        stats = self.drones.get(drone_id)
+        if stats is None:
+            stats = self.drones[drone_id] = DroneLinkStats(now, self.window_buckets, self.bucket_seconds, self.rtt_samples)
+        return stats
+
+    def on_frame(self, system_id, component_id, seq, msg_id, now):
+        stats = self.drones.get(system_id)
+        if stats is None:
+            stats = self._drone(system_id, now)
+        stats.last_seen = now
+        stats.received.add(now)
+
+        last_seq = stats.senders.get(component_id)
+        stats.senders[component_id] = seq
+        if last_seq is not None:
+            gap = (seq - last_seq - 1) & 0xFF
+            if gap:
+                if gap < 128:
+                    stats.lost.add(now, gap)
+                else:
+                    stats.duplicates += 1  # repeated or reordered frame, not loss
+
+        stream = stats.streams.get(msg_id)
+        if stream is None:
+            stream = stats.streams[msg_id] = StreamStats(stats.received.started, self.window_buckets, self.bucket_seconds)
+        stream.add(now)
+
+    def on_command_rtt(self, drone_id, rtt):
+        self._drone(drone_id, time.monotonic()).rtts.append(rtt)
+
+    def drone_stats(self, drone_id, now=None):
+        """Current statistics for one drone, or None if it has never been heard."""
+        stats = self.drones.get(drone_id)
+        if stats is None:
+            return None
+        now = time.monotonic() if now is None else now
+        received = stats.received.total(now)
+        lost = stats.lost.total(now)
+        rates = {}
+        jitter = {}
+        for msg_id, stream in stats.streams.items():
+            name = _msg_name(msg_id)
+            rates[name] = round(stream.window.rate(now), 2)
+            jitter[name] = round(stream.jitter * 1000, 1)
+        rtts = sorted(stats.rtts)
+        return {
+            "received": received,
+            "lost": lost,
+            "loss_pct": round(100.0 * lost / (received + lost), 2) if received + lost else 0.0,
+            "duplicates": stats.duplicates,
+            "rx_rate": round(stats.received.rate(now), 2),
+            "rates_hz": rates,
+            "jitter_ms": jitter,
+            "rtt_ms": {
+                "samples": len(rtts),
+                "p50": round(rtts[len(rtts) // 2] * 1000, 1) if rtts else None,
+                "p95": round(rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))] * 1000, 1) if rtts else None,
+                "max": round(rtts[-1] * 1000, 1) if rtts else None,
+            },
+            "last_seen_s": round(now - stats.last_seen, 2),
+        }
+
+    def summary(self):
+        now = time.monotonic()
+        return {drone_id: self.drone_stats(drone_id, now) for drone_id in sorted(self.drones)}
+
+    def format_summary(self):
+        lines = ["Link health:"]
+        for drone_id, stats in self.summary().items():
+            rtt = stats["rtt_ms"]["p50"]
+            lines.append(
+                f"  drone {drone_id}: {stats['rx_rate']:.1f} msg/s, loss {stats['loss_pct']:.1f}%, "
+                f"rtt p50 {rtt if rtt is not None else '-'} ms, last seen {stats['last_seen_s']:.1f} s ago"
+            )
+        return "\n".join(lines)
+
+    async def report_periodically(self):
+        """Print a summary every summary_interval seconds. Runs until cancelled."""
+        if not self.summary_interval:
+            return
+        while True:
+            await asyncio.sleep(self.summary_interval)
+            if self.drones:
+                print(self.format_summary())
+
+
+def _msg_name(msg_id):
+    message_type = mavutil.mavlink.mavlink_map.get(msg_id)
+    return message_type.msgname if message_type is not None else str(msg_id)
@@ -0,0 +1,126 @@
+import asyncio
+import math
+import time
+
+ALIVE = "alive"
+STALE = "stale"
+LOST = "lost"
+
+STALE_AFTER = 3.0  # seconds without a heartbeat before a drone is reported stale
+LOST_AFTER = 10.0  # seconds without a heartbeat before it is reported lost
+
+
+class DroneLiveness:
+    __slots__ = ("state", "last_heard", "token")
+
+    def __init__(self, now):
+        self.state = ALIVE
+        self.last_heard = now
+        self.token = 0  # id of the drone's live wheel entry, older entries are ignored when they fire
+
+
+class LivenessTracker:
+    """
+    Heartbeat liveness of every drone on one hashed timer wheel.
+
+    A heartbeat only stores its arrival time. Each drone has a single entry in the wheel at its
+    next deadline (last heartbeat + `stale_after` while alive, + `lost_after` while stale); when the
+    slot comes round the entry checks the latest heartbeat and either re-arms itself at the new
+    deadline or moves the drone to the next state. So heartbeats cost O(1), one tick every
+    `resolution` seconds covers the whole swarm, and nothing polls drones individually.
+    on_change(drone_id, state, previous) is called on every transition, including recovery
+    (back to ALIVE). Runs on the dispatcher's event loop.
+    """
+
+    def __init__(self, on_change=None, stale_after=STALE_AFTER, lost_after=LOST_AFTER, resolution=0.25):
+        if not 0 < stale_after < lost_after:
+            raise ValueError("liveness timeouts must satisfy 0 < stale_after < lost_after")
+        self.on_change = on_change
+        self.stale_after = stale_after
+        self.lost_after = lost_after
+        self.resolution = resolution
+        # entries are never more than lost_after ahead, so one turn of the wheel covers every deadline
+        self.slots = [[] for _ in range(math.ceil(lost_after / resolution) + 2)]
+        self.tick = int(time.monotonic() / resolution)
+        self.drones = {}  # drone_id -> DroneLiveness
+
+    def heard(self, drone_id, now=None):
+        """Record a heartbeat. Returns True if this is the first one from the drone."""
+        now = time.monotonic() if now is None else now
+        record = self.drones.get(drone_id)
+        if record is None:
+            self.drones[drone_id] = record = DroneLiveness(now)
+            self._schedule(drone_id, record, now + self.stale_after)
+            return True
+        record.last_heard = now
+        if record.state != ALIVE:
+            previous = record.state
+            record.state = ALIVE
+            self._schedule(drone_id, record, now + self.stale_after)
+            self._notify(drone_id, ALIVE, previous)
+        return False
+
+    def state(self, drone_id):
+        record = self.drones.get(drone_id)
+        return record.state if record is not None else None
+
+    def states(self, now=None):
+        """{drone_id: (state, seconds since the last heartbeat)} for every drone heard so far."""
+        now = time.monotonic() if now is None else now
+        return {drone_id: (record.state, round(now - record.last_heard, 2)) for drone_id, record in self.drones.items()}
+
+    def _schedule(self, drone_id, record, deadline):
+        record.token += 1
+        slot = max(int(deadline / self.resolution), self.tick + 1)
+        self.slots[slot % len(self.slots)].append((slot, drone_id, record.token))
+
+    def advance(self, now=None):
+        """Fire every wheel slot up to `now`."""
+        now = time.monotonic() if now is None else now
+        target = int(now / self.resolution)
+        steps = min(target - self.tick, len(self.slots))
+        for tick in range(target - steps + 1, target + 1):
+            index = tick % len(self.slots)
+            entries = self.slots[index]
+            if not entries:
+                continue
+            self.slots[index] = []
+            for entry in entries:
+                if entry[0] > target:
+                    self.slots[index].append(entry)  # belongs to a later turn of the wheel
+                else:
+                    self._expire(entry[1], entry[2], now)
+        self.tick = target
+
+    def _expire(self, drone_id, token, now):
+        record = self.drones.get(drone_id)
+        if record is None or record.token != token:
+            return  # re-armed since this entry was added
+        if record.state == ALIVE:
+            deadline, next_state = record.last_heard + self.stale_after, STALE
+        elif record.state == STALE:
+            deadline, next_state = record.last_heard + self.lost_after, LOST
+        else:
+            return
+        if deadline > now:
+            self._schedule(drone_id, record, deadline)  # heard from since, wait for the new deadline
+            return
+        previous = record.state
+        record.state = next_state
+        if next_state == STALE:
+            self._schedule(drone_id, record, record.last_heard + self.lost_after)
+        self._notify(drone_id, next_state, previous)
+
+    def _notify(self, drone_id, state, previous):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(drone_id, state, previous)
+        except Exception as e:
+            print(f"Error handling liveness change of drone {drone_id}: {e}")
+
+    async def run(self):
+        """Turn the wheel every `resolution` seconds. Runs until cancelled."""
+        while True:
+            await asyncio.sleep(self.resolution)
+            self.advance()
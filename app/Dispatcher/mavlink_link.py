@@ -0,0 +1,148 @@
+import time
+from pymavlink import mavutil
+
+MAGIC_V1 = 0xFE
+MAGIC_V2 = 0xFD
+MIN_FRAME_LEN = 8 # smallest possible MAVLink 1 frame (empty payload)
+
+
+class MavlinkLink:
+    """
+    Event-driven reader for a single pymavlink connection.
+
+    The connection's file descriptor is registered with the asyncio loop, so bytes are only
+    read when the OS reports them. Frames are split by looking at the raw header, and only
+    message ids present in `wanted` are decoded into pymavlink message objects.
+
+    If a `routes` dict is given, every HEARTBEAT frame claims its system id for this link
+    (first link to hear a drone owns it), so writes can go back out the same way.
+
+    While `recorder` is set (a FlightLogRecorder), every read is logged as raw bytes.
+    A `monitor` (LinkHealthMonitor) is told about every frame header, decoded or not.
+    """
+    READ_SIZE = 65536
+
+    def __init__(self, connection, wanted, on_message, on_close=None, routes=None, monitor=None):
+        self.connection = connection
+        self.mav = connection.mav
+        self.wanted = wanted  # any mapping/set keyed by msg id, e.g. the Dispatcher handler table
+        self.on_message = on_message
+        self.on_close = on_close
+        self.routes = routes  # system id -> owning connection
+        self.monitor = monitor
+        self.buf = bytearray()
+        self.loop = None
+        self.fd = None
+        self.bad_frames = 0
+        self.recorder = None
+        self.log_id = None
+
+    def start(self, loop):
+        """Register the connection with the event loop. Returns False if the loop or link can't do that."""
+        fd = self.connection.fd
+        if fd is None:
+            return False
+        try:
+            loop.add_reader(fd, self._on_readable)
+        except NotImplementedError:
+            return False  # e.g. the Windows proactor loop
+        self.loop = loop
+        self.fd = fd
+        return True
+
+    def stop(self):
+        if self.loop is not None and self.fd is not None:
+            self.loop.remove_reader(self.fd)
+        self.fd = None
+
+    def record_to(self, recorder):
+        """Start logging this link's raw bytes to `recorder`, or stop with None."""
+        self.recorder = recorder
+        self.log_id = recorder.link_id(self.connection.address) if recorder is not None else None
+
+    def close(self):
+        self.stop()
+        if self.on_close is not None:
+            self.on_close(self)
+
+    def _on_readable(self):
+        try:
+            data = self.connection.recv(self.READ_SIZE)
+        except OSError as e:
+            print(f"MAVLink link error on {self.connection.address}: {e}")
+            self.close()
+            return
+
+        # tcpin accepts and tcp reconnects swap the underlying socket
+        if self.connection.fd != self.fd:
+            self.stop()
+            if not self.start(self.loop):
+                self.close()
+                return
+
+        if not data:
+            if isinstance(self.connection, mavutil.mavtcp):
+                print(f"MAVLink link {self.connection.address} closed by peer")
+                self.close()
+            return
+        if self.recorder is not None:
+            self.recorder.record(self.log_id, data)
+        self.feed(data)
+
+    def feed(self, data):
+        """Split raw bytes into MAVLink frames and decode the ones somebody wants."""
+        buf = self.buf
+        buf += data
+        wanted = self.wanted
+        monitor = self.monitor
+        now = time.monotonic()
+        n = len(buf)
+        i = 0
+        while n - i >= MIN_FRAME_LEN:
+            magic = buf[i]
+            if magic == MAGIC_V2:
+                if n - i < 10:
+                    break
+                frame_len = buf[i + 1] + 12
+                if buf[i + 2] & mavutil.mavlink.MAVLINK_IFLAG_SIGNED:
+                    frame_len += mavutil.mavlink.MAVLINK_SIGNATURE_BLOCK_LEN
+                msg_id = buf[i + 7] | (buf[i + 8] << 8) | (buf[i + 9] << 16)
+                seq, system_id, component_id = buf[i + 4], buf[i + 5], buf[i + 6]
+            elif magic == MAGIC_V1:
+                frame_len = buf[i + 1] + 8
+                msg_id = buf[i + 5]
+                seq, system_id, component_id = buf[i + 2], buf[i + 3], buf[i + 4]
+            else:
+                # Lost sync, skip to the next start-of-frame marker
+                i = self._next_magic(buf, i + 1, n)
+                continue
+
+            if n - i < frame_len:
+                break  # wait for the rest of the frame
+
+            if monitor is not None:
+                monitor.on_frame(system_id, component_id, seq, msg_id, now)
+            if msg_id == 0 and self.routes is not None and system_id not in self.routes:
+                print(f"Drone {system_id} reachable via {self.connection.address}")
+                self.routes[system_id] = self.connection
+
+            if msg_id in wanted:
+                try:
+                    msg = self.mav.decode(buf[i:i + frame_len])
+                except mavutil.mavlink.MAVError:
+                    # Corrupt frame, resync one byte later rather than trusting its length
+                    self.bad_frames += 1
+                    i = self._next_magic(buf, i + 1, n)
+                    continue
+                self.on_message(msg)
+            i += frame_len
+
+        if i:
+            del buf[:i]
+
+    @staticmethod
+    def _next_magic(buf, start, end):
+        v2 = buf.find(MAGIC_V2, start)
+        v1 = buf.find(MAGIC_V1, start)
+        candidates = [pos for pos in (v1, v2) if pos != -1]
+        return min(candidates) if candidates else end
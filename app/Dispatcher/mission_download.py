@@ -0,0 +1,118 @@
+import asyncio
+from pymavlink import mavutil
+from Dispatcher.mission_items import MissionItemBuffer
+
+
+class MissionDownload:
+    """
+    Event-driven, pipelined state machine for one MAVLink mission download.
+
+    MISSION_REQUEST_LIST -> MISSION_COUNT -> (MISSION_REQUEST_INT -> MISSION_ITEM_INT)* -> MISSION_ACK
+
+    Instead of one request per round trip, up to `window` item requests are kept in flight, so a
+    mission downloads in about count / window round trips. Items are stored straight into a
+    MissionItemBuffer as they arrive, in any order. Vehicles answer requests in order, so when an
+    item arrives every earlier request still outstanding was lost and is re-requested right away
+    (once; after that only the timer retries it). The Dispatcher feeds on_count/on_item from the
+    receive loop; a timer re-requests whatever is still outstanding when the vehicle goes quiet,
+    and the download fails after max_retries consecutive timeouts.
+    """
+
+    def __init__(self, mav, drone_id, window=8, item_timeout=1.0, max_retries=5):
+        self.mav = mav
+        self.drone_id = drone_id
+        self.window = window
+        self.item_timeout = item_timeout
+        self.max_retries = max_retries
+        self.items = None  # MissionItemBuffer once MISSION_COUNT arrives
+        self.next_seq = 0  # next item not requested yet
+        self.outstanding = {}  # seq requested but not received -> already re-requested early
+        self.received = 0
+        self.retries = 0
+        self.loop = None
+        self.done = None
+        self.timer = None
+
+    async def run(self):
+        """Run the download to completion. Returns the MissionItemBuffer, or None if it failed."""
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        self._send_request_list()
+        try:
+            return await self.done
+        finally:
+            self._cancel_timer()
+
+    def on_count(self, count):
+        if self.done is None or self.done.done() or self.items is not None:
+            return  # answer to a retransmitted MISSION_REQUEST_LIST
+        self.items = MissionItemBuffer.received(self.drone_id, count)
+        self.retries = 0
+        if count == 0:
+            self._finish()
+            return
+        self._fill_window()
+        self._arm_timer()
+
+    def on_item(self, msg):
+        if self.done is None or self.done.done() or msg.seq not in self.outstanding:
+            return  # duplicate, or an item we did not ask for
+        del self.outstanding[msg.seq]
+        self.items.store(msg)
+        self.received += 1
+        self.retries = 0
+        if self.received == len(self.items):
+            self._finish()
+            return
+        for seq, resent in list(self.outstanding.items()):
+            if seq < msg.seq and not resent:
+                self.outstanding[seq] = True
+                self.mav.mission_request_int_send(self.drone_id, 0, seq)
+        self._fill_window()
+        self._arm_timer()
+
+    def cancel(self):
+        if self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+    def _finish(self):
+        self.mav.mission_ack_send(self.drone_id, 0, mavutil.mavlink.MAV_MISSION_ACCEPTED)
+        print(f"Downloaded {len(self.items)} mission items from drone {self.drone_id}")
+        self.done.set_result(self.items)
+
+    def _fill_window(self):
+        while len(self.outstanding) < self.window and self.next_seq < len(self.items):
+            self.outstanding[self.next_seq] = False
+            self.mav.mission_request_int_send(self.drone_id, 0, self.next_seq)
+            self.next_seq += 1
+
+    def _send_request_list(self):
+        self.mav.mission_request_list_send(self.drone_id, 0)
+        self._arm_timer()
+
+    def _arm_timer(self):
+        self._cancel_timer()
+        self.timer = self.loop.call_later(self.item_timeout, self._on_timeout)
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _on_timeout(self):
+        self.timer = None
+        if self.done.done():
+            return
+        self.retries += 1
+        if self.retries > self.max_retries:
+            print(f"Mission download from drone {self.drone_id} timed out after {self.max_retries} retries")
+            self.done.set_result(None)
+            return
+        if self.items is None:
+            print(f"No mission count from drone {self.drone_id}, resending MISSION_REQUEST_LIST")
+            self._send_request_list()
+            return
+        print(f"Mission item timeout for drone {self.drone_id}, re-requesting {sorted(self.outstanding)}")
+        for seq in sorted(self.outstanding):
+            self.mav.mission_request_int_send(self.drone_id, 0, seq)
+        self._arm_timer()
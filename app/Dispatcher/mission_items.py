@@ -0,0 +1,175 @@
+import struct
+import zlib
+from pymavlink import mavutil
+
+# waypoint type -> (MAV_CMD, (param1, param2, param3, param4), lat/lon given in degrees)
+WAYPOINT_COMMANDS = {
+    0: (mavutil.mavlink.MAV_CMD_NAV_WAYPOINT, (0.0, 2.0, 0.0, 0.0), True), # Normal Waypoint, 2 m acceptance radius
+    1: (mavutil.mavlink.MAV_CMD_NAV_TAKEOFF, (0.0, 0.0, 0.0, 0.0), False), # Takeoff Command, lat/lon are the home position ints (deg * 1e7)
+    2: (mavutil.mavlink.MAV_CMD_NAV_LOITER_TURNS, (3.0, 0.0, 12.0, 0.0), True), # Loiter turns Command, 3 turns, 12 m radius
+}
+
+HEADER_V2 = struct.Struct("<BBBBBBBHB")
+CRC = struct.Struct("<H")
+# what makes two mission items the same: params, x, y, z, seq, command, frame, autocontinue, mission type.
+# Target ids and the current flag are left out, they differ between the uploaded and the downloaded copy.
+CHECKSUM_ITEM = struct.Struct("<ffffiifHHBBB")
+# Unchanged items between two changed runs are resent rather than split into two partial writes:
+# each resent item costs one request/item round trip, each extra partial write about two.
+PARTIAL_MERGE_GAP = 2
+
+
+class MissionItemBuffer:
+    """
+    A whole mission pre-encoded as MISSION_ITEM_INT payloads in one contiguous buffer.
+
+    Waypoints are (lat, lon, alt, waypoint_type) tuples as used by missionState jobs. Every item is
+    converted to int32 lat/lon (deg * 1e7) and packed exactly once when the buffer is built, so
+    answering a MISSION_REQUEST only has to wrap the stored payload in a frame header and CRC.
+    """
+
+    def __init__(self, target_system, waypoints, target_component=0):
+        mavlink = mavutil.mavlink  # resolved late, pymavlink swaps dialect modules once MAVLink 2 is detected
+        self.message_type = mavlink.MAVLink_mission_item_int_message
+        self.msg_id = mavlink.MAVLINK_MSG_ID_MISSION_ITEM_INT
+        self.crc_extra = bytes([self.message_type.crc_extra])
+        self.mavlink2 = float(mavlink.WIRE_PROTOCOL_VERSION) == 2.0
+        self.unpacker = self.message_type.unpacker
+        self.item_size = self.unpacker.size
+        self.target_system = target_system
+        self.target_component = target_component
+        self._allocate(len(waypoints))
+
+        frame = mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT
+        for seq, (lat, lon, alt, waypoint_type) in enumerate(waypoints):
+            command, params, in_degrees = WAYPOINT_COMMANDS[waypoint_type]
+            if in_degrees:
+                x, y = int(lat * 1e7), int(lon * 1e7)
+            else:
+                x, y = int(lat), int(lon)
+            self._pack(
+                seq, params, x, y, float(alt), command, frame,
+                0,  # Current waypoint flag
+                1,  # Auto-continue
+                mavutil.mavlink.MAV_MISSION_TYPE_MISSION
+            )
+
+    @classmethod
+    def received(cls, target_system, count, target_component=0):
+        """Empty buffer for `count` items, filled in with store() as a mission is downloaded."""
+        buffer = cls(target_system, (), target_component)
+        buffer._allocate(count)
+        return buffer
+
+    def _allocate(self, count):
+        self.count = count
+        self.payloads = bytearray(count * self.item_size)
+        self.lengths = [0] * count  # payload length after MAVLink 2 trailing-zero truncation
+
+    def _pack(self, seq, params, x, y, z, command, frame, current, autocontinue, mission_type):
+        offset = seq * self.item_size
+        self.unpacker.pack_into(
+            self.payloads, offset,
+            params[0], params[1], params[2], params[3],
+            x, y, z,
+            seq, command, self.target_system, self.target_component, frame,
+            current, autocontinue, mission_type
+        )
+        length = self.item_size
+        while length > 1 and self.payloads[offset + length - 1] == 0:
+            length -= 1
+        self.lengths[seq] = length
+
+    def store(self, msg):
+        """Store a MISSION_ITEM_INT (or float MISSION_ITEM) received from the vehicle at its seq."""
+        if msg.get_type() == "MISSION_ITEM":
+            x, y = int(round(msg.x * 1e7)), int(round(msg.y * 1e7))
+        else:
+            x, y = msg.x, msg.y
+        self._pack(
+            msg.seq, (msg.param1, msg.param2, msg.param3, msg.param4), x, y, msg.z,
+            msg.command, msg.frame, msg.current, msg.autocontinue,
+            getattr(msg, "mission_type", mavutil.mavlink.MAV_MISSION_TYPE_MISSION)
+        )
+
+    def __len__(self):
+        return self.count
+
+    # struct.Struct can't be pickled, rebuild it (e.g. when a download is returned from the I/O process)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["unpacker"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.unpacker = self.message_type.unpacker
+
+    def _canonical(self, start=0):
+        # packed bytes rather than tuples, so NaN params (unused by some commands) compare equal
+        for fields in self.unpacker.iter_unpack(memoryview(self.payloads)[start * self.item_size:]):
+            yield CHECKSUM_ITEM.pack(*fields[:9], fields[11], fields[13], fields[14])
+
+    def checksum(self, start=0):
+        """CRC32 of the items from `start` on, equal for the same mission however it got here."""
+        crc = zlib.crc32(struct.pack("<H", max(0, self.count - start)))
+        for item in self._canonical(start):
+            crc = zlib.crc32(item, crc)
+        return crc
+
+    def mismatches(self, other, start=0):
+        """Seqs from `start` on where this mission and `other` differ (including items only one of them has)."""
+        different = [
+            start + i for i, (mine, theirs) in enumerate(zip(self._canonical(start), other._canonical(start)))
+            if mine != theirs
+        ]
+        different.extend(range(max(start, min(self.count, other.count)), max(self.count, other.count)))
+        return different
+
+    def payload(self, seq):
+        """Zero-copy view of one item's full (untruncated) payload."""
+        offset = seq * self.item_size
+        return memoryview(self.payloads)[offset:offset + self.item_size]
+
+    def message(self, seq):
+        """Decode one item back into a pymavlink MISSION_ITEM_INT message."""
+        (param1, param2, param3, param4, x, y, z, item_seq, command,
+         target_system, target_component, frame, current, autocontinue, mission_type) = self.unpacker.unpack(self.payload(seq))
+        return self.message_type(
+            target_system, target_component, item_seq, frame, command, current, autocontinue,
+            param1, param2, param3, param4, x, y, z, mission_type
+        )
+
+    def send(self, mav, seq):
+        """Send item `seq` on the given pymavlink MAVLink instance."""
+        if not self.mavlink2 or mav.signing.sign_outgoing:
+            mav.send(self.message(seq))  # let pymavlink handle MAVLink 1 and signing
+            return
+        offset = seq * self.item_size
+        length = self.lengths[seq]
+        buf = bytearray(HEADER_V2.pack(
+            mavutil.mavlink.PROTOCOL_MARKER_V2, length, 0, 0,
+            mav.seq, mav.srcSystem, mav.srcComponent,
+            self.msg_id & 0xFFFF, self.msg_id >> 16
+        ))
+        buf += self.payloads[offset:offset + length]
+        crc = mavutil.mavlink.x25crc(buf[1:])
+        crc.accumulate(self.crc_extra)
+        buf += CRC.pack(crc.crc)
+        mav.file.write(buf)
+        mav.seq = (mav.seq + 1) % 256
+        mav.total_packets_sent += 1
+        mav.total_bytes_sent += len(buf)
+
+    def changed_ranges(self, other, merge_gap=PARTIAL_MERGE_GAP):
+        """
+        (first, last) seq ranges to rewrite so that this mission becomes `other`, for
+        MISSION_WRITE_PARTIAL_LIST. Only meaningful when both have the same length.
+        """
+        ranges = []
+        for seq in self.mismatches(other):
+            if ranges and seq - ranges[-1][1] - 1 <= merge_gap:
+                ranges[-1][1] = seq
+            else:
+                ranges.append([seq, seq])
+        return [tuple(r) for r in ranges]
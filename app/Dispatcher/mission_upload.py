@@ -0,0 +1,100 @@
+import asyncio
+from pymavlink import mavutil
+
+
+class MissionUpload:
+    """
+    Event-driven state machine for one MAVLink mission upload.
+
+    MISSION_COUNT -> (MISSION_REQUEST_INT / MISSION_REQUEST -> MISSION_ITEM_INT)* -> MISSION_ACK
+
+    With `first`/`last` set it patches items first..last of the mission already on the vehicle,
+    announced with MISSION_WRITE_PARTIAL_LIST instead of MISSION_COUNT.
+
+    The Dispatcher feeds it on_request/on_ack from the receive loop. Nothing waits on wall-clock
+    sleeps: a per-item timer retransmits the last frame when the vehicle goes quiet, and the
+    upload fails after max_retries consecutive timeouts.
+    """
+
+    def __init__(self, mav, drone_id, count, send_item, item_timeout=1.0, max_retries=5, first=None, last=None):
+        self.mav = mav
+        self.drone_id = drone_id
+        self.count = count
+        self.partial = first is not None
+        self.first = first if self.partial else 0
+        self.last = last if self.partial else count - 1
+        self.send_item = send_item  # send_item(seq) puts item `seq` on the wire
+        self.item_timeout = item_timeout
+        self.max_retries = max_retries
+        self.last_sent = None  # None until the first item has been requested
+        self.retries = 0
+        self.result = None  # MAV_MISSION_RESULT from the final ack
+        self.loop = None
+        self.done = None
+        self.timer = None
+
+    async def run(self):
+        """Run the upload to completion. Returns True if the vehicle accepted the mission."""
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        self._send_count()
+        try:
+            return await self.done
+        finally:
+            self._cancel_timer()
+
+    def on_request(self, seq):
+        if self.done is None or self.done.done():
+            return
+        if not self.first <= seq <= self.last:
+            print(f"Received unexpected mission request {seq} from drone {self.drone_id}")
+            return
+        self.retries = 0
+        self.last_sent = seq
+        self.send_item(seq)
+        self._arm_timer()
+
+    def on_ack(self, ack_type):
+        if self.done is None or self.done.done():
+            return
+        self.result = ack_type
+        if ack_type == mavutil.mavlink.MAV_MISSION_ACCEPTED:
+            print(f"Mission upload to drone {self.drone_id} completed successfully!")
+            self.done.set_result(True)
+        else:
+            print(f"Mission upload failed for drone {self.drone_id} with error code {ack_type}")
+            self.done.set_result(False)
+
+    def _send_count(self):
+        if self.partial:
+            self.mav.mission_write_partial_list_send(self.drone_id, 0, self.first, self.last)
+        else:
+            self.mav.mission_count_send(self.drone_id, 0, self.count)
+        self._arm_timer()
+
+    def _arm_timer(self):
+        self._cancel_timer()
+        self.timer = self.loop.call_later(self.item_timeout, self._on_timeout)
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _on_timeout(self):
+        self.timer = None
+        if self.done.done():
+            return
+        self.retries += 1
+        if self.retries > self.max_retries:
+            print(f"Mission upload to drone {self.drone_id} timed out after {self.max_retries} retries")
+            self.done.set_result(False)
+            return
+        # Retransmit whatever the vehicle should have answered last
+        if self.last_sent is None:
+            print(f"No mission request from drone {self.drone_id}, resending {'MISSION_WRITE_PARTIAL_LIST' if self.partial else 'MISSION_COUNT'}")
+            self._send_count()
+        else:
+            print(f"Mission request timeout for drone {self.drone_id}, resending item {self.last_sent}")
+            self.send_item(self.last_sent)
+            self._arm_timer()
@@ -0,0 +1,226 @@
+import concurrent.futures
+import itertools
+import multiprocessing
+import sys
+import threading
+import time
+import types
+from Dispatcher import io_process
+from Dispatcher.event_queue import MissionEventQueue
+from Dispatcher.telemetry_ring import TelemetryRing, KIND_POSITION, KIND_ATTITUDE, KIND_STATUS, KIND_MISSION_STATE, KIND_BATTERY
+
+
+class ProcessDispatcher:
+    """
+    The Dispatcher API for missionState, with MAVLink I/O and parsing in a child process.
+
+    The child runs an ordinary Dispatcher, so nothing about links, commands or missions changes;
+    it just no longer shares a GIL with the GUI, detection and plotting. Telemetry comes back
+    through a TelemetryRing in shared memory, polled every `poll_interval` seconds; one-shot
+    events (discovery, liveness, waypoints reached) and call results come back over a pipe.
+    Both are fed into a MissionEventQueue, so missionState sees the same single consumer thread
+    as with an in-process Dispatcher. Calls go over the same pipe; the ones that return a future
+    in Dispatcher return a concurrent future here too.
+    """
+
+    def __init__(self, missionState, ring_capacity=65536, poll_interval=0.01, **dispatcher_options):
+        self.missionState = missionState
+        self.poll_interval = poll_interval
+        self.ring = TelemetryRing.create(ring_capacity)
+        # spawn rather than fork: the GUI process is multi-threaded by the time this runs
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=io_process.run, args=(child_conn, self.ring.name, ring_capacity, dispatcher_options),
+            name="mavlink-io", daemon=True
+        )
+        _start_without_main(self.process)
+        child_conn.close()
+        self.send_lock = threading.Lock()
+        self.pending = {}  # call id -> concurrent Future
+        self.pending_lock = threading.Lock()
+        self.closed = False  # the I/O process is gone, calls fail right away
+        self.call_ids = itertools.count()
+        self.running = True
+        self.master = None  # truthy once a link is connected, like Dispatcher.master
+        self.events = MissionEventQueue()
+        self.events.start()
+        self.pipe_thread = threading.Thread(target=self._read_pipe, daemon=True)
+        self.pipe_thread.start()
+        self.ring_thread = threading.Thread(target=self._read_ring, daemon=True)
+        self.ring_thread.start()
+
+    # Calls into the I/O process
+    def _call(self, name, *args, **kwargs):
+        future = concurrent.futures.Future()
+        with self.pending_lock:
+            if self.closed:
+                future.set_exception(RuntimeError("MAVLink I/O process exited"))
+                return future
+            call_id = next(self.call_ids)
+            self.pending[call_id] = future
+        try:
+            with self.send_lock:
+                self.conn.send(("call", call_id, name, args, kwargs))
+        except (OSError, ValueError) as e:
+            with self.pending_lock:
+                owned = self.pending.pop(call_id, None) is not None
+            if owned:  # otherwise _read_pipe already failed it when the child exited
+                future.set_exception(RuntimeError(f"MAVLink I/O process unreachable: {e}"))
+        return future
+
+    def _sync_drone(self, drone_id):
+        """Send the drone settings the child's Dispatcher reads (operating altitude, home) before a call that uses them."""
+        drone = self.missionState.get_drone(drone_id)
+        if drone is not None and not self.closed:
+            try:
+                with self.send_lock:
+                    self.conn.send(("drone", drone_id, drone.operatingAltitude, drone.home_latitude, drone.home_longitude))
+            except (OSError, ValueError):
+                pass  # the call that follows reports the I/O process is gone
+
+    def connect(self, devices="tcp:127.0.0.1:14550", timeout=None):
+        connected = self._call("connect", devices).result(timeout)
+        if connected:
+            self.master = devices
+        return connected
+
+    def start(self):
+        """Start the receive loop in the I/O process. Returns a future that resolves when it ends."""
+        return self._call("start")
+
+    def arm_drone(self, drone_id):
+        return self._call("arm_drone", drone_id)
+
+    def takeoff_drone(self, drone_id, altitude):
+        self._sync_drone(drone_id)
+        return self._call("takeoff_drone", drone_id, altitude)
+
+    def send_mission(self, drone_id, waypoints, first_item=0):
+        self._sync_drone(drone_id)
+        self._call("send_mission", drone_id, list(waypoints), first_item)
+
+    def upload_missions(self, missions, start=True):
+        for drone_id in missions:
+            self._sync_drone(drone_id)
+        return self._call("upload_missions", {drone_id: list(waypoints) for drone_id, waypoints in missions.items()}, start)
+
+    def verify_missions(self, drone_ids=None, skip_home=True):
+        return self._call("verify_missions", drone_ids, skip_home)
+
+    def request_mission_list(self, drone_id):
+        return self._call("request_mission_list", drone_id)
+
+    def return_to_launch(self, drone_id):
+        return self._call("return_to_launch", drone_id)
+
+    def return_to_launch_all(self, drone_ids=None):
+        return self._call("return_to_launch_all", drone_ids)
+
+    def broadcast_command(self, command, *params, drone_ids=None):
+        return self._call("broadcast_command", command, *params, drone_ids=drone_ids)
+
+    def set_stream_phase(self, drone_id, phase):
+        self._call("set_stream_phase", drone_id, phase)
+
+    def start_recording(self, path):
+        self._call("start_recording", path)
+
+    def stop_recording(self):
+        self._call("stop_recording")
+
+    def replay(self, path, speed=1.0):
+        return self._call("replay", path, speed)
+
+    def link_stats(self, drone_id=None, timeout=1.0):
+        return self._call("link_stats", drone_id).result(timeout)
+
+    def liveness_states(self, timeout=1.0):
+        return self._call("liveness_states").result(timeout)
+
+    def event_metrics(self, timeout=1.0):
+        """Queue metrics on both sides of the process boundary, plus records the ring overwrote before they were read."""
+        return {
+            "io_process": self._call("event_metrics").result(timeout),
+            "mission_state": self.events.metrics(),
+            "ring_dropped": self.ring.dropped,
+        }
+
+    def shutdown(self, timeout=5.0):
+        """Stop the I/O process and the threads feeding missionState."""
+        if not self.running:
+            return
+        with self.send_lock:
+            try:
+                self.conn.send(("stop",))
+            except OSError:
+                pass  # already gone
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.running = False
+        self.ring_thread.join()
+        self.pipe_thread.join()
+        self.events.stop()
+        self.conn.close()
+        self.ring.close()
+
+    # Results and events from the I/O process
+    def _read_pipe(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "result":
+                _, call_id, result, error = message
+                with self.pending_lock:
+                    future = self.pending.pop(call_id, None)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(result)
+            elif message[0] == "event":
+                _, name, args = message
+                self.events.post(args[0], getattr(self.missionState, name), *args, droppable=False)
+        # the child is gone, nobody will answer what is still pending or called from now on
+        with self.pending_lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("MAVLink I/O process exited"))
+
+    def _read_ring(self):
+        missionState = self.missionState
+        post = self.events.post
+        while self.running:
+            for kind, drone_id, values in self.ring.read().tolist():
+                values = values.tolist()
+                if kind == KIND_POSITION:
+                    post(drone_id, missionState.updateDronePosition, drone_id, *(int(v) for v in values))
+                elif kind == KIND_ATTITUDE:
+                    post(drone_id, missionState.updateDroneTelemetry, drone_id, values[0], values[1], values[2])
+                elif kind == KIND_STATUS:
+                    post(drone_id, missionState.updateDroneStatus, drone_id, int(values[0]))
+                elif kind == KIND_MISSION_STATE:
+                    post(drone_id, missionState.handle_mission_state_update, drone_id, int(values[0]))
+                elif kind == KIND_BATTERY:
+                    post(drone_id, missionState.updateDroneBattery, drone_id, int(values[0]))
+            time.sleep(self.poll_interval)
+
+
+def _start_without_main(process):
+    """
+    Start a spawn process without re-running the launching script in it. spawn imports the parent's
+    __main__ again in the child (as __mp_main__), which for missionState.py means the GUI, LangGraph
+    and the detection model; the I/O process only needs Dispatcher.io_process.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")  # no __file__ or __spec__: nothing to re-import
+    try:
+        process.start()
+    finally:
+        sys.modules["__main__"] = main
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import defaultdict
+from pymavlink import mavutil
+
+# Telemetry rates (Hz) requested from each drone per mission phase. 0 disables a stream.
+# GLOBAL_POSITION_INT drives missionState.updateDronePosition, ATTITUDE is only needed
+# when a drone is looking at something (detection roll checks, POI investigation).
+STREAM_PROFILES = {
+    "transit": {"GLOBAL_POSITION_INT": 4, "ATTITUDE": 1, "MISSION_CURRENT": 1},
+    "search": {"GLOBAL_POSITION_INT": 10, "ATTITUDE": 4, "MISSION_CURRENT": 2},
+    "investigate": {"GLOBAL_POSITION_INT": 10, "ATTITUDE": 10, "MISSION_CURRENT": 2},
+}
+DEFAULT_PHASE = "transit"
+
+
+class StreamRateManager:
+    """
+    Applies per-drone, per-message telemetry rates with MAV_CMD_SET_MESSAGE_INTERVAL and
+    verifies what the vehicle actually sends by counting messages for a short window.
+    Runs on the dispatcher's event loop.
+    """
+
+    def __init__(self, dispatcher, profiles=None, verify_window=3.0, tolerance=0.25):
+        self.dispatcher = dispatcher
+        self.profiles = profiles if profiles is not None else STREAM_PROFILES
+        self.verify_window = verify_window
+        self.tolerance = tolerance  # accepted fractional deviation from the requested rate
+        self.phases = {}  # drone_id -> phase currently applied
+        self.achieved = {}  # drone_id -> {msg name: measured Hz}
+        self.tasks = {}  # drone_id -> running apply/verify task
+        self.counts = defaultdict(int)  # (drone_id, msg id) -> messages seen in the current window
+        self.counting = defaultdict(int)  # drone_id -> open verification windows
+        self.watchers = defaultdict(int)  # msg id -> number of verifications counting it
+
+    def set_phase(self, drone_id, phase):
+        """Apply the profile for `phase` to a drone, replacing any apply still in flight for it."""
+        if phase not in self.profiles:
+            print(f"Unknown stream rate phase: {phase}")
+            return None
+        previous = self.tasks.get(drone_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        self.phases[drone_id] = phase
+        task = asyncio.ensure_future(self.apply(drone_id, phase))
+        self.tasks[drone_id] = task
+        return task
+
+    async def apply(self, drone_id, phase):
+        profile = self.profiles[phase]
+        print(f"Setting {phase} telemetry rates for drone {drone_id}: {profile}")
+        names = list(profile)
+        results = await asyncio.gather(*(self.send_interval(drone_id, name, profile[name]) for name in names))
+        for name, result in zip(names, results):
+            if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+                print(f"Drone {drone_id} rejected {name} interval (result {result})")
+        return await self.verify(drone_id, profile)
+
+    def send_interval(self, drone_id, msg_name, rate):
+        """Request a stream rate. Returns a future resolving to the command's MAV_RESULT."""
+        msg_id = self.dispatcher._resolve_msg_id(msg_name)
+        interval_us = int(1e6 / rate) if rate > 0 else -1  # -1 disables the stream
+        return self.dispatcher.send_command(
+            drone_id, mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL,
+            msg_id, interval_us, 0, 0, 0, 0, 0
+        )
+
+    async def verify(self, drone_id, profile):
+        """Count the profile's messages for verify_window seconds and compare against the requested rates."""
+        msg_ids = {name: self.dispatcher._resolve_msg_id(name) for name in profile}
+        for msg_id in msg_ids.values():
+            self.counts[(drone_id, msg_id)] = 0
+            self._watch(msg_id)
+        self.counting[drone_id] += 1
+        start = time.monotonic()
+        try:
+            await asyncio.sleep(self.verify_window)
+        finally:
+            elapsed = time.monotonic() - start
+            self.counting[drone_id] -= 1
+            if self.counting[drone_id] == 0:
+                del self.counting[drone_id]
+            for msg_id in msg_ids.values():
+                self._unwatch(msg_id)
+
+        achieved = {name: self.counts.pop((drone_id, msg_id), 0) / elapsed for name, msg_id in msg_ids.items()}
+        self.achieved[drone_id] = achieved
+        ok = True
+        for name, rate in profile.items():
+            if abs(achieved[name] - rate) > self.tolerance * max(rate, 1):
+                ok = False
+                print(f"Drone {drone_id} {name} stream at {achieved[name]:.1f} Hz, requested {rate} Hz")
+        if ok:
+            print(f"Drone {drone_id} telemetry rates verified: {achieved}")
+        return ok
+
+    def _watch(self, msg_id):
+        # The counter only sits in the dispatch table while a verification window is open
+        if self.watchers[msg_id] == 0:
+            self.dispatcher.register_handler(msg_id, self._count)
+        self.watchers[msg_id] += 1
+
+    def _unwatch(self, msg_id):
+        self.watchers[msg_id] -= 1
+        if self.watchers[msg_id] == 0:
+            del self.watchers[msg_id]
+            self.dispatcher.unregister_handler(msg_id, self._count)
+
+    def _count(self, drone_id, msg):
+        if drone_id in self.counting:
+            self.counts[(drone_id, msg.get_msgId())] += 1
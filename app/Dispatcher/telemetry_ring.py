@@ -0,0 +1,83 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# record kinds and the values each one carries
+KIND_POSITION = 1  # lat, lon, alt, relative_alt, hdg, vx, vy, vz (raw GLOBAL_POSITION_INT units)
+KIND_ATTITUDE = 2  # roll, pitch, yaw
+KIND_STATUS = 3  # system_status
+KIND_MISSION_STATE = 4  # mission_state
+KIND_BATTERY = 5  # battery_remaining (%)
+
+RECORD = np.dtype([
+    ("kind", np.uint8),
+    ("drone_id", np.uint16),
+    ("values", np.float64, 8),
+], align=True)
+HEADER_SIZE = 64  # write counter, padded to a cache line
+
+
+class TelemetryRing:
+    """
+    Single-producer, single-consumer ring of fixed-size telemetry records in shared memory.
+
+    The producer writes a record and only then bumps the write counter in the header, so the
+    consumer never sees a half-written record below the counter. The producer never waits: when
+    the consumer falls more than `capacity` records behind, the oldest records are overwritten
+    and read() reports them as dropped, which is what we want for telemetry a newer sample
+    supersedes. Create it on one side with create() and attach on the other by name.
+    """
+
+    def __init__(self, memory, capacity, owner):
+        self.memory = memory
+        self.capacity = capacity
+        self.owner = owner
+        self.name = memory.name
+        self.head = np.ndarray((1,), dtype=np.int64, buffer=memory.buf, offset=0)
+        self.records = np.ndarray((capacity,), dtype=RECORD, buffer=memory.buf, offset=HEADER_SIZE)
+        self.written = int(self.head[0])  # producer's copy of the counter
+        self.read_count = int(self.head[0])  # consumer's position
+        self.dropped = 0
+
+    @classmethod
+    def create(cls, capacity=65536):
+        memory = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity * RECORD.itemsize)
+        ring = cls(memory, capacity, owner=True)
+        ring.head[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity, owner=False)
+
+    # producer
+    def publish(self, kind, drone_id, *values):
+        record = self.records[self.written % self.capacity]
+        record["kind"] = kind
+        record["drone_id"] = drone_id
+        record["values"][:len(values)] = values
+        self.written += 1
+        self.head[0] = self.written
+
+    # consumer
+    def read(self):
+        """Records published since the last read, oldest first, as a copied structured array."""
+        head = int(self.head[0])
+        start = max(self.read_count, head - self.capacity)
+        self.dropped += start - self.read_count
+        if start == head:
+            return self.records[:0]
+        batch = self.records[np.arange(start, head) % self.capacity]
+        # anything the producer lapped while we were copying may be torn, drop it
+        overwritten = int(self.head[0]) - self.capacity - start
+        if overwritten > 0:
+            batch = batch[overwritten:]
+            self.dropped += overwritten
+        self.read_count = head
+        return batch
+
+    def close(self):
+        self.head = None
+        self.records = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -8,8 +8,9 @@ import ollama
 import ast
 import math
 from LangGraph import langChainMain
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from TerrainPreProcessing.check_internet import has_internet
+from Utils.drone_registry import DroneRegistry
 
 
 class Drone:
@@ -667,7 +668,7 @@ class MapPage(customtkinter.CTkFrame):
         self.gui_ref = gui_ref
         self.switch_to_home = switch_to_home
         self.polygons = []
-        self.drones = []
+        self.drones = DroneRegistry() # map markers by system id
         self.polygon_points = []
         self.jobs = []
         self.pois = []
@@ -874,7 +875,7 @@ class MapPage(customtkinter.CTkFrame):
 
     def _add_drone(self, drone_id, system_status):
         newdrone = Drone(self.map_widget, self.drone_info_container, self.bottom_frame, drone_id, system_status, self.gui_ref)
-        self.drones.append(newdrone)
+        self.drones.add(drone_id, newdrone)
 
     def left_click_event(self, coordinates_tuple):
         if self.gui_ref.isAddingDetectionPoints:
@@ -992,6 +993,8 @@ class JobWaypoint:
         self.marker = map_widget.set_marker(lat, lon, text=waypointNum)
 
 
+TELEMETRY_REFRESH_MS = 100 # how often the map redraws drones from the telemetry snapshot
+
 class GUI:
     def __init__(self):
         #self.missionState = missionState
@@ -1012,6 +1015,9 @@ class GUI:
         self.detection_point_markers = []
         self.isAddingDetectionPoints = False
 
+        self.telemetry_generation = None # snapshot generation last drawn
+        self.telemetry_seen = {} # drone_id -> (position, attitude, status) versions last drawn
+
         # Create pages
         self.home_page = HomePage(self.container, self.show_new_mission_popup, self)
         self.map_page = MapPage(self.container, self.show_home_page, self)
@@ -1091,6 +1097,28 @@ class GUI:
 
     def link_mission_state(self, missionState):
         self.missionState = missionState
+        self.app.after(TELEMETRY_REFRESH_MS, self.refresh_drone_telemetry)
+
+    def refresh_drone_telemetry(self):
+        """Redraw the drones whose telemetry changed since the last frame. Runs on the Tk thread."""
+        result = self.missionState.snapshot.read(since=self.telemetry_generation)
+        if result is not None:
+            self.telemetry_generation, frame = result
+            for row, drone_id in enumerate(frame["drone_id"].tolist()):
+                versions = (int(frame["position_version"][row]), int(frame["attitude_version"][row]), int(frame["status_version"][row]))
+                seen = self.telemetry_seen.get(drone_id, (0, 0, 0))
+                if versions[0] > seen[0]:
+                    self.updateDronePosition(
+                        drone_id, int(frame["latitude"][row]), int(frame["longitude"][row]),
+                        frame["altitude"][row], frame["relative_altitude"][row], frame["heading"][row],
+                        frame["vx"][row], frame["vy"][row], frame["vz"][row]
+                    )
+                if versions[1] > seen[1]:
+                    self.updateDroneTelemetry(drone_id, frame["roll"][row], frame["pitch"][row], frame["yaw"][row])
+                if versions[2] > seen[2]:
+                    self.updateDroneStatus(drone_id, int(frame["system_status"][row]))
+                self.telemetry_seen[drone_id] = versions
+        self.app.after(TELEMETRY_REFRESH_MS, self.refresh_drone_telemetry)
 
     def call_mavlink_connection(self):
         success = self.missionState.connect_to_mavlink()
@@ -1111,12 +1139,12 @@ class GUI:
 
     
     def updateDronePosition(self, drone_id, lat, lon, altitude, relative_altitude, heading, vx, vy, vz):
-        drone = next((drone for drone in self.map_page.drones if drone.id == drone_id), None)
+        drone = self.map_page.drones.get(drone_id)
         if drone is not None:
             drone.setPosition(lat, lon, altitude, relative_altitude, heading, vx, vy, vz)
 
     def updateDroneTelemetry(self, drone_id, roll, pitch, yaw):
-        drone = next((drone for drone in self.map_page.drones if drone.id == drone_id), None)
+        drone = self.map_page.drones.get(drone_id)
         if drone is not None:
             drone.setTelemetry(roll, pitch, yaw)
 
@@ -1124,15 +1152,26 @@ class GUI:
         self.map_page._add_drone(drone_id, system_status)
 
     def updateDroneStatus(self, drone_id, system_status):
-        drone = next((drone for drone in self.map_page.drones if drone.id == drone_id), None)
+        drone = self.map_page.drones.get(drone_id)
         if drone is not None:
             drone.setStatus(system_status)
     
     def updateJobs(self, drone_id, active_job, job_list):
-        drone = next((drone for drone in self.map_page.drones if drone.id == drone_id), None)
+        drone = self.map_page.drones.get(drone_id)
         if drone is not None:
             drone.update_jobs(active_job, job_list)
     
+    def add_poi_threadsafe(self, lat, lon, name, description=""):
+        """Add a POI from any thread. The widgets are built on the Tk thread; returns a future resolving to the POI id."""
+        future = Future()
+        def add():
+            try:
+                future.set_result(self.map_page.add_poi(lat, lon, name, description))
+            except Exception as e:
+                future.set_exception(e)
+        self.app.after(0, add)
+        return future
+
     def callAddPoiInMissionState(self, poi):
         self.missionState.addPOI(poi)
     
@@ -0,0 +1,289 @@
+import bisect
+import math
+import threading
+
+from Utils.coordinate_estimation import calculate_distance_between_points
+from Utils.spatial_index import GridIndex
+
+CRUISE_SPEED = 10.0  # m/s, ArduCopter's default WPNAV_SPEED
+PRIORITY_WEIGHT = 60.0  # seconds of flying a drone will spend to reach a job one priority level higher
+PREEMPT_DELTA = 3  # a job preempts a running one when its priority is higher by more than this (as Drone.addJob)
+BATTERY_DRAIN = 100.0 / 1200.0  # % per second of flight, about a 20 minute battery
+BATTERY_RESERVE = 20.0  # % that must be left after flying the job and returning home
+JOB_CELL_SIZE = 100.0  # meters, grid cell of the pending job index
+
+
+class JobScheduler:
+    """
+    Swarm-wide pool of jobs not tied to a drone, assigned by a cost model.
+
+    The cost of a drone taking a job is the time to fly to the job's next waypoint minus
+    PRIORITY_WEIGHT seconds per priority level, so a higher priority job wins unless it is much
+    further away. Jobs the drone's battery cannot cover (travel + the job + the way home, with a
+    reserve) are never offered to it; drones that have not reported a battery level are not
+    limited.
+
+    Pending jobs are kept in one GridIndex per priority level, keyed by the job's next waypoint.
+    When a drone becomes free, levels are searched from the highest priority down with a nearest
+    search, and the search stops once no lower level can beat the best cost found, so a decision
+    touches a few grid cells however many jobs are queued. When a job arrives it goes to the
+    cheapest idle drone, preempts a drone running a much lower priority job, or waits in the pool.
+    Re-planning is incremental: only the drone or job that changed is considered.
+
+    Drones are read through `drones` (a DroneRegistry) and handed jobs with Drone.addJob().
+    Events come from the Tk thread, the mission event thread and the detection pipeline, so a
+    decision and the addJob() that carries it out happen under one lock (reentrant, addJob may
+    call back in). Drone job state changes made outside the scheduler must take `lock` as well.
+    """
+
+    def __init__(self, drones, cruise_speed=CRUISE_SPEED, priority_weight=PRIORITY_WEIGHT):
+        self.drones = drones
+        self.cruise_speed = cruise_speed
+        self.priority_weight = priority_weight
+        self.levels = {}  # priority -> GridIndex of pending jobs
+        self.priorities = []  # priorities with pending jobs, ascending
+        self.entries = {}  # job_id -> (priority, GridEntry)
+        self.idle = {}  # drone_id -> drone with nothing to do
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def pending(self):
+        """Pending jobs, highest priority first."""
+        with self.lock:
+            return [entry.item for priority in reversed(self.priorities) for entry in self._level_entries(priority)]
+
+    def _level_entries(self, priority):
+        for entries in self.levels[priority].cells.values():
+            yield from entries
+
+    # Events
+    def submit(self, job):
+        """A new (or released) job. Returns the drone it was given to, or None if it is waiting in the pool."""
+        with self.lock:
+            start = self.job_start(job)
+            if start is None:
+                print(f"Job {job.job_id} has no waypoints, not scheduling it")
+                return None
+            drone = self._best_drone(job, start, self._idle_drones())
+            if drone is None:
+                drone = self._best_drone(job, start, self._preemptible_drones(job))
+            if drone is None:
+                self._add_pending(job, start)
+                return None
+            self.idle.pop(drone.drone_id, None)
+            self._assign(drone, job)
+        return drone
+
+    def drone_free(self, drone):
+        """A drone finished its work or became available. Gives it the best pending job, if any."""
+        with self.lock:
+            if not self._can_work(drone) or drone.active_job is not None or not drone.jobQueue.is_empty():
+                return None
+            job = self._best_job(drone)
+            if job is None:
+                self.idle[drone.drone_id] = drone
+                return None
+            self.idle.pop(drone.drone_id, None)
+            self._assign(drone, job)
+        return job
+
+    def release(self, drone, jobs, reassign=True):
+        """
+        Jobs taken from a drone that can no longer fly them, e.g. lost or sent home. They go to other drones or the pool.
+        With reassign=False (the whole mission is ending) they only go back to the pool, so no drone is sent a mission.
+        """
+        with self.lock:
+            self.idle.pop(drone.drone_id, None)
+        for job in sorted(jobs):
+            job.job_status = "pending"
+            job.upload_try_count = 0
+            if not reassign:
+                with self.lock:
+                    start = self.job_start(job)
+                    if start is not None:
+                        self._add_pending(job, start)
+                print(f"Job {job.job_id} from drone {drone.drone_id} is back in the pool")
+                continue
+            given_to = self.submit(job)
+            if given_to is not None:
+                print(f"Reassigned job {job.job_id} from drone {drone.drone_id} to drone {given_to.drone_id}")
+            else:
+                print(f"Job {job.job_id} from drone {drone.drone_id} is waiting for a free drone")
+
+    def cancel(self, job):
+        with self.lock:
+            found = self.entries.pop(job.job_id, None)
+            if found is None:
+                return False
+            priority, entry = found
+            self.levels[priority].remove(entry)
+            if not len(self.levels[priority]):
+                self._drop_level(priority)
+            return True
+
+    # Cost model
+    def job_start(self, job):
+        """(lat, lon) in degrees of the next waypoint the job still has to fly."""
+        if not job.waypoints:
+            return None
+        index = job.last_waypoint - 1 if job.last_waypoint > 1 else 0
+        waypoint = job.waypoints[min(index, len(job.waypoints) - 1)]
+        return waypoint[0], waypoint[1]
+
+    def job_length(self, job):
+        """Meters flown along the job's remaining waypoints, cached per job and resume point."""
+        cached = getattr(job, "scheduler_length", None)
+        if cached is not None and cached[0] == job.last_waypoint:
+            return cached[1]
+        index = job.last_waypoint - 1 if job.last_waypoint > 1 else 0
+        remaining = job.waypoints[index:]
+        length = 0.0
+        for a, b in zip(remaining, remaining[1:]):
+            length += calculate_distance_between_points(a[0], a[1], b[0], b[1])
+        job.scheduler_length = (job.last_waypoint, length)
+        return length
+
+    def _position(self, drone):
+        if drone.latitude is not None:
+            return drone.latitude / 1e7, drone.longitude / 1e7
+        if drone.home_latitude is not None:
+            return drone.home_latitude / 1e7, drone.home_longitude / 1e7
+        return None
+
+    def _priority(self, job):
+        return float(job.job_priority)
+
+    def _range(self, drone):
+        """Meters the drone can still fly before hitting the battery reserve, inf if it has not reported a battery level."""
+        battery = getattr(drone, "battery_remaining", None)
+        if battery is None:
+            return math.inf
+        return max(0.0, (battery - BATTERY_RESERVE) / BATTERY_DRAIN * self.cruise_speed)
+
+    def _home(self, drone):
+        if drone.home_latitude is None:
+            return None
+        return drone.home_latitude / 1e7, drone.home_longitude / 1e7
+
+    def _job_to_home(self, job, home):
+        """Meters from the job's last waypoint to `home`, cached per job (drones mostly share a home)."""
+        cached = getattr(job, "scheduler_home", None)
+        if cached is not None and cached[0] == home:
+            return cached[1]
+        end = job.waypoints[-1]
+        distance = calculate_distance_between_points(end[0], end[1], home[0], home[1])
+        job.scheduler_home = (home, distance)
+        return distance
+
+    def _feasible(self, drone, job, travel, flight_range=None):
+        """Whether the drone's battery covers `travel` meters to the job, the job itself and the way home."""
+        flight_range = self._range(drone) if flight_range is None else flight_range
+        if flight_range == math.inf:
+            return True
+        distance = travel + self.job_length(job)
+        if distance > flight_range:
+            return False
+        home = self._home(drone)
+        if home is not None:
+            distance += self._job_to_home(job, home)
+        return distance <= flight_range
+
+    def cost(self, drone, job, start=None):
+        """Seconds of flying to the job minus its priority bonus; inf if the drone cannot fly it."""
+        start = start or self.job_start(job)
+        position = self._position(drone)
+        travel = 0.0 if position is None else calculate_distance_between_points(position[0], position[1], start[0], start[1])
+        if not self._feasible(drone, job, travel):
+            return math.inf
+        return travel / self.cruise_speed - self.priority_weight * self._priority(job)
+
+    # Assignment
+    def _can_work(self, drone):
+        return drone.available and drone.link_state == "alive"
+
+    def _idle_drones(self):
+        idle = []
+        for drone_id, drone in list(self.idle.items()):
+            if self._can_work(drone) and drone.active_job is None and drone.jobQueue.is_empty():
+                idle.append(drone)
+            else:
+                del self.idle[drone_id]  # picked up work, or went away, since it was idle
+        return idle
+
+    def _preemptible_drones(self, job):
+        priority = self._priority(job)
+        return [
+            drone for drone in self.drones
+            if self._can_work(drone) and drone.active_job is not None
+            and priority - float(drone.active_job.job_priority) > PREEMPT_DELTA
+        ]
+
+    def _best_drone(self, job, start, drones):
+        best, best_cost = None, math.inf
+        for drone in drones:
+            cost = self.cost(drone, job, start)
+            if cost < best_cost:
+                best, best_cost = drone, cost
+        return best
+
+    def _best_job(self, drone):
+        """Take the cheapest pending job the drone can fly out of the pool, or None."""
+        if not self.entries:
+            return None
+        position = self._position(drone)
+        flight_range = self._range(drone)
+        search_radius = math.inf
+        home = self._home(drone)
+        if flight_range != math.inf and position is not None:
+            # a job it can fly starts inside the ellipse drone -> job -> home <= range, bound the search by it
+            to_home = 0.0 if home is None else calculate_distance_between_points(position[0], position[1], home[0], home[1])
+            if to_home > flight_range:
+                return None  # can only go home
+            search_radius = (flight_range + to_home) / 2 if home is not None else flight_range
+        accept = lambda job, travel: self._feasible(drone, job, travel, flight_range)
+        best, best_cost, best_priority = None, math.inf, None
+        for priority in reversed(self.priorities):
+            bonus = self.priority_weight * priority
+            if best_cost <= -bonus:
+                break  # even a job right here at this level or below costs more
+            index = self.levels[priority]
+            if position is None:
+                entry = next(self._level_entries(priority))
+                found = (0.0, entry) if accept(entry.item, 0.0) else None
+            else:
+                # only jobs closer than (best cost + bonus) * speed can still win
+                reach = min((best_cost + bonus) * self.cruise_speed, search_radius)
+                found = index.nearest_entry(position[0], position[1], max_radius=reach, accept=accept)
+            if found is None:
+                continue
+            cost = found[0] / self.cruise_speed - bonus
+            if cost < best_cost:
+                best, best_cost, best_priority = found[1], cost, priority
+        if best is None:
+            return None
+        del self.entries[best.item.job_id]
+        self.levels[best_priority].remove(best)
+        if not len(self.levels[best_priority]):
+            self._drop_level(best_priority)
+        return best.item
+
+    def _add_pending(self, job, start):
+        priority = self._priority(job)
+        index = self.levels.get(priority)
+        if index is None:
+            # every level shares one frame so distances compare across levels
+            frame = next(iter(self.levels.values())).frame if self.levels else None
+            index = self.levels[priority] = GridIndex(cell_size=JOB_CELL_SIZE, frame=frame)
+            bisect.insort(self.priorities, priority)
+        job.job_status = "pending"
+        self.entries[job.job_id] = (priority, index.insert(start[0], start[1], job))
+
+    def _drop_level(self, priority):
+        del self.levels[priority]
+        self.priorities.remove(priority)
+
+    def _assign(self, drone, job):
+        print(f"Scheduling job {job.job_id} ({job.job_type}) on drone {drone.drone_id}")
+        drone.addJob(job)
@@ -0,0 +1,493 @@
+"""
+In-process simulated drone swarm that speaks enough MAVLink to stand in for Mission Planner's
+TCP mirror: HEARTBEAT, GLOBAL_POSITION_INT, ATTITUDE, MISSION_CURRENT, MISSION_ITEM_REACHED,
+the mission upload/download protocol (including MISSION_WRITE_PARTIAL_LIST), SET_MODE and the
+COMMAND_LONGs the Dispatcher sends.
+
+Run standalone in place of the external endpoint, from the app directory:
+    python -m Simulation.sim_swarm --drones 50 --port 14550
+"""
+import argparse
+import asyncio
+import math
+import time
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+EARTH_METERS_PER_DEG = 111320.0
+
+# ArduCopter custom modes the Dispatcher uses
+MODE_AUTO = 3
+MODE_GUIDED = 4
+MODE_LOITER = 5
+MODE_RTL = 6
+
+# Telemetry (Hz) every vehicle sends until the GCS asks otherwise with SET_MESSAGE_INTERVAL
+DEFAULT_TELEMETRY_RATES = {
+    "GLOBAL_POSITION_INT": 4,
+    "ATTITUDE": 4,
+    "MISSION_CURRENT": 1,
+}
+
+
+class _TransportFile:
+    """
+    Minimal file-like wrapper so a pymavlink MAVLink encoder writes straight into asyncio transports.
+    Between begin_batch() and end_batch() writes are coalesced into one transport write per tick.
+    """
+    def __init__(self):
+        self.transports = []
+        self.batch = None
+
+    def write(self, buf):
+        if self.batch is not None:
+            self.batch += buf
+            return
+        for transport in self.transports:
+            transport.write(buf)
+
+    def begin_batch(self):
+        self.batch = bytearray()
+
+    def end_batch(self):
+        batch, self.batch = self.batch, None
+        if batch:
+            for transport in self.transports:
+                transport.write(batch)
+
+
+class SimVehicle:
+    """A simulated ArduCopter-like vehicle that speaks the MAVLink mission protocol and flies its mission."""
+
+    def __init__(self, swarm, system_id, home):
+        self.swarm = swarm
+        self.system_id = system_id
+        self.mav = mavlink2.MAVLink(swarm.out, srcSystem=system_id, srcComponent=1)
+        self.custom_mode = MODE_LOITER
+        self.armed = False
+        self.mission = []  # received MISSION_ITEM_INT messages
+        self.upload_next = None  # next item seq expected while an upload is in progress
+        self.upload_end = None  # last item seq of the upload in progress
+        self.upload_partial = False
+        self.uploads_completed = 0
+        self.items_received = 0  # every MISSION_ITEM(_INT) accepted, full or partial
+        self.current_seq = 0
+        self.mission_state = mavlink2.MISSION_STATE_NO_MISSION
+        self.guided_target = None  # (lat, lon, rel_alt) to fly to in GUIDED, e.g. after NAV_TAKEOFF
+
+        self.home_lat, self.home_lon = home
+        self.home_alt = swarm.home_alt
+        self.lat, self.lon = home  # degrees
+        self.rel_alt = 0.0  # meters above home
+        self.vn = self.ve = self.vd = 0.0  # m/s north, east, down
+        self.heading = 0.0  # radians
+        self.boot_time = time.monotonic()
+
+        # msg id -> [interval s, next due time, send function]
+        now = time.monotonic()
+        self.streams = {}
+        for name, rate in swarm.telemetry_rates.items():
+            msg_id = getattr(mavlink2, f"MAVLINK_MSG_ID_{name}")
+            self.streams[msg_id] = [1.0 / rate if rate > 0 else None, now, self.STREAM_SENDERS[name]]
+        self.default_intervals = {msg_id: stream[0] for msg_id, stream in self.streams.items()}
+
+    # Telemetry
+    def time_boot_ms(self):
+        return int((time.monotonic() - self.boot_time) * 1000) & 0xFFFFFFFF
+
+    def send_heartbeat(self):
+        base_mode = mavlink2.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED
+        if self.armed:
+            base_mode |= mavlink2.MAV_MODE_FLAG_SAFETY_ARMED
+        system_status = mavlink2.MAV_STATE_ACTIVE if self.armed else mavlink2.MAV_STATE_STANDBY
+        self.mav.heartbeat_send(
+            mavlink2.MAV_TYPE_QUADROTOR, mavlink2.MAV_AUTOPILOT_ARDUPILOTMEGA,
+            base_mode, self.custom_mode, system_status
+        )
+
+    def send_global_position_int(self):
+        self.mav.global_position_int_send(
+            self.time_boot_ms(),
+            int(self.lat * 1e7), int(self.lon * 1e7),
+            int((self.home_alt + self.rel_alt) * 1000), int(self.rel_alt * 1000),
+            int(self.vn * 100), int(self.ve * 100), int(self.vd * 100),
+            int(math.degrees(self.heading) * 100) % 36000
+        )
+
+    def send_attitude(self):
+        # Nose down proportional to horizontal speed, like a multirotor in forward flight
+        speed = math.hypot(self.vn, self.ve)
+        pitch = -0.35 * min(1.0, speed / self.swarm.cruise_speed)
+        yaw = self.heading if self.heading <= math.pi else self.heading - 2 * math.pi
+        self.mav.attitude_send(self.time_boot_ms(), 0.0, pitch, yaw, 0.0, 0.0, 0.0)
+
+    def send_mission_current(self):
+        self.mav.mission_current_send(self.current_seq, len(self.mission), self.mission_state)
+
+    STREAM_SENDERS = {
+        "GLOBAL_POSITION_INT": send_global_position_int,
+        "ATTITUDE": send_attitude,
+        "MISSION_CURRENT": send_mission_current,
+    }
+
+    def send_due_telemetry(self, now):
+        for stream in self.streams.values():
+            interval = stream[0]
+            if interval is None or now < stream[1]:
+                continue
+            stream[2](self)
+            # Keep the schedule phase-locked, but don't burst to catch up after a stall
+            stream[1] = max(stream[1] + interval, now)
+
+    def set_message_interval(self, msg_id, interval_us):
+        stream = self.streams.get(msg_id)
+        if stream is None:
+            message_type = mavlink2.mavlink_map.get(msg_id)
+            sender = self.STREAM_SENDERS.get(message_type.msgname) if message_type else None
+            if sender is None:
+                return mavlink2.MAV_RESULT_UNSUPPORTED
+            stream = self.streams[msg_id] = [None, time.monotonic(), sender]
+        if interval_us < 0:
+            stream[0] = None  # -1 disables the stream
+        elif interval_us == 0:
+            stream[0] = self.default_intervals.get(msg_id)
+        else:
+            stream[0] = interval_us / 1e6
+        stream[1] = time.monotonic()
+        return mavlink2.MAV_RESULT_ACCEPTED
+
+    # Flight
+    def step(self, dt):
+        """Advance the vehicle dt seconds."""
+        if not self.armed:
+            self.vn = self.ve = self.vd = 0.0
+            return
+        if self.custom_mode == MODE_AUTO and self.mission_state == mavlink2.MISSION_STATE_ACTIVE:
+            target = self._mission_target()
+        elif self.custom_mode == MODE_GUIDED:
+            target = self.guided_target
+        elif self.custom_mode == MODE_RTL:
+            target = (self.home_lat, self.home_lon, 0.0)
+        else:
+            target = None
+
+        if target is None:
+            self.vn = self.ve = self.vd = 0.0
+            return
+        arrived = self._fly_towards(target, dt)
+        if not arrived:
+            return
+        if self.custom_mode == MODE_AUTO:
+            self._reached_item()
+        elif self.custom_mode == MODE_RTL:
+            self.armed = False  # landed and disarmed
+            self.custom_mode = MODE_LOITER
+            self.send_heartbeat()
+
+    def _mission_target(self):
+        item = self.mission[self.current_seq]
+        if item.command == mavlink2.MAV_CMD_NAV_TAKEOFF:
+            return (self.lat, self.lon, item.z)
+        scale = 1e7 if item.get_type() == "MISSION_ITEM_INT" else 1.0
+        return (item.x / scale, item.y / scale, item.z)
+
+    def _fly_towards(self, target, dt):
+        """Move at cruise speed/climb rate towards (lat, lon, rel_alt). Returns True once within acceptance radius."""
+        lat, lon, alt = target
+        cos_lat = math.cos(math.radians(self.lat))
+        north = (lat - self.lat) * EARTH_METERS_PER_DEG
+        east = (lon - self.lon) * EARTH_METERS_PER_DEG * cos_lat
+        up = alt - self.rel_alt
+        horizontal = math.hypot(north, east)
+        if horizontal < self.swarm.acceptance_radius and abs(up) < 0.1:
+            self.vn = self.ve = self.vd = 0.0
+            return True
+
+        step = self.swarm.cruise_speed * dt
+        if horizontal > 0:
+            scale = min(1.0, step / horizontal)
+            self.lat += north * scale / EARTH_METERS_PER_DEG
+            self.lon += east * scale / (EARTH_METERS_PER_DEG * cos_lat)
+            self.vn = north * scale / dt
+            self.ve = east * scale / dt
+            self.heading = math.atan2(east, north) % (2 * math.pi)
+        climb = max(-self.swarm.climb_rate * dt, min(self.swarm.climb_rate * dt, up))
+        self.rel_alt += climb
+        self.vd = -climb / dt
+        return False
+
+    def _reached_item(self):
+        self.mav.mission_item_reached_send(self.current_seq)
+        if self.current_seq + 1 < len(self.mission):
+            self.current_seq += 1
+        else:
+            self.mission_state = mavlink2.MISSION_STATE_COMPLETE
+        self.send_mission_current()
+
+    # Incoming messages
+    def handle_message(self, msg):
+        msg_type = msg.get_type()
+        if msg_type == "MISSION_COUNT":
+            self.mission = []
+            if msg.count == 0:
+                self.upload_next = None
+                self.mission_state = mavlink2.MISSION_STATE_NO_MISSION
+                self._send_mission_ack(mavlink2.MAV_MISSION_ACCEPTED)
+                return
+            self._begin_upload(0, msg.count - 1, partial=False)
+        elif msg_type == "MISSION_WRITE_PARTIAL_LIST":
+            # replace items start..end in place, the mission keeps its length and keeps running
+            if not 0 <= msg.start_index <= msg.end_index < len(self.mission):
+                self._send_mission_ack(mavlink2.MAV_MISSION_ERROR)
+                return
+            self._begin_upload(msg.start_index, msg.end_index, partial=True)
+        elif msg_type in ("MISSION_ITEM_INT", "MISSION_ITEM"):
+            if self.upload_next is None or msg.seq != self.upload_next:
+                return  # duplicate or out-of-order retransmission, the GCS will resend
+            if msg.seq < len(self.mission):
+                self.mission[msg.seq] = msg
+            else:
+                self.mission.append(msg)
+            self.items_received += 1
+            if msg.seq < self.upload_end:
+                self.upload_next = msg.seq + 1
+                self._request_item(self.upload_next)
+            else:
+                self.upload_next = None
+                self.uploads_completed += 1
+                if not self.upload_partial:
+                    self.current_seq = 0
+                    self.mission_state = mavlink2.MISSION_STATE_NOT_STARTED
+                self._send_mission_ack(mavlink2.MAV_MISSION_ACCEPTED)
+        elif msg_type == "MISSION_CLEAR_ALL":
+            self.mission = []
+            self.upload_next = None
+            self.current_seq = 0
+            self.mission_state = mavlink2.MISSION_STATE_NO_MISSION
+            self._send_mission_ack(mavlink2.MAV_MISSION_ACCEPTED)
+        elif msg_type == "MISSION_REQUEST_LIST":
+            self.swarm.respond(self.mav.mission_count_send, self.swarm.gcs_system, 0, len(self.mission))
+        elif msg_type in ("MISSION_REQUEST_INT", "MISSION_REQUEST"):
+            if msg.seq < len(self.mission):
+                self._send_item(self.mission[msg.seq])
+        elif msg_type == "SET_MODE":
+            self._set_mode(msg.custom_mode)
+        elif msg_type == "COMMAND_LONG":
+            self._handle_command(msg)
+
+    def _set_mode(self, custom_mode):
+        self.custom_mode = custom_mode
+        if custom_mode == MODE_GUIDED:
+            self.guided_target = None  # hold position until told where to go
+        if custom_mode == MODE_AUTO and self.mission and self.mission_state == mavlink2.MISSION_STATE_NOT_STARTED:
+            self._start_mission()
+        self.send_heartbeat()  # report the new mode right away, like ArduPilot does
+
+    def _start_mission(self, first_item=0):
+        if 0 < first_item < len(self.mission):
+            self.current_seq = first_item
+        else:
+            self.current_seq = 1 if len(self.mission) > 1 else 0  # item 0 is home
+        self.mission_state = mavlink2.MISSION_STATE_ACTIVE
+
+    def _handle_command(self, msg):
+        command = msg.command
+        result = mavlink2.MAV_RESULT_ACCEPTED
+        if command == mavlink2.MAV_CMD_COMPONENT_ARM_DISARM:
+            self.armed = msg.param1 == 1
+            self.send_heartbeat()
+        elif command == mavlink2.MAV_CMD_NAV_TAKEOFF:
+            if self.armed and self.custom_mode == MODE_GUIDED:
+                self.guided_target = (self.lat, self.lon, msg.param7)
+            else:
+                result = mavlink2.MAV_RESULT_DENIED
+        elif command == mavlink2.MAV_CMD_MISSION_START:
+            if self.armed and self.mission:
+                self.custom_mode = MODE_AUTO
+                self._start_mission(int(msg.param1))
+                self.send_heartbeat()
+            else:
+                result = mavlink2.MAV_RESULT_DENIED
+        elif command == mavlink2.MAV_CMD_NAV_RETURN_TO_LAUNCH:
+            self.custom_mode = MODE_RTL
+            self.send_heartbeat()
+        elif command == mavlink2.MAV_CMD_SET_MESSAGE_INTERVAL:
+            result = self.set_message_interval(int(msg.param1), int(msg.param2))
+        else:
+            result = mavlink2.MAV_RESULT_UNSUPPORTED
+        self.swarm.respond(self.mav.command_ack_send, command, result)
+
+    def _begin_upload(self, start, end, partial):
+        self.upload_next = start
+        self.upload_end = end
+        self.upload_partial = partial
+        self._request_item(start)
+
+    def _request_item(self, seq):
+        self.swarm.respond(self.mav.mission_request_int_send, self.swarm.gcs_system, 0, seq)
+
+    def _send_item(self, item):
+        self.swarm.respond(
+            self.mav.mission_item_int_send, self.swarm.gcs_system, 0,
+            item.seq, item.frame, item.command, item.current, item.autocontinue,
+            item.param1, item.param2, item.param3, item.param4,
+            int(item.x), int(item.y), item.z, item.mission_type
+        )
+
+    def _send_mission_ack(self, result):
+        self.swarm.respond(self.mav.mission_ack_send, self.swarm.gcs_system, 0, result)
+
+
+class SimSwarm(asyncio.Protocol):
+    """
+    In-process MAVLink endpoint standing in for Mission Planner's TCP mirror.
+
+    Serves every simulated vehicle over one TCP listener, so a Dispatcher can connect to
+    tcp:127.0.0.1:<port>. Vehicles start disarmed on a 5 m grid around `home`, fly uploaded
+    missions in AUTO, and stream telemetry at `telemetry_rates` (Hz, per message name) until the
+    GCS changes them with SET_MESSAGE_INTERVAL. One tick loop at `tick_rate` Hz moves every vehicle
+    and writes all due telemetry in one batch, so hundreds of vehicles cost one socket write per tick.
+    `latency` delays every vehicle response to emulate a radio link.
+    """
+
+    def __init__(self, system_ids=(1,), heartbeat_rate=1.0, latency=0.0, gcs_system=255,
+                 telemetry_rates=None, tick_rate=20.0, home=(28.6024274, -81.2000599), home_alt=30.0,
+                 cruise_speed=10.0, climb_rate=2.5, acceptance_radius=2.0):
+        self.out = _TransportFile()
+        self.heartbeat_rate = heartbeat_rate
+        self.latency = latency
+        self.gcs_system = gcs_system
+        self.telemetry_rates = dict(DEFAULT_TELEMETRY_RATES if telemetry_rates is None else telemetry_rates)
+        self.tick_rate = tick_rate
+        self.home_alt = home_alt
+        self.cruise_speed = cruise_speed
+        self.climb_rate = climb_rate
+        self.acceptance_radius = acceptance_radius
+        self.vehicles = {}
+        system_ids = list(system_ids)
+        if any(not 1 <= system_id <= 255 for system_id in system_ids):
+            raise ValueError("MAVLink system ids must be between 1 and 255")
+        columns = max(1, math.ceil(math.sqrt(len(system_ids))))
+        for index, system_id in enumerate(system_ids):
+            north, east = (index // columns) * 5.0, (index % columns) * 5.0
+            vehicle_home = (
+                home[0] + north / EARTH_METERS_PER_DEG,
+                home[1] + east / (EARTH_METERS_PER_DEG * math.cos(math.radians(home[0])))
+            )
+            self.vehicles[system_id] = SimVehicle(self, system_id, vehicle_home)
+        self.parser = mavlink2.MAVLink(None)
+        self.parser.robust_parsing = True
+        self.server = None
+        self.loop = None
+        self.tasks = []
+        self.ticks = 0
+        self.overruns = 0  # ticks that took longer than the tick period
+
+    # asyncio.Protocol
+    def connection_made(self, transport):
+        self.out.transports.append(transport)
+        for vehicle in self.vehicles.values():
+            vehicle.send_heartbeat()
+
+    def connection_lost(self, exc):
+        self.out.transports = [t for t in self.out.transports if not t.is_closing()]
+
+    def data_received(self, data):
+        for msg in self.parser.parse_buffer(data) or ():
+            target = getattr(msg, "target_system", None)
+            if target is None:
+                continue
+            if target == 0:
+                for vehicle in self.vehicles.values():
+                    vehicle.handle_message(msg)
+            elif target in self.vehicles:
+                self.vehicles[target].handle_message(msg)
+
+    def respond(self, send, *args):
+        if self.latency > 0:
+            self.loop.call_later(self.latency, send, *args)
+        else:
+            send(*args)
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start listening. Returns the bound port."""
+        self.loop = asyncio.get_running_loop()
+        self.server = await self.loop.create_server(lambda: self, host, port)
+        self.tasks.append(asyncio.ensure_future(self._heartbeat_loop()))
+        self.tasks.append(asyncio.ensure_future(self._tick_loop()))
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for transport in self.out.transports:
+            transport.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _heartbeat_loop(self):
+        period = 1.0 / self.heartbeat_rate
+        next_tick = time.monotonic()
+        while True:
+            self.out.begin_batch()
+            for vehicle in self.vehicles.values():
+                vehicle.send_heartbeat()
+            self.out.end_batch()
+            next_tick += period
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    async def _tick_loop(self):
+        period = 1.0 / self.tick_rate
+        last = next_tick = time.monotonic()
+        while True:
+            now = time.monotonic()
+            dt, last = now - last, now
+            connected = bool(self.out.transports)
+            self.out.begin_batch()
+            for vehicle in self.vehicles.values():
+                if dt > 0:
+                    vehicle.step(dt)
+                if connected:
+                    vehicle.send_due_telemetry(now)
+            self.out.end_batch()
+            self.ticks += 1
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                self.overruns += 1
+                next_tick = time.monotonic()  # fell behind, don't try to catch up
+            await asyncio.sleep(max(0.0, delay))
+
+
+async def _serve(args):
+    swarm = SimSwarm(
+        system_ids=range(1, args.drones + 1), latency=args.latency, tick_rate=args.tick_rate,
+        telemetry_rates={
+            "GLOBAL_POSITION_INT": args.position_rate,
+            "ATTITUDE": args.attitude_rate,
+            "MISSION_CURRENT": 1,
+        }
+    )
+    port = await swarm.start(args.host, args.port)
+    print(f"Simulating {args.drones} drones on tcp:{args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"{swarm.ticks} ticks, {swarm.overruns} overruns")
+    finally:
+        await swarm.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drones", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=14550)
+    parser.add_argument("--latency", type=float, default=0.0, help="vehicle response delay (s)")
+    parser.add_argument("--tick-rate", type=float, default=20.0)
+    parser.add_argument("--position-rate", type=float, default=4.0, help="default GLOBAL_POSITION_INT Hz")
+    parser.add_argument("--attitude-rate", type=float, default=4.0, help="default ATTITUDE Hz")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
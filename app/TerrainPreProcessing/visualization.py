@@ -385,14 +385,23 @@ class Interactive_Visualization:
                 point.set_data([], [])  # Initially empty plot
                 return [point]
 
+            snapshot = self.missionState.snapshot
+            last_generation = [None]
+
             # Update function for each frame
             def update(frame):
-                # Poll the latest coordinates
+                # Read the latest coordinates, nothing to redraw if no drone reported since the last frame
+                result = snapshot.read(since=last_generation[0])
+                if result is None:
+                    return [point]
+                last_generation[0], state = result
                 x_coords = []
                 y_coords = []
                 for drone_id in drone_paths:
-                    current_drone = self.missionState.drones[drone_id]
-                    x,y = current_drone.longitude / 10**7,current_drone.latitude/ 10**7
+                    row = snapshot.row(self.missionState.drones[drone_id].drone_id)
+                    if row is None or row >= len(state["latitude"]) or state["latitude"][row] != state["latitude"][row]:
+                        continue  # no position yet
+                    x,y = state["longitude"][row] / 10**7, state["latitude"][row] / 10**7
                     x_coords.append(x)
                     y_coords.append(y)
                     # If text doesn't exist for this drone_id, create it and store it
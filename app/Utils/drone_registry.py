@@ -0,0 +1,63 @@
+import bisect
+
+
+class DroneRegistry:
+    """
+    Drones keyed by MAVLink system id, with a stable dense index per drone.
+
+    get() is a dict lookup, so per-message handlers no longer scan every drone. index() is the
+    order the drone was registered in and never changes, which makes it usable as a row in
+    per-drone arrays (SwarmSnapshot uses it for its rows). Iterating, len() and [i] behave like
+    the sorted-by-id list missionState used to keep, so code that walks the swarm in id order,
+    or pairs drones with per-drone plans by position, is unchanged.
+    """
+
+    def __init__(self):
+        self.by_id = {}  # drone_id -> item
+        self.indices = {}  # drone_id -> dense index
+        self.items = []  # dense index -> item
+        self.sorted_ids = []
+
+    def add(self, drone_id, item):
+        """Register a drone. Returns its dense index; registering an id again replaces the item in place."""
+        index = self.indices.get(drone_id)
+        if index is not None:
+            self.items[index] = item
+            self.by_id[drone_id] = item
+            return index
+        index = len(self.items)
+        self.items.append(item)
+        self.by_id[drone_id] = item
+        self.indices[drone_id] = index
+        bisect.insort(self.sorted_ids, drone_id)
+        return index
+
+    def get(self, drone_id, default=None):
+        return self.by_id.get(drone_id, default)
+
+    def index(self, drone_id):
+        """Dense index of a drone, or None if it is not registered."""
+        return self.indices.get(drone_id)
+
+    def by_index(self, index):
+        return self.items[index]
+
+    def ids(self):
+        """Registered system ids in ascending order."""
+        return list(self.sorted_ids)
+
+    def __contains__(self, drone_id):
+        return drone_id in self.by_id
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        by_id = self.by_id
+        return (by_id[drone_id] for drone_id in list(self.sorted_ids))
+
+    def __getitem__(self, position):
+        """The drone at `position` in id order, like indexing the old sorted list."""
+        if isinstance(position, slice):
+            return [self.by_id[drone_id] for drone_id in self.sorted_ids[position]]
+        return self.by_id[self.sorted_ids[position]]
@@ -0,0 +1,220 @@
+import math
+
+EARTH_RADIUS = 6371000  # meters, same as coordinate_estimation.calculate_distance_between_points
+
+
+class LocalFrame:
+    """
+    Flat east/north (ENU without up) frame in meters around an origin.
+
+    Uses the equirectangular approximation, which is within a fraction of a percent of the
+    haversine distance across a mission area of a few kilometers, and needs one multiply per
+    axis instead of trig per distance.
+    """
+
+    def __init__(self, origin_lat, origin_lon):
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.meters_per_deg_lat = math.radians(1) * EARTH_RADIUS
+        self.meters_per_deg_lon = self.meters_per_deg_lat * math.cos(math.radians(origin_lat))
+
+    def to_enu(self, lat, lon):
+        """(east, north) in meters of a point in degrees."""
+        return ((lon - self.origin_lon) * self.meters_per_deg_lon,
+                (lat - self.origin_lat) * self.meters_per_deg_lat)
+
+    def to_geodetic(self, east, north):
+        """(lat, lon) in degrees of a point in the frame."""
+        return (self.origin_lat + north / self.meters_per_deg_lat,
+                self.origin_lon + east / self.meters_per_deg_lon)
+
+
+class GridEntry:
+    __slots__ = ("east", "north", "cell", "item")
+
+    def __init__(self, east, north, cell, item):
+        self.east = east
+        self.north = north
+        self.cell = cell
+        self.item = item
+
+
+class GridIndex:
+    """
+    Grid hash of items at fixed points, for "what is within r meters of here" queries.
+
+    Points are projected once into a LocalFrame (anchored at the first point inserted unless a
+    frame is given) and bucketed into square cells of `cell_size` meters. A query only looks at
+    the cells its circle overlaps and compares squared distances, so its cost depends on how
+    many points are nearby, not on how many there are. A cell size close to the usual query
+    radius keeps that to a 3x3 block of cells.
+    insert() returns a GridEntry handle for remove() and move(); items can be anything, including
+    unhashable dicts.
+    """
+
+    def __init__(self, cell_size, frame=None):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self.frame = frame
+        self.cells = {}  # (column, row) -> [GridEntry]
+        self.count = 0
+        self.bounds = None  # (min column, min row, max column, max row) ever used, for ring searches
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for entries in self.cells.values():
+            for entry in entries:
+                yield entry.item
+
+    def _cell(self, east, north):
+        return (math.floor(east / self.cell_size), math.floor(north / self.cell_size))
+
+    def _add(self, entry):
+        self.cells.setdefault(entry.cell, []).append(entry)
+        self.count += 1
+        column, row = entry.cell
+        if self.bounds is None:
+            self.bounds = (column, row, column, row)
+        else:
+            min_column, min_row, max_column, max_row = self.bounds
+            self.bounds = (min(min_column, column), min(min_row, row), max(max_column, column), max(max_row, row))
+
+    def to_enu(self, lat, lon):
+        if self.frame is None:
+            self.frame = LocalFrame(lat, lon)
+        return self.frame.to_enu(lat, lon)
+
+    def insert(self, lat, lon, item):
+        east, north = self.to_enu(lat, lon)
+        cell = self._cell(east, north)
+        entry = GridEntry(east, north, cell, item)
+        self._add(entry)
+        return entry
+
+    def remove(self, entry):
+        entries = self.cells.get(entry.cell)
+        if entries is None or entry not in entries:
+            return False
+        entries.remove(entry)
+        if not entries:
+            del self.cells[entry.cell]
+        self.count -= 1
+        return True
+
+    def move(self, entry, lat, lon):
+        """Move an entry to a new position, e.g. after averaging it with a new observation."""
+        entry.east, entry.north = self.to_enu(lat, lon)
+        cell = self._cell(entry.east, entry.north)
+        if cell != entry.cell:
+            self.remove(entry)
+            entry.cell = cell
+            self._add(entry)
+
+    def insert_or_match(self, lat, lon, item, radius):
+        """
+        Merge-on-insert: the entry of the closest item within `radius` meters if there is one,
+        otherwise insert `item`. Returns (entry, inserted).
+        """
+        found = self.within_entries(lat, lon, radius)
+        if found:
+            return min(found, key=lambda pair: pair[0])[1], False
+        return self.insert(lat, lon, item), True
+
+    def clear(self):
+        self.cells = {}
+        self.count = 0
+        self.bounds = None
+
+    def within_entries(self, lat, lon, radius):
+        """[(squared distance in m^2, GridEntry)] of every entry within `radius` meters, unsorted."""
+        if not self.count:
+            return []
+        east, north = self.to_enu(lat, lon)
+        radius_sq = radius * radius
+        min_column, min_row = self._cell(east - radius, north - radius)
+        max_column, max_row = self._cell(east + radius, north + radius)
+        cells = self.cells
+        found = []
+        for column in range(min_column, max_column + 1):
+            for row in range(min_row, max_row + 1):
+                entries = cells.get((column, row))
+                if entries is None:
+                    continue
+                for entry in entries:
+                    de = entry.east - east
+                    dn = entry.north - north
+                    distance_sq = de * de + dn * dn
+                    if distance_sq <= radius_sq:
+                        found.append((distance_sq, entry))
+        return found
+
+    def within(self, lat, lon, radius):
+        """Items within `radius` meters of (lat, lon) in degrees."""
+        return [entry.item for _, entry in self.within_entries(lat, lon, radius)]
+
+    def nearest(self, lat, lon, radius):
+        """(item, distance in meters) of the closest item within `radius`, or None."""
+        found = self.within_entries(lat, lon, radius)
+        if not found:
+            return None
+        distance_sq, entry = min(found, key=lambda pair: pair[0])
+        return entry.item, math.sqrt(distance_sq)
+
+    def nearest_entry(self, lat, lon, max_radius=math.inf, accept=None):
+        """
+        (distance in meters, GridEntry) of the closest entry within `max_radius` for which
+        accept(item, distance) is true, or None. Searches rings of cells outwards from the query point and stops as soon
+        as no unvisited cell can hold anything closer, so it needs no radius guess.
+        """
+        if not self.count:
+            return None
+        east, north = self.to_enu(lat, lon)
+        center_column, center_row = self._cell(east, north)
+        min_column, min_row, max_column, max_row = self.bounds
+        last_ring = max(center_column - min_column, max_column - center_column, center_row - min_row, max_row - center_row)
+        if max_radius != math.inf:
+            last_ring = min(last_ring, math.ceil(max_radius / self.cell_size) + 1)
+        best_sq = max_radius * max_radius
+        best = None
+        cells = self.cells
+        grid_cells = (max_column - min_column + 1) * (max_row - min_row + 1)
+        # a ring search visits about grid_cells / count cells before its first hit, a few rings more to finish
+        expected_cells = min((2 * last_ring + 1) ** 2, 4 * grid_cells / self.count)
+        if self.count < expected_cells:
+            # sparse: fewer entries than cells to visit, checking them all is cheaper
+            for entries in cells.values():
+                for entry in entries:
+                    de = entry.east - east
+                    dn = entry.north - north
+                    distance_sq = de * de + dn * dn
+                    if distance_sq <= best_sq and (best is None or distance_sq < best_sq) and (accept is None or accept(entry.item, math.sqrt(distance_sq))):
+                        best_sq = distance_sq
+                        best = entry
+            return None if best is None else (math.sqrt(best_sq), best)
+        for ring in range(max(0, last_ring) + 1):
+            if ring == 0:
+                ring_cells = [(center_column, center_row)]
+            else:
+                ring_cells = [(center_column + offset, center_row + side) for side in (-ring, ring) for offset in range(-ring, ring + 1)]
+                ring_cells += [(center_column + side, center_row + offset) for side in (-ring, ring) for offset in range(-ring + 1, ring)]
+            for cell in ring_cells:
+                entries = cells.get(cell)
+                if entries is None:
+                    continue
+                for entry in entries:
+                    de = entry.east - east
+                    dn = entry.north - north
+                    distance_sq = de * de + dn * dn
+                    if distance_sq <= best_sq and (best is None or distance_sq < best_sq) and (accept is None or accept(entry.item, math.sqrt(distance_sq))):
+                        best_sq = distance_sq
+                        best = entry
+            # everything outside this ring is at least ring * cell_size away
+            reach = ring * self.cell_size
+            if best is not None and best_sq <= reach * reach:
+                break
+        if best is None:
+            return None
+        return math.sqrt(best_sq), best
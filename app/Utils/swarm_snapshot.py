@@ -0,0 +1,150 @@
+import time
+import numpy as np
+
+# column -> dtype. Position/velocity are kept in raw MAVLink units like missionState.Drone:
+# lat/lon deg * 1e7, altitudes mm, heading cdeg, velocities cm/s. Attitude in radians.
+SNAPSHOT_FIELDS = {
+    "drone_id": np.int32,
+    "system_status": np.int16,
+    "latitude": np.float64,
+    "longitude": np.float64,
+    "altitude": np.float64,
+    "relative_altitude": np.float64,
+    "heading": np.float64,
+    "vx": np.float64,
+    "vy": np.float64,
+    "vz": np.float64,
+    "roll": np.float64,
+    "pitch": np.float64,
+    "yaw": np.float64,
+    # generation of the last write to each group, so readers can tell which rows changed
+    "position_version": np.uint64,
+    "attitude_version": np.uint64,
+    "status_version": np.uint64,
+}
+# MAVLink sends these as integers, as_dicts() hands them back that way
+INTEGER_FIELDS = {"latitude", "longitude", "altitude", "relative_altitude", "heading", "vx", "vy", "vz"}
+
+
+class SwarmSnapshot:
+    """
+    Latest-value state of every drone as a structure of arrays, one row per drone.
+
+    The telemetry ingest path (a single writer thread) updates rows in place. Every write bumps
+    `generation` to an odd value before touching the arrays and to the next even value after, so
+    read() can return a consistent copy without taking a lock, and a reader that remembers the
+    generation of its last frame can skip work entirely when nothing changed. The second bump is
+    in a finally, so a write that raises on a bad value can't leave the generation odd and read()
+    spinning.
+    Values that have never been reported are NaN. With a DroneRegistry, a drone's row is its
+    registry index, so the same index addresses it in missionState, the GUI and these arrays.
+    """
+
+    def __init__(self, capacity=16, registry=None):
+        self.generation = 0
+        self.count = 0
+        self.rows = {}  # drone_id -> row
+        self.registry = registry
+        self.arrays = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        arrays = {}
+        for name, dtype in SNAPSHOT_FIELDS.items():
+            array = np.full(capacity, np.nan, dtype=dtype) if np.issubdtype(dtype, np.floating) else np.zeros(capacity, dtype=dtype)
+            if name in self.arrays:
+                array[:self.count] = self.arrays[name][:self.count]
+            arrays[name] = array
+            setattr(self, name, array)
+        self.arrays = arrays
+        self.capacity = capacity
+
+    def _row(self, drone_id):
+        row = self.rows.get(drone_id)
+        if row is None:
+            row = self.registry.index(drone_id) if self.registry is not None else None
+            if row is None:
+                row = self.count
+            if row >= self.capacity:
+                self._allocate(max(self.capacity * 2, row + 1))
+            self.drone_id[row] = drone_id
+            self.count = max(self.count, row + 1)
+            self.rows[drone_id] = row
+        return row
+
+    def row(self, drone_id):
+        """Row of a drone in read() frames, or None if it has never reported."""
+        return self.rows.get(drone_id)
+
+    # Writers (single ingest thread)
+    def update_position(self, drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz):
+        self.generation += 1
+        try:
+            row = self._row(drone_id)
+            self.latitude[row] = latitude
+            self.longitude[row] = longitude
+            self.altitude[row] = altitude
+            self.relative_altitude[row] = relative_altitude
+            self.heading[row] = heading
+            self.vx[row] = vx
+            self.vy[row] = vy
+            self.vz[row] = vz
+            self.position_version[row] = self.generation + 1
+        finally:
+            self.generation += 1
+
+    def update_attitude(self, drone_id, roll, pitch, yaw):
+        self.generation += 1
+        try:
+            row = self._row(drone_id)
+            self.roll[row] = roll
+            self.pitch[row] = pitch
+            self.yaw[row] = yaw
+            self.attitude_version[row] = self.generation + 1
+        finally:
+            self.generation += 1
+
+    def update_status(self, drone_id, system_status):
+        self.generation += 1
+        try:
+            row = self._row(drone_id)
+            self.system_status[row] = system_status
+            self.status_version[row] = self.generation + 1
+        finally:
+            self.generation += 1
+
+    # Readers (any thread)
+    def read(self, since=None):
+        """
+        Consistent copy of every row as (generation, {field: array}).
+        Returns None if `since` is given and nothing has changed since that generation.
+        """
+        while True:
+            generation = self.generation
+            if generation == since:
+                return None
+            if generation & 1:
+                time.sleep(0)  # write in progress, let the writer finish
+                continue
+            count = self.count
+            frame = {name: array[:count].copy() for name, array in self.arrays.items()}
+            if self.generation == generation:
+                return generation, frame
+
+    def as_dicts(self):
+        """One dict per drone with the snapshot fields, None for values not reported yet."""
+        _, frame = self.read()
+        drones = []
+        for row in range(len(frame["drone_id"])):
+            drone = {}
+            for name, values in frame.items():
+                if name.endswith("_version"):
+                    continue
+                value = values[row].item()
+                if value != value:
+                    value = None  # NaN, not reported yet
+                elif name in INTEGER_FIELDS:
+                    value = int(value)
+                drone[name] = value
+            drones.append(drone)
+        return drones
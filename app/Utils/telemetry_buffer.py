@@ -0,0 +1,75 @@
+import time
+import numpy as np
+
+
+class TelemetryRingBuffer:
+    """
+    Fixed-capacity, NumPy-backed history of timestamped telemetry samples for one drone.
+
+    Samples are rows of float64 [timestamp, field1, field2, ...]. Storage is a single
+    preallocated (2 * capacity, n) array and every sample is written twice, at slot i and
+    i + capacity, so the most recent N samples are always one contiguous slice. latest()
+    and window() therefore return views into the buffer, never copies.
+
+    Views alias the live buffer: copy them if you need to keep them across further appends.
+    """
+
+    def __init__(self, fields, capacity=3000):
+        self.fields = ("timestamp",) + tuple(fields)
+        self.columns = {name: i for i, name in enumerate(self.fields)}
+        self.capacity = capacity
+        self.data = np.zeros((2 * capacity, len(self.fields)), dtype=np.float64)
+        self.count = 0  # total samples ever written
+        self.head = 0  # slot the next sample goes into
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, *values):
+        """Write one sample in place. Values must be in the order of `fields`."""
+        head = self.head
+        data = self.data
+        data[head, 0] = timestamp
+        data[head, 1:] = values
+        data[head + self.capacity] = data[head]
+        self.head = head + 1 if head + 1 < self.capacity else 0
+        self.count += 1
+
+    def latest(self, n=None):
+        """View of the newest n samples (all stored samples by default), oldest first."""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        end = self.head + self.capacity  # one past the newest sample in the upper copy
+        return self.data[end - n:end]
+
+    def window(self, seconds, now=None):
+        """View of the samples from the last `seconds` seconds, oldest first."""
+        if now is None:
+            now = time.time()
+        samples = self.latest()
+        start = np.searchsorted(samples[:, 0], now - seconds, side="left")
+        return samples[start:]
+
+    def last(self):
+        """View of the newest sample, or None if nothing has been written."""
+        if self.count == 0:
+            return None
+        return self.latest(1)[0]
+
+    def column(self, samples, name):
+        """Column `name` of a latest()/window() result."""
+        return samples[:, self.columns[name]]
+
+
+POSITION_FIELDS = ("latitude", "longitude", "altitude", "relative_altitude", "heading", "vx", "vy", "vz")
+ATTITUDE_FIELDS = ("roll", "pitch", "yaw")
+
+
+def position_buffer(capacity=3000):
+    """Ring buffer for GLOBAL_POSITION_INT samples (raw MAVLink units: deg * 1e7, mm, cdeg, cm/s)."""
+    return TelemetryRingBuffer(POSITION_FIELDS, capacity)
+
+
+def attitude_buffer(capacity=3000):
+    """Ring buffer for ATTITUDE samples (radians)."""
+    return TelemetryRingBuffer(ATTITUDE_FIELDS, capacity)
@@ -0,0 +1,259 @@
+"""
+Dispatcher receive-path throughput under synthetic telemetry.
+
+A loopback TCP stand-in streams pre-encoded MAVLink frames for N drones at a fixed rate per drone,
+and the Dispatcher reads them through receive_packets() exactly as it would Mission Planner's
+mirror. For every drone count x rate it reports messages/s, p50/p99 latency of the handlers for
+each message type, and CPU per message, as JSON so runs can be compared across releases.
+
+Run from the app directory:
+    python -m benchmarks.bench_dispatcher_throughput [--drones 10 50 100] [--rates 10 50] [--output results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import time
+
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from Dispatcher import Dispatcher
+from benchmarks.common import BenchMissionState, start_background_loop, run_in_loop, percentile
+
+# Frames in one pass of each drone's stream. VFR_HUD has no handler, so it measures the cost of
+# frames the Dispatcher skips without decoding.
+MESSAGE_MIX = ["GLOBAL_POSITION_INT", "ATTITUDE"] * 4 + ["MISSION_CURRENT", "VFR_HUD"]
+CYCLE_LENGTH = 256  # one full MAVLink sequence cycle, so replaying it never shows up as loss
+
+
+def encode_cycle(system_id, rate):
+    """CYCLE_LENGTH consecutive frames of one drone: MESSAGE_MIX plus a heartbeat every `rate` frames (~1 Hz)."""
+    mav = mavlink2.MAVLink(None, srcSystem=system_id, srcComponent=mavlink2.MAV_COMP_ID_AUTOPILOT1)
+    frames = []
+    kinds = []
+    heartbeat_every = max(1, int(rate))
+    telemetry = 0
+    for i in range(CYCLE_LENGTH):
+        if i % heartbeat_every == 0:
+            kind = "HEARTBEAT"
+            msg = mav.heartbeat_encode(mavlink2.MAV_TYPE_QUADROTOR, mavlink2.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                       mavlink2.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, 4, mavlink2.MAV_STATE_ACTIVE)
+        else:
+            kind = MESSAGE_MIX[telemetry % len(MESSAGE_MIX)]
+            telemetry += 1
+            if kind == "GLOBAL_POSITION_INT":
+                msg = mav.global_position_int_encode(i * 50, 286024274 + i, -812000599 - i, 40000, 10000, 100, -50, 0, 9000)
+            elif kind == "ATTITUDE":
+                msg = mav.attitude_encode(i * 50, 0.01, -0.2, 1.5, 0.0, 0.0, 0.0)
+            elif kind == "MISSION_CURRENT":
+                msg = mav.mission_current_encode(i % 10, 10, mavlink2.MISSION_STATE_ACTIVE)
+            else:
+                msg = mav.vfr_hud_encode(10.0, 10.0, 90, 50, 40.0, 0.0)
+        frames.append(bytes(msg.pack(mav)))
+        kinds.append(kind)
+        mav.seq = (mav.seq + 1) % 256
+    return frames, kinds
+
+
+class SyntheticSwarm(asyncio.Protocol):
+    """
+    Loopback TCP endpoint that replays each drone's pre-encoded cycle at `rate` frames/s.
+    Frames are encoded up front so the sender costs little more than the socket writes, and
+    COMMAND_LONGs (the Dispatcher's stream rate requests) are acknowledged so nothing retries.
+    """
+
+    def __init__(self, system_ids, rate, tick=0.005):
+        self.rate = rate
+        self.tick = tick
+        self.cycles = {system_id: encode_cycle(system_id, rate) for system_id in system_ids}
+        self.positions = dict.fromkeys(self.cycles, 0)
+        self.sent = dict.fromkeys(MESSAGE_MIX + ["HEARTBEAT"], 0)
+        self.parser = mavlink2.MAVLink(None)
+        self.parser.robust_parsing = True
+        self.ack_encoders = {
+            system_id: mavlink2.MAVLink(None, srcSystem=system_id, srcComponent=mavlink2.MAV_COMP_ID_AUTOPILOT1)
+            for system_id in system_ids
+        }
+        self.transports = []
+        self.server = None
+        self.task = None
+
+    def connection_made(self, transport):
+        self.transports.append(transport)
+
+    def connection_lost(self, exc):
+        self.transports = [t for t in self.transports if not t.is_closing()]
+
+    def data_received(self, data):
+        for msg in self.parser.parse_buffer(data) or ():
+            if msg.get_type() != "COMMAND_LONG" or msg.target_system not in self.ack_encoders:
+                continue
+            mav = self.ack_encoders[msg.target_system]
+            ack = mav.command_ack_encode(msg.command, mavlink2.MAV_RESULT_ACCEPTED)
+            for transport in self.transports:
+                transport.write(ack.pack(mav))
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: self, "127.0.0.1", 0)
+        self.task = asyncio.ensure_future(self._send_loop())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.task.cancel()
+        for transport in self.transports:
+            transport.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def sent_total(self):
+        return sum(self.sent.values())
+
+    async def _send_loop(self):
+        while not self.transports:
+            await asyncio.sleep(self.tick)
+        start = time.monotonic()
+        emitted = 0  # frames per drone so far
+        while True:
+            due = int((time.monotonic() - start) * self.rate)
+            if due > emitted:
+                batch = bytearray()
+                for system_id, (frames, kinds) in self.cycles.items():
+                    position = self.positions[system_id]
+                    for _ in range(due - emitted):
+                        batch += frames[position]
+                        self.sent[kinds[position]] += 1
+                        position = (position + 1) % CYCLE_LENGTH
+                    self.positions[system_id] = position
+                emitted = due
+                for transport in self.transports:
+                    transport.write(batch)
+            await asyncio.sleep(self.tick)
+
+
+class DispatchTimer:
+    """Wraps Dispatcher._dispatch to time every message's handlers, per message type, on the loop thread."""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.dispatch = dispatcher._dispatch
+        self.measuring = False
+        self.latency_ns = {}  # msg type -> [wall ns]
+        self.cpu_ns = {}  # msg type -> total thread cpu ns
+        dispatcher._dispatch = self.timed_dispatch
+
+    async def timed_dispatch(self, msg):
+        if not self.measuring:
+            return await self.dispatch(msg)
+        cpu = time.thread_time_ns()
+        start = time.perf_counter_ns()
+        await self.dispatch(msg)
+        elapsed = time.perf_counter_ns() - start
+        cpu = time.thread_time_ns() - cpu
+        name = msg.get_type()
+        samples = self.latency_ns.get(name)
+        if samples is None:
+            samples = self.latency_ns[name] = []
+            self.cpu_ns[name] = 0
+        samples.append(elapsed)
+        self.cpu_ns[name] += cpu
+
+    async def begin(self):
+        self.latency_ns = {}
+        self.cpu_ns = {}
+        self.measuring = True
+        return time.thread_time(), time.process_time(), time.perf_counter()
+
+    async def end(self):
+        self.measuring = False
+        return time.thread_time(), time.process_time(), time.perf_counter()
+
+
+def run_scenario(sender_loop, drones, rate, warmup, duration):
+    system_ids = list(range(1, drones + 1))
+    swarm = SyntheticSwarm(system_ids, rate)
+    port = run_in_loop(sender_loop, swarm.start())
+
+    dispatcher = Dispatcher.Dispatcher(BenchMissionState(system_ids))
+    if not dispatcher.connect(f"tcp:127.0.0.1:{port}"):
+        raise SystemExit("could not connect to the synthetic swarm")
+    timer = DispatchTimer(dispatcher)
+    receiving = dispatcher.start()
+    # let discovery and stream rate negotiation finish before measuring
+    time.sleep(warmup)
+
+    sent_before = dict(swarm.sent)
+    loop_cpu0, process_cpu0, wall0 = run_in_loop(dispatcher.loop, timer.begin())
+    time.sleep(duration)
+    loop_cpu1, process_cpu1, wall1 = run_in_loop(dispatcher.loop, timer.end())
+    sent = {name: swarm.sent[name] - sent_before[name] for name in swarm.sent}
+
+    run_in_loop(sender_loop, swarm.stop())
+    receiving.result(5)  # the receive loop ends once the link closes
+    queue = dispatcher.event_metrics()
+    dispatcher.shutdown()
+
+    elapsed = wall1 - wall0
+    handled = sum(len(samples) for samples in timer.latency_ns.values())
+    handlers = {}
+    for name, samples in sorted(timer.latency_ns.items()):
+        handlers[name] = {
+            "messages": len(samples),
+            "messages_per_s": round(len(samples) / elapsed, 1),
+            "offered_per_s": round(sent.get(name, 0) / elapsed, 1),
+            "p50_us": round(percentile(samples, 50) / 1e3, 2),
+            "p99_us": round(percentile(samples, 99) / 1e3, 2),
+            "max_us": round(max(samples) / 1e3, 2),
+            "cpu_us_per_msg": round(timer.cpu_ns[name] / len(samples) / 1e3, 2),
+        }
+    return {
+        "drones": drones,
+        "rate_per_drone_hz": rate,
+        "duration_s": round(elapsed, 3),
+        "offered_per_s": round(sum(sent.values()) / elapsed, 1),
+        "messages_per_s": round(handled / elapsed, 1),
+        # everything on the dispatcher thread: socket reads, frame splitting, decoding, handlers
+        "loop_cpu_us_per_msg": round((loop_cpu1 - loop_cpu0) / handled * 1e6, 2) if handled else None,
+        # whole process, including the missionState consumer thread and the synthetic sender
+        "process_cpu_us_per_msg": round((process_cpu1 - process_cpu0) / handled * 1e6, 2) if handled else None,
+        "event_queue_dropped": queue["dropped"],
+        "handlers": handlers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drones", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 50], help="frames/s sent by each drone")
+    parser.add_argument("--warmup", type=float, default=4.0, help="seconds before measuring (discovery, stream rates)")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per scenario")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    sender_loop = start_background_loop()
+    scenarios = []
+    for drones in args.drones:
+        for rate in args.rates:
+            # the Dispatcher prints per drone (discovery, stream rates), keep the JSON clean
+            with contextlib.redirect_stdout(io.StringIO()):
+                scenarios.append(run_scenario(sender_loop, drones, rate, args.warmup, args.duration))
+
+    results = {
+        "benchmark": "dispatcher_throughput",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "message_mix": MESSAGE_MIX,
+        "scenarios": scenarios,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Per-message drone lookup cost in missionState, linear scan vs DroneRegistry, by swarm size.
+
+Replays a stream of position updates for randomly chosen drones through the missionState ingest
+pattern (resolve the drone, write its row of the SwarmSnapshot) and through the GUI's (resolve
+the map marker), once with the old `next(d for d in drones if d.drone_id == ...)` scan over a
+sorted list and once with DroneRegistry.get(). Reports ns per message for each.
+
+Run from the app directory:
+    python -m benchmarks.bench_drone_registry [--drones 10 100 250 500] [--messages 200000] [--json]
+"""
+import argparse
+import json
+import random
+import time
+
+from Utils.drone_registry import DroneRegistry
+from Utils.swarm_snapshot import SwarmSnapshot
+
+
+class BenchDrone:
+    """The part of missionState.Drone that position updates touch."""
+    def __init__(self, snapshot, drone_id):
+        self.snapshot = snapshot
+        self.drone_id = drone_id
+        self.id = drone_id  # GUI markers are keyed by .id
+        self.latitude = None
+        self.longitude = None
+
+    def updatePosition(self, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.snapshot.update_position(self.drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
+
+
+def ingest_scan(drones, stream):
+    for drone_id in stream:
+        drone = next((d for d in drones if d.drone_id == drone_id), None)
+        if drone is not None:
+            drone.updatePosition(286024274, -812000599, 40000, 10000, 9000, 100, -50, 0)
+
+
+def ingest_registry(drones, stream):
+    for drone_id in stream:
+        drone = drones.get(drone_id)
+        if drone is not None:
+            drone.updatePosition(286024274, -812000599, 40000, 10000, 9000, 100, -50, 0)
+
+
+def gui_scan(markers, stream):
+    for drone_id in stream:
+        next((drone for drone in markers if drone.id == drone_id), None)
+
+
+def gui_registry(markers, stream):
+    for drone_id in stream:
+        markers.get(drone_id)
+
+
+def time_per_message(function, drones, stream):
+    start = time.perf_counter_ns()
+    function(drones, stream)
+    return (time.perf_counter_ns() - start) / len(stream)
+
+
+def run_scenario(count, messages, seed):
+    system_ids = list(range(1, count + 1))
+    rng = random.Random(seed)
+    rng.shuffle(system_ids)  # drones announce themselves in no particular order
+    stream = [rng.choice(system_ids) for _ in range(messages)]
+
+    scan_snapshot = SwarmSnapshot()
+    scan_drones = sorted((BenchDrone(scan_snapshot, drone_id) for drone_id in system_ids), key=lambda d: d.drone_id)
+    registry = DroneRegistry()
+    registry_snapshot = SwarmSnapshot(registry=registry)
+    for drone_id in system_ids:
+        registry.add(drone_id, BenchDrone(registry_snapshot, drone_id))
+
+    result = {
+        "drones": count,
+        "messages": messages,
+        "ingest_scan_ns": round(time_per_message(ingest_scan, scan_drones, stream), 1),
+        "ingest_registry_ns": round(time_per_message(ingest_registry, registry, stream), 1),
+        "gui_scan_ns": round(time_per_message(gui_scan, scan_drones, stream), 1),
+        "gui_registry_ns": round(time_per_message(gui_registry, registry, stream), 1),
+    }
+    result["ingest_speedup"] = round(result["ingest_scan_ns"] / result["ingest_registry_ns"], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drones", type=int, nargs="+", default=[10, 100, 250, 500])
+    parser.add_argument("--messages", type=int, default=200000, help="position updates per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [run_scenario(count, args.messages, args.seed) for count in args.drones]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'drones':>7} {'ingest scan':>12} {'ingest reg':>11} {'gui scan':>9} {'gui reg':>8} {'speedup':>8}  (ns/message)")
+    for r in results:
+        print(f"{r['drones']:>7} {r['ingest_scan_ns']:>12.0f} {r['ingest_registry_ns']:>11.0f} "
+              f"{r['gui_scan_ns']:>9.0f} {r['gui_registry_ns']:>8.0f} {r['ingest_speedup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
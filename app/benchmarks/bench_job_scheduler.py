@@ -0,0 +1,145 @@
+"""
+JobScheduler decision latency with thousands of pending jobs.
+
+Fills the pool with jobs at random positions and priorities over a few km, then measures:
+  - drone_free: a drone finishing its work picks its next job from the pool
+  - submit: a new job arrives while a few drones are idle (cost over the idle drones)
+Both are reported as p50/p99/max microseconds per decision, per pool size.
+
+Run from the app directory:
+    python -m benchmarks.bench_job_scheduler [--jobs 1000 5000 20000] [--drones 100] [--json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+from PathPlanning.job_scheduler import JobScheduler
+from Utils.drone_registry import DroneRegistry
+from benchmarks.common import percentile
+
+ORIGIN = (28.6024274, -81.2000599)
+AREA = 0.03  # degrees either side of the origin, about 3 km
+
+
+class BenchJob:
+    def __init__(self, job_id, waypoints, priority):
+        self.job_id = job_id
+        self.job_type = "Search"
+        self.job_status = "pending"
+        self.waypoints = waypoints
+        self.job_priority = priority
+        self.last_waypoint = 0
+        self.upload_try_count = 0
+
+    def __lt__(self, other):
+        return self.job_priority > other.job_priority
+
+
+class BenchQueue:
+    def __init__(self):
+        self.queue = []
+
+    def is_empty(self):
+        return not self.queue
+
+
+class BenchDrone:
+    """What JobScheduler reads from missionState.Drone; addJob just takes the job."""
+    def __init__(self, drone_id, rng):
+        self.drone_id = drone_id
+        self.latitude = int((ORIGIN[0] + rng.uniform(-AREA, AREA)) * 1e7)
+        self.longitude = int((ORIGIN[1] + rng.uniform(-AREA, AREA)) * 1e7)
+        self.home_latitude = int(ORIGIN[0] * 1e7)
+        self.home_longitude = int(ORIGIN[1] * 1e7)
+        self.available = True
+        self.link_state = "alive"
+        self.battery_remaining = rng.uniform(40, 100)
+        self.active_job = None
+        self.jobQueue = BenchQueue()
+
+    def addJob(self, job, send=True):
+        self.active_job = job
+
+
+def make_job(job_id, rng):
+    lat = ORIGIN[0] + rng.uniform(-AREA, AREA)
+    lon = ORIGIN[1] + rng.uniform(-AREA, AREA)
+    waypoints = [(lat + i * 1e-4, lon, 10, 0) for i in range(5)]
+    return BenchJob(job_id, waypoints, rng.choice([1, 1, 1, 2, 3, 5, 8]))
+
+
+def run_scenario(jobs, drones, decisions, seed):
+    rng = random.Random(seed)
+    registry = DroneRegistry()
+    for drone_id in range(1, drones + 1):
+        registry.add(drone_id, BenchDrone(drone_id, rng))
+    scheduler = JobScheduler(registry)
+    for drone in registry:
+        drone.active_job = make_job(-drone.drone_id, rng)  # everyone busy while the pool fills
+    for job_id in range(jobs):
+        scheduler.submit(make_job(job_id, rng))
+
+    # a drone finishes and takes the next job; a new job arrives to keep the pool size steady
+    free_us = []
+    next_id = jobs
+    all_drones = list(registry)
+    for _ in range(decisions):
+        drone = rng.choice(all_drones)
+        drone.active_job = None
+        start = time.perf_counter_ns()
+        scheduler.drone_free(drone)
+        free_us.append((time.perf_counter_ns() - start) / 1e3)
+        drone.active_job = drone.active_job or make_job(-drone.drone_id, rng)
+        job = make_job(next_id, rng)
+        scheduler._add_pending(job, scheduler.job_start(job))
+        next_id += 1
+
+    # a handful of drones idle, new jobs go straight to one of them
+    idle = rng.sample(all_drones, min(10, drones))
+    submit_us = []
+    for _ in range(decisions):
+        for drone in idle:
+            drone.active_job = None
+            scheduler.idle[drone.drone_id] = drone
+        job = make_job(next_id, rng)
+        next_id += 1
+        start = time.perf_counter_ns()
+        scheduler.submit(job)
+        submit_us.append((time.perf_counter_ns() - start) / 1e3)
+
+    return {
+        "pending_jobs": jobs,
+        "drones": drones,
+        "drone_free_p50_us": round(percentile(free_us, 50), 1),
+        "drone_free_p99_us": round(percentile(free_us, 99), 1),
+        "drone_free_max_us": round(max(free_us), 1),
+        "submit_p50_us": round(percentile(submit_us, 50), 1),
+        "submit_p99_us": round(percentile(submit_us, 99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--drones", type=int, default=100)
+    parser.add_argument("--decisions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the scheduler prints every assignment
+        results = [run_scenario(jobs, args.drones, args.decisions, args.seed) for jobs in args.jobs]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'jobs':>7} {'free p50':>9} {'free p99':>9} {'free max':>9} {'submit p50':>11} {'submit p99':>11}  (us)")
+    for r in results:
+        print(f"{r['pending_jobs']:>7} {r['drone_free_p50_us']:>9} {r['drone_free_p99_us']:>9} {r['drone_free_max_us']:>9} "
+              f"{r['submit_p50_us']:>11} {r['submit_p99_us']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+End-to-end mission upload latency against the in-process simulated vehicle.
+
+Run from the app directory:
+    python -m benchmarks.bench_mission_upload [--latency 0.02] [--repeat 5]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from Dispatcher import Dispatcher
+from Simulation.sim_swarm import SimSwarm
+from benchmarks.common import BenchMissionState, start_background_loop, run_in_loop, percentile
+
+
+def make_waypoints(count):
+    return [(28.60 + i * 1e-5, -81.20 + i * 1e-5, 10, 0) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated one-way vehicle response delay (s)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    sim_loop = start_background_loop()
+    swarm = SimSwarm(system_ids=(1,), latency=args.latency)
+    port = run_in_loop(sim_loop, swarm.start())
+
+    dispatcher = Dispatcher.Dispatcher(BenchMissionState([1]))
+    if not dispatcher.connect(f"tcp:127.0.0.1:{port}"):
+        raise SystemExit("could not connect to simulator")
+    dispatcher.start()
+
+    results = []
+    for size in args.sizes:
+        waypoints = make_waypoints(size)
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            ok = run_in_loop(dispatcher.loop, dispatcher.upload_mission(1, waypoints))
+            elapsed = time.perf_counter() - start
+            if not ok:
+                raise SystemExit(f"upload of {size} waypoints failed")
+            samples.append(elapsed)
+        results.append({
+            "waypoints": size,
+            "repeat": args.repeat,
+            "latency_s": args.latency,
+            "mean_ms": statistics.mean(samples) * 1e3,
+            "p50_ms": percentile(samples, 50) * 1e3,
+            "max_ms": max(samples) * 1e3,
+            "per_item_us": statistics.mean(samples) / (size + 1) * 1e6,
+        })
+
+    run_in_loop(sim_loop, swarm.stop())
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'waypoints':>10} {'mean ms':>10} {'p50 ms':>10} {'max ms':>10} {'us/item':>10}")
+        for r in results:
+            print(f"{r['waypoints']:>10} {r['mean_ms']:>10.1f} {r['p50_ms']:>10.1f} {r['max_ms']:>10.1f} {r['per_item_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+
+class BenchDrone:
+    """Just enough of missionState.Drone for the Dispatcher's upload path."""
+    def __init__(self, drone_id):
+        self.drone_id = drone_id
+        self.system_status = 4
+        self.operatingAltitude = 10
+        self.home_latitude = 285477810
+        self.home_longitude = -808481593
+        self.latitude = self.home_latitude
+        self.longitude = self.home_longitude
+
+    def get_home(self):
+        return (self.home_latitude, self.home_longitude)
+
+
+class BenchMissionState:
+    """Stand-in for missionState that drops telemetry, so benchmarks measure the Dispatcher alone."""
+    def __init__(self, drone_ids=()):
+        self.drones = {drone_id: BenchDrone(drone_id) for drone_id in drone_ids}
+
+    def get_drone(self, drone_id):
+        return self.drones.get(drone_id)
+
+    def updateDroneStatus(self, drone_id, system_status):
+        if drone_id not in self.drones:
+            self.drones[drone_id] = BenchDrone(drone_id)
+
+    def handle_drone_discovered(self, drone_id, system_status):
+        self.updateDroneStatus(drone_id, system_status)
+
+    def handle_drone_stale(self, *args):
+        pass
+
+    def handle_drone_lost(self, *args):
+        pass
+
+    def handle_drone_recovered(self, *args):
+        pass
+
+    def updateDronePosition(self, *args):
+        pass
+
+    def updateDroneTelemetry(self, *args):
+        pass
+
+    def updateDroneBattery(self, *args):
+        pass
+
+    def handle_reached_waypoint(self, *args):
+        pass
+
+    def handle_mission_state_update(self, *args):
+        pass
+
+
+def start_background_loop():
+    """Run a fresh event loop in a daemon thread, e.g. for a simulator. Returns the loop."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def run_in_loop(loop, coro, timeout=None):
+    """Run a coroutine on another thread's loop and block for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
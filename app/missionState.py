@@ -1,20 +1,34 @@
 import os
+import sys
 import random
 from GUI import GUI
 from Dispatcher import Dispatcher
+from Dispatcher.process_dispatcher import ProcessDispatcher
 import asyncio
 import threading
 from TerrainPreProcessing.terrain_queries import create_search_area
 from TerrainPreProcessing.visualization import plot_search_area, plot_advanced, plot_postGIS_data, plot_drone_paths
 from TerrainPreProcessing.visualization import Interactive_Visualization
 from PathPlanning.path import search_grid_with_drones
+from PathPlanning.job_scheduler import JobScheduler
 from LangGraph import langChainMain
-import concurrent.futures
 from Utils import coordinate_estimation
+from Utils.telemetry_buffer import position_buffer, attitude_buffer
+from Utils.swarm_snapshot import SwarmSnapshot
+from Utils.drone_registry import DroneRegistry
+from Utils.spatial_index import GridIndex
 import heapq
 from ComputerVision import objectDetection
+from ComputerVision.detection_pipeline import DetectionPipeline
 import cv2
 import threading
+import time
+
+DETECTION_POINT_RADIUS = 20 # meters, a drone this close to a detection point triggers image detection
+POI_MERGE_RADIUS = 40 # meters, a detection this close to a POI counts as another sighting of it
+POI_CREATE_TIMEOUT = 10 # seconds the persist stage waits for the Tk thread to create a detected POI
+# worker threads per detection pipeline stage, dedupe and persist always run on one
+DETECTION_WORKERS = {"load": 2, "detect": 1, "geolocate": 1, "describe": 2}
 
 class Drone:
     drone_id = None
@@ -36,6 +50,8 @@ class Drone:
     active_job = None
     last_mission_state = None
     available = True
+    link_state = "alive" # heartbeat liveness: alive, stale or lost
+    battery_remaining = None # percent, None until the drone reports it
     operatingAltitude = 10 # meters
     visionModel = "rf3v1.pt"
 
@@ -45,7 +61,12 @@ class Drone:
         self.system_status = system_status
         self.operatingAltitude = operatingAltitude
         self.jobQueue = jobPriorityQueue()
-        
+        # the scheduler's lock: job state is changed from the mission event thread, the Tk thread and the detection pipeline
+        self.job_lock = missionState.scheduler.lock
+        # Timestamped telemetry history, read with latest(n) / window(seconds)
+        self.position_history = position_buffer()
+        self.attitude_history = attitude_buffer()
+
 
     #SETTERS
     def updatePosition(self, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz):
@@ -57,36 +78,60 @@ class Drone:
         self.vx = vx
         self.vy = vy
         self.vz = vz
+        self.position_history.append(time.time(), latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
         if self.home_latitude is None:
             self.home_latitude = latitude
             self.home_longitude = longitude
-        self.missionState.gui.updateDronePosition(self.drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
+        # the GUI redraws from the snapshot at its own frame rate
+        self.missionState.snapshot.update_position(self.drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
 
     def updateTelemetry(self, roll, pitch, yaw):
         self.roll = roll
         self.pitch = pitch
         self.yaw = yaw
-        self.missionState.gui.updateDroneTelemetry(self.drone_id, roll, pitch, yaw)
+        self.attitude_history.append(time.time(), roll, pitch, yaw)
+        self.missionState.snapshot.update_attitude(self.drone_id, roll, pitch, yaw)
 
     def updateStatus(self, system_status):
         self.system_status = system_status
-        self.missionState.gui.updateDroneStatus(self.drone_id, system_status)
-    
-    def addJob(self, job):
-        if self.jobQueue.is_empty() and self.active_job is None: 
-            self.setActiveJob(job)
-        elif self.active_job is not None and (int(job.job_priority) - self.active_job.job_priority) > 3:
-            # if the new job has a higher priority than the active job, pause the active job
-            self.setActiveJob(job)
-        else:
-            self.jobQueue.add_job(job)
-        self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+        self.missionState.snapshot.update_status(self.drone_id, system_status)
+
+    def updateBattery(self, battery_remaining):
+        self.battery_remaining = battery_remaining
+    
+    def addJob(self, job, send=True):
+        with self.job_lock:
+            if self.jobQueue.is_empty() and self.active_job is None: 
+                self.setActiveJob(job, send)
+            elif self.active_job is not None and (int(job.job_priority) - self.active_job.job_priority) > 3:
+                # if the new job has a higher priority than the active job, pause the active job
+                self.setActiveJob(job, send)
+            else:
+                self.jobQueue.add_job(job)
+            self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
 
-    def setActiveJob(self, job):
-        if self.active_job is not None:
-            self.pauseJob()
-        job.status = "loading"
-        self.active_job = job
+    def setActiveJob(self, job, send=True):
+        """Make job the active one. With send=False the caller uploads activeJobWaypoints() itself, e.g. in a batch."""
+        with self.job_lock:
+            if self.active_job is not None:
+                self.pauseJob()
+            job.status = "loading"
+            self.active_job = job
+            # investigate jobs need high rate attitude for the camera, everything else flies a search pattern
+            phase = "investigate" if job.job_type.startswith("Investigate") else "search"
+            self.missionState.set_stream_phase(self.drone_id, phase)
+            # send the waypoints to the drone
+            if send:
+                if self.active_job.last_waypoint > 1:
+                    # resuming: send the whole job and start at the last waypoint reached, so a mission
+                    # still on the vehicle only needs the items that changed (if any) patched
+                    self.missionState.send_waypoints(self.drone_id, self.active_job.waypoints, self.active_job.last_waypoint)
+                else:
+                    self.missionState.send_waypoints(self.drone_id, self.activeJobWaypoints())
+            self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+
+    def activeJobWaypoints(self):
+        """Waypoints of the active job still left to fly."""
         waypoint_payload = []
         # append waypoints from last waypoint to the end of the list
         if self.active_job.last_waypoint > 1:
@@ -94,19 +139,18 @@ class Drone:
                 waypoint_payload.append(self.active_job.waypoints[i- 1])
         else:
             waypoint_payload = self.active_job.waypoints
-        # send the waypoints to the drone
-        self.missionState.send_waypoints(self.drone_id, waypoint_payload)
-        self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+        return waypoint_payload
     
     def updateJobStatus(self, status):
         self.active_job.job_status = status
         self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
     
     def pauseJob(self):
-        self.active_job.job_status = "paused"
-        self.jobQueue.add_job(self.active_job)
-        self.active_job = None
-        self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+        with self.job_lock:
+            self.active_job.job_status = "paused"
+            self.jobQueue.add_job(self.active_job)
+            self.active_job = None
+            self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
     
     def setJobRunning(self):
         if self.active_job is not None:
@@ -115,47 +159,62 @@ class Drone:
         
     
     def setJobComplete(self):
-        if self.active_job is not None:
-            print(f"Completing job {self.active_job.job_id}")  # Debugging
-            self.active_job.job_status = "Completed"
-            self.active_job = None  
-            if not self.jobQueue.is_empty():
-                next_job = self.jobQueue.get_next_job()
-                print(f"Next job: {next_job.job_id}")  # Debugging
-                self.setActiveJob(next_job)  # Ensure it's using the new job
-            self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+        with self.job_lock:
+            if self.active_job is not None:
+                print(f"Completing job {self.active_job.job_id}")  # Debugging
+                self.active_job.job_status = "Completed"
+                self.active_job = None  
+                if not self.jobQueue.is_empty():
+                    next_job = self.jobQueue.get_next_job()
+                    print(f"Next job: {next_job.job_id}")  # Debugging
+                    self.setActiveJob(next_job)  # Ensure it's using the new job
+                self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+                if self.active_job is None:
+                    self.missionState.scheduler.drone_free(self)
     
     def setJobFailedUpload(self):
-        if self.active_job is not None and self.active_job.upload_try_count < 3:
-            self.active_job.job_status = "Failed Upload"
-            self.missionState.send_waypoints(self.drone_id, self.active_job.waypoints)
-            self.active_job.upload_try_count += 1
-        else:
-            self.active_job.job_status = "Failed Upload"
-            self.active_job = None
-            if not self.jobQueue.is_empty():
-                next_job = self.jobQueue.get_next_job()
-                self.setActiveJob(next_job)
+        with self.job_lock:
+            if self.active_job is not None and self.active_job.upload_try_count < 3:
+                self.active_job.job_status = "Failed Upload"
+                self.missionState.send_waypoints(self.drone_id, self.active_job.waypoints)
+                self.active_job.upload_try_count += 1
+            else:
+                self.active_job.job_status = "Failed Upload"
+                self.active_job = None
+                if not self.jobQueue.is_empty():
+                    next_job = self.jobQueue.get_next_job()
+                    self.setActiveJob(next_job)
+                else:
+                    self.missionState.scheduler.drone_free(self)
     
     def setLastWaypoint(self, waypoint):
         if self.active_job is not None:
             self.active_job.last_waypoint = waypoint
             self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
             
-    def setDroneUnavailable(self):
-        self.available = False
-        #  push active job to the back of the queue
-        if self.active_job is not None:
-            self.jobQueue.add_job(self.active_job)
-            self.active_job = None
+    def setDroneUnavailable(self, reassign=True):
+        with self.job_lock:
+            self.available = False
+            # hand the active job (resuming from the last waypoint reached) and the queue to the scheduler for other drones,
+            # or only back to its pool when reassign is False
+            if self.active_job is not None:
+                self.pauseJob()  # moves it onto the queue
+            jobs = []
+            while not self.jobQueue.is_empty():
+                jobs.append(self.jobQueue.get_next_job())
             self.missionState.gui.updateJobs(self.drone_id, self.active_job, self.jobQueue.queue)
+            if jobs:
+                self.missionState.scheduler.release(self, jobs, reassign)
     
     def setDroneAvailable(self):
-        self.available = True
-        #  if there is a job in the queue, set it as the active job
-        if not self.jobQueue.is_empty():
-            next_job = self.jobQueue.get_next_job()
-            self.setActiveJob(next_job)
+        with self.job_lock:
+            self.available = True
+            #  if there is a job in the queue, set it as the active job
+            if not self.jobQueue.is_empty():
+                next_job = self.jobQueue.get_next_job()
+                self.setActiveJob(next_job)
+            else:
+                self.missionState.scheduler.drone_free(self)
     
     def set_operatingAltitude(self, altitude):
         self.operatingAltitude = altitude
@@ -197,6 +256,25 @@ class POI:
         self.poi_type = poi_type
         self.poi_target_at_location = False
 
+class DetectionFrame:
+    """One image on its way through the detection pipeline, with the pose of the drone that took it."""
+    def __init__(self, drone_id, image_path, drone_lat, drone_lon, drone_alt, drone_heading):
+        self.drone_id = drone_id
+        self.image_path = image_path
+        self.drone_lat = drone_lat
+        self.drone_lon = drone_lon
+        self.drone_alt = drone_alt # meters
+        self.drone_heading = drone_heading
+        self.image = None
+        self.detections = None
+        self.lat = None # estimated position of the detection
+        self.lon = None
+        self.poi = None # existing POI this is another sighting of
+        self.duplicate_of = None # new detection still in flight this is another sighting of
+        self.followers = [] # sightings that arrived before this frame's POI was created
+        self.pending_entry = None # entry in missionState.pending_detections while this is a new detection
+        self.description = ""
+
 # a job queue for each drone
 class jobPriorityQueue:
     def __init__(self):
@@ -223,16 +301,21 @@ class jobPriorityQueue:
 
 class missionState:
 
-    def __init__(self, gui):
-        self.drones = []
+    def __init__(self, gui, io_process=False, detection_workers=None):
+        self.drones = DroneRegistry() # by system id, iterates in id order
+        self.snapshot = SwarmSnapshot(registry=self.drones) # latest telemetry of every drone, read by the GUI, visualization and LLM
+        self.scheduler = JobScheduler(self.drones) # jobs not tied to a drone, given to whichever drone is best placed
         self.pois = []
+        self.pois_by_id = {}
+        self.poi_index = GridIndex(cell_size=POI_MERGE_RADIUS) # pois by position, for de-duplicating detections
+        self.poi_directories = set() # POI image directories already created
         self.gcs_location = None  # Global Control Station location (latitude, longitude)
         
         self.missionPolygon = None
         self.mavLinkConnected = False
         self.gui = gui
-        self.loop = asyncio.new_event_loop()
-        self.dispatcher = Dispatcher.Dispatcher(self)
+        # io_process runs MAVLink I/O in a child process, away from the GUI/detection GIL
+        self.dispatcher = ProcessDispatcher(self) if io_process else Dispatcher.Dispatcher(self)
         self.jobIDCounter = 100
         # TEST VALUES
         self.mission_waypoints = [(28.6013158, -81.2020057, 10, 0 ), (28.6031200, -81.1993369, 10, 0) , (28.6004825, -81.1942729, 10, 0)]
@@ -241,13 +324,27 @@ class missionState:
 
         #for simulation purposes
         self.detectionPoints = []
+        self.detection_index = GridIndex(cell_size=DETECTION_POINT_RADIUS) # detectionPoints by position
+
+        # image detection runs in its own stages and threads, never on the telemetry thread
+        self.pending_detections = GridIndex(cell_size=POI_MERGE_RADIUS) # new detections between dedupe and persist
+        self.pending_detections_lock = threading.Lock()
+        workers = dict(DETECTION_WORKERS, **(detection_workers or {}))
+        self.detection_pipeline = DetectionPipeline([
+            ("load", self._load_detection_image, workers["load"]),
+            ("detect", self._detect_objects, workers["detect"]),
+            ("geolocate", self._geolocate_detection, workers["geolocate"]),
+            ("dedupe", self._dedupe_detection, 1),
+            ("describe", self._describe_detection, workers["describe"]),
+            ("persist", self._persist_detection, 1),
+        ])
         
         
-    def connect_to_mavlink(self):
-        success = self.dispatcher.connect()
+    def connect_to_mavlink(self, devices="tcp:127.0.0.1:14550"):
+        # devices can be a list of endpoints (one per radio/SITL instance), the dispatcher routes each drone to its own link
+        success = self.dispatcher.connect(devices)
         if success:
-            self.dispatcherThread = threading.Thread(target=self.run_asyncio_loop, daemon=True)
-            self.dispatcherThread.start()
+            self.dispatcher.start()
             self.mavLinkConnected = True
             print("Connected to MAVLink")
             return True
@@ -256,41 +353,37 @@ class missionState:
             self.mavLinkConnected = False
             return False
 
-    
-    def run_asyncio_loop(self):
-        """Runs the asyncio event loop in a separate thread for the dispatcher."""
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_until_complete(self.dispatcher.receive_packets())
 
     def addDrone(self, drone_id, system_status):
-        self.drones.append(Drone(self, drone_id, system_status, 10 + (5 * len(self.drones))))
-        self.drones.sort(key=lambda x: x.drone_id)
+        self.drones.add(drone_id, Drone(self, drone_id, system_status, 10 + (5 * len(self.drones))))
+        self.snapshot.update_status(drone_id, system_status)
         self.gui.addDrone(drone_id, system_status)
+        self.scheduler.drone_free(self.drones.get(drone_id))
 
     def updateDronePosition(self, drone_id, latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             drone.updatePosition(latitude, longitude, altitude, relative_altitude, heading, vx, vy, vz)
-            #check if drone is within 20 meters of the target detection points
-            if self.detectionPoints:
-                for point in self.detectionPoints:
-                    distance = coordinate_estimation.calculate_distance_between_points(
-                        latitude / 1e7, longitude / 1e7,
-                        point["lat"], point["lon"]
-                    )
-                    if distance < 20:  # If within 20 meters and the flag is less than 3
-                        print(f"Drone {drone_id} is within 20 meters of detection point {point['lat']}, {point['lon']} num_hits: {point['num_hits']} roll: {drone.roll}")
-                        if point["num_hits"] < 1 or (point["num_hits"] <= 3 and abs(drone.roll) > 0.1):  # If the flag is less than 1 or if the drone is pitching significantly
-                            point["num_hits"] += 1  # Increment the flag for this detection point
-                            self.trigger_image_detection(drone_id)
+            #check if drone is within 20 meters of the target detection points, only the grid cells around it are tested
+            if self.detection_index:
+                for point in self.detection_index.within(latitude / 1e7, longitude / 1e7, DETECTION_POINT_RADIUS):
+                    print(f"Drone {drone_id} is within 20 meters of detection point {point['lat']}, {point['lon']} num_hits: {point['num_hits']} roll: {drone.roll}")
+                    if point["num_hits"] < 1 or (point["num_hits"] <= 3 and abs(drone.roll) > 0.1):  # If the flag is less than 1 or if the drone is pitching significantly
+                        point["num_hits"] += 1  # Increment the flag for this detection point
+                        self.trigger_image_detection(drone_id)
                         
 
 
     def updateDroneTelemetry(self, drone_id, roll, pitch, yaw):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             drone.updateTelemetry(roll, pitch, yaw)
 
+    def updateDroneBattery(self, drone_id, battery_remaining):
+        drone = self.drones.get(drone_id)
+        if drone is not None:
+            drone.updateBattery(battery_remaining if battery_remaining >= 0 else None) # -1: not reported
+
     def addMissionPolygon(self, polygon):
         print("Gotcha!")
 
@@ -343,11 +436,16 @@ class missionState:
         pass
 
     def deployInitialPaths(self):
+        missions = {}
         for i, drone in enumerate(self.drones):
             converted_waypoints = []
             for j, coord in enumerate(self.drone_search_destinations[i]):
                 converted_waypoints.append((coord.y, coord.x, drone.operatingAltitude, 0))
-            self.create_job("Initial Search", converted_waypoints, 1, drone.drone_id)
+            job = self.create_job("Initial Search", converted_waypoints, 1, drone.drone_id, send=False)
+            if job is not None and drone.active_job is job:
+                missions[drone.drone_id] = drone.activeJobWaypoints()
+        # upload every drone's search path at once rather than one after another
+        self.dispatcher.upload_missions(missions)
 
 
     def startSearchMission(self):
@@ -360,28 +458,56 @@ class missionState:
 
     def updateDroneStatus(self, drone_id, system_status):
         # check if drone exists yet 
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is None:
             self.addDrone(drone_id, system_status)
         else:
             drone.updateStatus(system_status)
     
+    def handle_drone_discovered(self, drone_id, system_status):
+        # first heartbeat from a drone, the dispatcher posts this one even when telemetry is being dropped
+        print(f"Discovered drone {drone_id}")
+        self.updateDroneStatus(drone_id, system_status)
+
+    def handle_drone_stale(self, drone_id):
+        drone = self.drones.get(drone_id)
+        if drone is not None:
+            drone.link_state = "stale"
+
+    def handle_drone_lost(self, drone_id):
+        drone = self.drones.get(drone_id)
+        if drone is None:
+            return
+        drone.link_state = "lost"
+        # take the drone's work away from it, continuing from the last waypoint it reached
+        drone.setDroneUnavailable()
+
+    def handle_drone_recovered(self, drone_id, previous_state):
+        drone = self.drones.get(drone_id)
+        if drone is None:
+            return
+        drone.link_state = "alive"
+        if previous_state == "lost":
+            drone.setDroneAvailable()
+        else:
+            self.scheduler.drone_free(drone) # may have been passed over for work while stale
+
     def getDrones(self):
         return self.drones
     
     def get_drone(self, drone_id):
-        return next((d for d in self.drones if d.drone_id == drone_id), None)
+        return self.drones.get(drone_id)
 
     def arm_mission(self, drone_id):
         self.dispatcher.arm_drone(drone_id)
     
     def takeoff_mission(self, drone_id):
-        self.dispatcher.takeoff(drone_id, 10)
+        self.dispatcher.takeoff_drone(drone_id, 10)
     
-    def send_waypoints(self, drone_id, waypoints):
+    def send_waypoints(self, drone_id, waypoints, first_item=0):
 
         print("Sending waypoints")
-        self.dispatcher.send_mission(drone_id, waypoints)
+        self.dispatcher.send_mission(drone_id, waypoints, first_item)
     
     def return_to_launch(self, drone_id):
         self.dispatcher.return_to_launch(drone_id)
@@ -389,30 +515,39 @@ class missionState:
     def send_poi_investigate(self, drone_id, waypoint):
         self.dispatcher.send_poi_investigate(drone_id, waypoint)
     
+    def set_stream_phase(self, drone_id, phase):
+        self.dispatcher.set_stream_phase(drone_id, phase)
+    
     def send_mission_list_request(self, drone_id):
         self.dispatcher.request_mission_list(drone_id)
     
     def handle_reached_waypoint(self, drone_id, waypoint):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             drone.setLastWaypoint(waypoint)
     
     def handle_mission_state_update(self, drone_id, mission_state):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             if mission_state == 5:
                 if drone.last_mission_state != 5: # this ensures that the drone is not already in the state
                     drone.setJobComplete()
             drone.last_mission_state = mission_state
             
-    def create_job(self, job_type, waypoints, job_priority, drone_id):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+    def create_job(self, job_type, waypoints, job_priority, drone_id=None, send=True):
+        """Give a job to drone_id, or with drone_id=None to the scheduler, which picks the drone."""
+        if drone_id is None:
+            job = Job(job_type, "pending", waypoints, self, job_priority)
+            self.scheduler.submit(job)
+            return job
+        drone = self.drones.get(drone_id)
         if drone is not None:
             job = Job(job_type, "pending", waypoints, self, job_priority)
-            drone.addJob(job)
+            drone.addJob(job, send)
+            return job
     
     def test_add_job(self, drone_id, use_waypoints):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             if use_waypoints == 1:
                 job = Job("Automated Path", "pending", self.mission_waypoints, self, 1)
@@ -426,25 +561,11 @@ class missionState:
             
     
     def get_drone(self, drone_id):
-        return next((d for d in self.drones if d.drone_id == drone_id), None)
+        return self.drones.get(drone_id)
     
     def getDrones(self):
         """returns drone list in a readable format for llm"""
-        drone_list = []
-        for drone in self.drones:
-            drone_list.append({
-                "drone_id": drone.drone_id,
-                "system_status": drone.system_status,
-                "latitude": drone.latitude,
-                "longitude": drone.longitude,
-                "altitude": drone.altitude,
-                "relative_altitude": drone.relative_altitude,
-                "heading": drone.heading,
-                "vx": drone.vx,
-                "vy": drone.vy,
-                "vz": drone.vz
-            })
-        return drone_list
+        return sorted(self.snapshot.as_dicts(), key=lambda d: d["drone_id"])
     def getPOIs(self):
         """returns poi list in a readable format for llm"""
         poi_list = []
@@ -459,31 +580,47 @@ class missionState:
     
     def addPOI(self, poi):
         #create POI directory in mission folder
-        os.makedirs(f"Missions/{self.missionID}/POIs/{poi.id}", exist_ok=True)
+        self._poi_directory(poi.id)
         self.pois.append(poi)
+        self.pois_by_id[poi.id] = poi
+        self.poi_index.insert(poi.lat, poi.lon, poi)
         self.gui.addPOI(poi)
 
+    def _poi_directory(self, poi_id):
+        directory = f"Missions/{self.missionID}/POIs/{poi_id}"
+        if directory not in self.poi_directories:
+            os.makedirs(directory, exist_ok=True)
+            self.poi_directories.add(directory)
+        return directory
+
     
     def create_poi_investigate_job(self, poi_id, drone_id, priority = 5):
         print(f"Creating POI investigate job for drone {drone_id} and poi {poi_id}")
     
-        poi = next((p for p in self.pois if p.id == int(poi_id)), None)
+        poi = self.pois_by_id.get(int(poi_id))
         print(f"POI: {poi}")
         if poi is not None:
-            drone = next((d for d in self.drones if d.drone_id == int(drone_id)), None)
+            drone = self.drones.get(int(drone_id))
             if drone is not None:
                 job = Job(f"Investigate POI {poi.id} ", "pending", [(poi.lat, poi.lon, int(drone.operatingAltitude), 2)], self, priority)
                 drone.addJob(job)
     
     def call_drone_home(self, drone_id):
-        drone = next((d for d in self.drones if d.drone_id == int(drone_id)), None)
+        drone = self.drones.get(int(drone_id))
         if drone is not None:
             drone.setDroneUnavailable()
+            self.set_stream_phase(int(drone_id), "transit")
             self.dispatcher.return_to_launch(int(drone_id))
     
     def end_mission(self):
+        # every drone is out of the running before any job is released, and released jobs stay in the pool,
+        # so nothing is sent a new mission while the swarm returns to launch
+        for drone in self.drones:
+            drone.available = False
         for drone in self.drones:
-            self.call_drone_home(drone.drone_id)
+            drone.setDroneUnavailable(reassign=False)
+            self.set_stream_phase(drone.drone_id, "transit")
+        self.dispatcher.return_to_launch_all([drone.drone_id for drone in self.drones])
     
     def set_missionID(self, id):
         self.missionID = id
@@ -497,75 +634,133 @@ class missionState:
         self.handle_image_detection(drone_id, image_path)
     
     def handle_image_detection(self, drone_id, image_path):
-        # Run the LLM in a separate thread to prevent UI freezing
-        def process_image():
-            result = langChainMain.give_image_description(image_path)
-            return result.content  # Extract the description
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(process_image)
-            description = future.result()  # Wait for the result in a non-blocking way
+        # Hand the frame to the detection pipeline, this runs on the telemetry thread and must not block
+        drone = self.drones.get(drone_id)
+        if drone is None:
+            return
+        # the pose the image was taken at, the drone keeps moving while the frame is processed
+        frame = DetectionFrame(drone_id, image_path, drone.latitude / 1e7, drone.longitude / 1e7, drone.altitude / 1000, drone.heading)
+        if not self.detection_pipeline.submit(frame):
+            print(f"Detection pipeline full, dropping image from drone {drone_id}")
+
+    # Detection pipeline stages, each returns the frame to pass it on or None to stop there
+    def _load_detection_image(self, frame):
+        frame.image = cv2.imread(frame.image_path)
+        if frame.image is None:
+            print(f"Could not read image {frame.image_path}")
+            return None
+        return frame
 
-        image, detections = objectDetection.detect_and_draw(image_path)
-        if detections is None or len(detections) == 0:
+    def _detect_objects(self, frame):
+        # YOLO first, so the LLM only ever sees frames with something in them
+        frame.image, frame.detections = objectDetection.detect_and_draw_image(frame.image)
+        if frame.detections is None or len(frame.detections) == 0:
             print("No objects detected in the image.")
-            return
+            return None
+        return frame
+
+    def _geolocate_detection(self, frame):
+        frame.lat, frame.lon = coordinate_estimation.estimate_position(
+            frame.drone_lat,
+            frame.drone_lon,
+            frame.drone_alt,
+            -10,
+            0,
+            90,  # Assuming a FOV of 90 degrees for simplicity
+            960,  # x coordinate in the image (center)
+            540,  # y coordinate in the image (center)
+            frame.drone_heading,
+            image_width=1920,
+            image_height=1080
+        )
+        return frame
+
+    def _dedupe_detection(self, frame):
+        # single worker: a frame is matched against existing POIs and against new ones still being described
+        match = self.poi_index.nearest(frame.lat, frame.lon, POI_MERGE_RADIUS)
+        if match is not None:
+            frame.poi = match[0]
+            return frame
+        with self.pending_detections_lock:
+            entry, inserted = self.pending_detections.insert_or_match(frame.lat, frame.lon, frame, POI_MERGE_RADIUS)
+        if inserted:
+            frame.pending_entry = entry
         else:
-            # Now process the estimated position
-            drone = next((d for d in self.drones if d.drone_id == drone_id), None)
-            if drone is None:
-                return
-            
-            
-            
-            estimated_lat, estimated_lon = coordinate_estimation.estimate_position( 
-                drone.latitude / 1e7, 
-                drone.longitude / 1e7, 
-                drone.altitude / 1000, 
-                -10, 
-                0, 
-                90,  # Assuming a FOV of 90 degrees for simplicity
-                960,  # x coordinate in the image (center)
-                540,  # y coordinate in the image (center)
-                drone.heading,
-                image_width=1920,
-                image_height=1080
-            )
-
-            # Check if the detected POI already exists within 20 meters
-            for poi in self.pois:
-                if coordinate_estimation.calculate_distance_between_points(estimated_lat, estimated_lon, poi.lat, poi.lon) < 40:
-                    os.makedirs(f"Missions/{self.missionID}/POIs/{poi.id}", exist_ok=True)
-                    cv2.imwrite(f"Missions/{self.missionID}/POIs/{poi.id}/{os.path.basename(image_path)}", image)
-                    poi.positive_flags += 1
-                    if poi.positive_flags >= 3:
-                        poi.target_found(drone_id)  # Mark the POI as found if it has enough positive flags
-                        
-                    return
-
-            # If no existing POI, create a new one
-            poi_id = self.gui.map_page.add_poi(estimated_lat, estimated_lon, "Detected POI", description)
-            self.create_poi_investigate_job(poi_id, drone_id, 5)
-
-            # Store image in POI directory
-            os.makedirs(f"Missions/{self.missionID}/POIs/{poi_id}", exist_ok=True)
-            cv2.imwrite(f"Missions/{self.missionID}/POIs/{poi_id}/{os.path.basename(image_path)}", image)
+            frame.duplicate_of = entry.item
+        return frame
+
+    def _describe_detection(self, frame):
+        if frame.poi is None and frame.duplicate_of is None:
+            try:
+                frame.description = langChainMain.give_image_description(frame.image_path).content
+            except Exception as e:
+                # still create the POI, it is only missing its description
+                print(f"Could not describe image {frame.image_path}: {e}")
+        return frame
+
+    def _persist_detection(self, frame):
+        # single worker, so POIs are created and flagged in one place
+        if frame.duplicate_of is not None:
+            primary = frame.duplicate_of
+            if primary.poi is None:
+                primary.followers.append(frame)  # its POI is not created yet, flag it once it is
+                return frame
+            frame.poi = primary.poi
+        if frame.poi is not None:
+            self._flag_poi(frame.poi, frame)
+            return frame
+
+        # If no existing POI, create a new one
+        try:
+            poi_id = self.gui.add_poi_threadsafe(frame.lat, frame.lon, "Detected POI", frame.description).result(POI_CREATE_TIMEOUT)
+        except Exception as e:
+            print(f"Could not create a POI for the detection by drone {frame.drone_id}: {e}")
+            with self.pending_detections_lock:
+                self.pending_detections.remove(frame.pending_entry)
+            return None
+        # on the drone's event lane, in order with the completions and link changes that also touch its jobs
+        self.dispatcher.events.post(frame.drone_id, self.create_poi_investigate_job, poi_id, frame.drone_id, 5, droppable=False)
+        self._save_detection_image(poi_id, frame)
+        frame.poi = self.pois_by_id.get(poi_id)
+        with self.pending_detections_lock:
+            self.pending_detections.remove(frame.pending_entry)
+        if frame.poi is not None:
+            for follower in frame.followers:
+                self._flag_poi(frame.poi, follower)
+        return frame
+
+    def _flag_poi(self, poi, frame):
+        self._save_detection_image(poi.id, frame)
+        poi.positive_flags += 1
+        if poi.positive_flags >= 3:
+            # Mark the POI as found if it has enough positive flags; its popup is built on the Tk thread
+            self.gui.app.after(0, poi.target_found, frame.drone_id)
+
+    def _save_detection_image(self, poi_id, frame):
+        # Store image in POI directory
+        cv2.imwrite(f"{self._poi_directory(poi_id)}/{os.path.basename(frame.image_path)}", frame.image)
+
+    def detection_metrics(self):
+        return self.detection_pipeline.metrics()
     
     def set_gcs_location(self, coordinates_tuple):
         self.gcs_location = coordinates_tuple
 
     def setDetectionPoints(self, points):
         self.detectionPoints = points
+        self.detection_index = GridIndex(cell_size=DETECTION_POINT_RADIUS)
+        for point in points:
+            self.detection_index.insert(point["lat"], point["lon"], point)
 
     def  get_drone_operatingAltitude(self, drone_id):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             return drone.get_operatingAltitude()
         else:
             return None
     
     def  set_drone_operatingAltitude(self, drone_id, altitude):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             drone.set_operatingAltitude(altitude)
             self.gui.updateDroneOperatingAltitude(drone_id, altitude)
@@ -573,20 +768,20 @@ class missionState:
             return None
     
     def get_drone_vision_model(self, drone_id):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             return drone.visionModel
         else:
             return None
     def set_drone_vision_model(self, drone_id, model):
-        drone = next((d for d in self.drones if d.drone_id == drone_id), None)
+        drone = self.drones.get(drone_id)
         if drone is not None:
             drone.visionModel = model
             self.gui.updateDroneVisionModel(drone_id, model)
         else:
             return None
     def remove_poi_investigate_job(self, droneID):
-        drone = next((d for d in self.drones if d.drone_id == droneID), None)
+        drone = self.drones.get(droneID)
         if drone is not None and drone.active_job is not None:
             if drone.active_job.job_type.startswith("Investigate POI"):
                 print(f"Removing job {drone.active_job.job_id} for drone {droneID}")
@@ -596,6 +791,6 @@ class missionState:
 
 if __name__ == "__main__":
     gui = GUI.GUI()
-    missionState = missionState(gui)
+    missionState = missionState(gui, io_process="--io-process" in sys.argv)
     gui.link_mission_state(missionState)
     gui.run()
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+JobScheduler under concurrent events. Run from the app directory:
+    python -m pytest tests
+"""
+import random
+import threading
+import time
+
+import pytest
+
+from PathPlanning.job_scheduler import JobScheduler
+from Utils.drone_registry import DroneRegistry
+
+ORIGIN = (28.6024274, -81.2000599)
+
+
+class FakeJob:
+    def __init__(self, job_id, lat, lon):
+        self.job_id = job_id
+        self.job_type = "Search"
+        self.job_status = "pending"
+        self.waypoints = [(lat, lon, 10, 0), (lat + 1e-4, lon, 10, 0)]
+        self.job_priority = 1
+        self.last_waypoint = 0
+        self.upload_try_count = 0
+
+    def __lt__(self, other):
+        return self.job_priority > other.job_priority
+
+
+class FakeQueue:
+    def __init__(self):
+        self.queue = []
+
+    def is_empty(self):
+        return not self.queue
+
+
+class FakeDrone:
+    """Takes jobs the way missionState.Drone does, with a pause inside to widen any race."""
+
+    def __init__(self, drone_id, rng):
+        self.drone_id = drone_id
+        self.latitude = int((ORIGIN[0] + rng.uniform(-0.01, 0.01)) * 1e7)
+        self.longitude = int((ORIGIN[1] + rng.uniform(-0.01, 0.01)) * 1e7)
+        self.home_latitude = int(ORIGIN[0] * 1e7)
+        self.home_longitude = int(ORIGIN[1] * 1e7)
+        self.available = True
+        self.link_state = "alive"
+        self.battery_remaining = None
+        self.active_job = None
+        self.jobQueue = FakeQueue()
+        self.overlapping_adds = 0
+        self.adding = False
+
+    def addJob(self, job, send=True):
+        if self.adding:
+            self.overlapping_adds += 1
+        self.adding = True
+        idle = self.active_job is None and self.jobQueue.is_empty()
+        time.sleep(0.0002)
+        if idle:
+            self.active_job = job
+        else:
+            self.jobQueue.queue.append(job)
+        self.adding = False
+
+
+@pytest.mark.parametrize("seed", range(10))  # the race does not show on every run
+def test_concurrent_submit_and_drone_free_assign_every_job_once(seed):
+    rng = random.Random(seed)
+    registry = DroneRegistry()
+    for drone_id in range(1, 6):
+        registry.add(drone_id, FakeDrone(drone_id, rng))
+    scheduler = JobScheduler(registry)
+    for drone in registry:
+        scheduler.drone_free(drone)
+
+    jobs = [FakeJob(job_id, ORIGIN[0] + rng.uniform(-0.01, 0.01), ORIGIN[1] + rng.uniform(-0.01, 0.01)) for job_id in range(400)]
+    completed = []
+    submitting = True
+
+    def submit(chunk):
+        for job in chunk:
+            scheduler.submit(job)
+
+    def complete(drone):
+        # what Drone.setJobComplete does: finish the active job under the lock, then ask for more
+        while submitting or drone.active_job is not None or len(scheduler):
+            with scheduler.lock:
+                if drone.active_job is not None:
+                    completed.append(drone.active_job)
+                    drone.active_job = drone.jobQueue.queue.pop(0) if drone.jobQueue.queue else None
+            scheduler.drone_free(drone)
+            time.sleep(0.0001)
+
+    submitters = [threading.Thread(target=submit, args=(jobs[i::4],)) for i in range(4)]
+    completers = [threading.Thread(target=complete, args=(drone,)) for drone in registry]
+    for thread in submitters + completers:
+        thread.start()
+    for thread in submitters:
+        thread.join()
+    submitting = False
+    for thread in completers:
+        thread.join(30)
+        assert not thread.is_alive()
+
+    assert sum(drone.overlapping_adds for drone in registry) == 0
+    completed_ids = [job.job_id for job in completed]
+    assert len(completed_ids) == len(set(completed_ids))
+    assert sorted(completed_ids) == [job.job_id for job in jobs]